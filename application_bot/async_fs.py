@@ -0,0 +1,103 @@
+# application_bot/async_fs.py
+"""
+Async wrappers for the blocking filesystem calls made from handlers.
+
+Everything runs on one dedicated thread pool (FILESYSTEM_WORKER_THREADS
+threads), separate from the loop's default executor, so a slow or networked disk
+stalls a worker thread instead of the bot's event loop. Temp photo cleanup is a
+single fire-and-forget batch per application.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+from application_bot import utils
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_known_directories: Set[str] = set()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(utils.get_setting("FILESYSTEM_WORKER_THREADS", 4))
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="AsyncFS")
+        return _executor
+
+
+def shutdown(wait: bool = True):
+    """Stops the worker threads (pending deletes finish first when `wait`). The pool is recreated on next use."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def run(func: Callable, *args, **kwargs) -> Any:
+    """Runs a blocking callable on the filesystem pool and awaits its result."""
+    # Carry the caller's context over so utils.current_config().SETTINGS etc. resolve to the same bot's config (see utils.ConfigScope).
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+
+async def makedirs(path: str):
+    # Directories are created once per process; later calls for the same path never leave the loop.
+    if path in _known_directories:
+        return
+    await run(os.makedirs, path, exist_ok=True)
+    _known_directories.add(path)
+
+
+async def getsize(path: str) -> int:
+    return await run(os.path.getsize, path)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def read_bytes(path: str) -> bytes:
+    return await run(_read_bytes, path)
+
+
+def _remove_files(paths: List[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+            logger.debug("Cleaned up temp photo: %s", path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not remove temp photo %s: %s", path, e)
+    return removed
+
+
+def submit(func: Callable, *args, **kwargs) -> Future:
+    """Runs a blocking callable on the filesystem pool without waiting for it (for writes nobody awaits)."""
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return _get_executor().submit(call)
+
+
+def remove_files_soon(paths: Iterable[str]) -> Optional[Future]:
+    """Deletes `paths` in one background job without waiting; missing files are ignored."""
+    paths = list(paths)
+    if not paths:
+        return None
+    try:
+        return _get_executor().submit(_remove_files, paths)
+    except RuntimeError:  # Interpreter shutting down; fall back to deleting inline
+        _remove_files(paths)
+        return None
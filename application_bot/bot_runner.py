@@ -0,0 +1,192 @@
+# application_bot/bot_runner.py
+"""
+Owns the bot's event loop thread and Application for control surfaces that are
+not the bot's main thread (the GUI and the headless daemon's control API).
+
+The loop and the Application are long-lived: stop() only pauses the updater and
+start() resumes it after applying the current settings (reconfigure_application),
+so a restart costs no initialize(), TLS handshakes or in-memory state. A new
+Application is built only on the first start, after close(), or when BOT_TOKEN
+or the Bot API server (BOT_API_* settings) changes.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from telegram.ext import Application
+
+from application_bot import utils
+from application_bot.main import (
+    bot_api_endpoint, create_bot_application, reconfigure_application, shutdown_pools, start_bot_async, pause_polling_async,
+    stop_bot_async
+)
+from application_bot.utils import load_questions
+
+logger = logging.getLogger(__name__)
+
+STATE_STOPPED = "stopped"
+STATE_STARTING = "starting"
+STATE_RUNNING = "running"
+STATE_STOPPING = "stopping"
+STATE_FAILED = "failed"
+
+CLOSE_GRACE_SECONDS = 15.0  # For stopping the updater and shutting down, on top of the drain
+
+
+class BotRunner:
+    def __init__(self, base_url: Optional[str] = None, base_file_url: Optional[str] = None,
+                 health_listeners: Optional[List[Callable[[bool], None]]] = None, local_mode: Optional[bool] = None):
+        self.base_url = base_url
+        self.base_file_url = base_file_url
+        self.local_mode = local_mode
+        self.health_listeners = list(health_listeners or [])
+        self.state = STATE_STOPPED
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.last_start_seconds: Optional[float] = None
+        self._application: Optional[Application] = None
+        self._application_identity: Optional[tuple] = None  # (BOT_TOKEN, Bot API endpoint) it was built for
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def application(self) -> Optional[Application]:
+        return self._application
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or not self._thread.is_alive():
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="BotEventLoop", daemon=True)
+            self._thread.start()
+        return self._loop
+
+    def start_async(self) -> Optional[concurrent.futures.Future]:
+        """
+        Schedules a (warm) start on the bot loop and returns its future, which
+        resolves to True once polling. Returns None if the bot cannot be started.
+        """
+        with self._lock:
+            if self.state in (STATE_STARTING, STATE_RUNNING):
+                logger.info("Bot runner: Bot is already running or starting.")
+                return None
+            if not utils.get_setting("BOT_TOKEN"):
+                self.state = STATE_FAILED
+                self.last_error = "BOT_TOKEN is missing in settings."
+                logger.error("Bot runner: Cannot start, %s", self.last_error)
+                return None
+            if utils.current_config().QUESTIONS is None and not load_questions():
+                logger.warning("Bot runner: questions.json could not be loaded. /apply command may fail or use empty questions.")
+            self.state = STATE_STARTING
+            self.last_error = None
+            return asyncio.run_coroutine_threadsafe(self._start(), self._ensure_loop())
+
+    def start(self, timeout: float = 60.0) -> bool:
+        future = self.start_async()
+        if future is None:
+            return False
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            logger.warning("Bot runner: Start is taking longer than expected; it continues in the background.")
+            return False
+        except Exception:
+            return False  # Already logged and recorded in last_error by _start
+
+    async def _start(self) -> bool:
+        started = time.perf_counter()
+        try:
+            identity = (utils.current_config().SETTINGS.get("BOT_TOKEN"), bot_api_endpoint(self.base_url, self.base_file_url, self.local_mode))
+            if self._application is not None and identity != self._application_identity:
+                logger.info("Bot runner: BOT_TOKEN or Bot API server changed; replacing the Application.")
+                await stop_bot_async(self._application)
+                self._application = None
+            if self._application is None:
+                application = create_bot_application(self.base_url, self.base_file_url, self.local_mode)
+                if not application:
+                    raise RuntimeError("Failed to create bot application (likely BOT_TOKEN missing or invalid).")
+                health = application.bot_data.get("connection_health")
+                if health:
+                    for listener in self.health_listeners:
+                        health.add_listener(listener)
+                self._application, self._application_identity = application, identity
+            else:
+                logger.info("Bot runner: Warm start; reusing the running Application.")
+                reconfigure_application(self._application)
+            await start_bot_async(self._application)
+        except Exception as e:
+            logger.error("Bot runner: Start failed: %s", e, exc_info=True)
+            self.state = STATE_FAILED
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        self.last_start_seconds = time.perf_counter() - started
+        self.state = STATE_RUNNING
+        self.started_at = time.time()
+        logger.info("Bot runner: Polling after %.0fms.", self.last_start_seconds * 1000)
+        return True
+
+    def stop(self, timeout: float = 15.0) -> bool:
+        """Pauses polling; the Application, its connections and conversations stay alive for the next start()."""
+        return self._run_transition(pause_polling_async, "Pausing", timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Shuts the Application down and ends the loop thread (app exit, or to force a cold start).
+        The default timeout leaves room for the shutdown drain (DRAIN_TIMEOUT_SECONDS, see drain.py).
+        """
+        if timeout is None:
+            timeout = float(utils.get_setting("DRAIN_TIMEOUT_SECONDS", 20.0)) + CLOSE_GRACE_SECONDS
+        ok = self._run_transition(stop_bot_async, "Shutting down", timeout)
+        shutdown_pools()
+        with self._lock:
+            self._application = None
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=timeout)
+                if not self._thread.is_alive():
+                    self._loop.close()
+                self._loop = None
+        return ok
+
+    def _run_transition(self, coroutine_function: Callable, description: str, timeout: float) -> bool:
+        with self._lock:
+            application, loop = self._application, self._loop
+            if application is None or loop is None:
+                self.state = STATE_STOPPED
+                return True
+            self.state = STATE_STOPPING
+        logger.info("Bot runner: %s bot...", description)
+        future = asyncio.run_coroutine_threadsafe(coroutine_function(application), loop)
+        try:
+            future.result(timeout=timeout)
+            ok = True
+        except Exception as e:
+            logger.warning("Bot runner: %s did not complete cleanly: %s", description, e)
+            ok = False
+        self.state = STATE_STOPPED
+        self.started_at = None
+        return ok
+
+    def status(self) -> Dict[str, Any]:
+        application = self._application
+        health = application.bot_data.get("connection_health") if application else None
+        state = self.state
+        if state == STATE_RUNNING and application and not application.updater.running:
+            supervisor = application.bot_data.get("connectivity_supervisor")
+            if not (supervisor and supervisor.paused):
+                state = STATE_FAILED  # Polling died on its own (e.g. the token was revoked); see the log.
+        return {
+            "state": state,
+            "running": state == STATE_RUNNING,
+            "last_error": self.last_error,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else None,
+            "last_start_ms": round(self.last_start_seconds * 1000) if self.last_start_seconds is not None else None,
+            "connection": health.snapshot() if health else None,
+        }
@@ -0,0 +1,163 @@
+# application_bot/connection_health.py
+"""
+Passive connectivity health for the Telegram Bot API.
+
+Every request the bot makes (getUpdates and all sends) goes through
+HealthTrackingRequest, which reports its outcome to a ConnectionHealth; nothing
+opens extra connections just to check the network. After
+CONNECTION_FAILURES_BEFORE_PAUSE consecutive network failures the
+ConnectivitySupervisor pauses polling on the running Application and retries a
+cheap getMe with exponential backoff (CONNECTION_BACKOFF_INITIAL_SECONDS,
+doubling up to CONNECTION_BACKOFF_MAX_SECONDS). The first success resumes
+polling on the same Application, so conversations and the connection pool
+survive a network blip.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from telegram.error import NetworkError
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from application_bot import utils
+from application_bot.metrics import REGISTRY
+from application_bot.polling import polling_kwargs
+
+logger = logging.getLogger(__name__)
+
+API_REACHABLE = REGISTRY.gauge("appbot_telegram_api_reachable", "1 while requests to the Bot API succeed, 0 after repeated failures.")
+REQUEST_FAILURES_TOTAL = REGISTRY.counter("appbot_telegram_request_failures_total", "Bot API requests that failed at the network level.")
+POLLING_PAUSES_TOTAL = REGISTRY.counter("appbot_polling_pauses_total", "Times polling was paused because the Bot API was unreachable.")
+
+
+class ConnectionHealth:
+    """
+    Outcome tracker shared by the bot's request objects. All methods are called
+    from the bot's event loop thread; listeners run there too and must not block.
+    """
+
+    def __init__(self):
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.unhealthy_event = asyncio.Event()
+        self._listeners: List[Callable[[bool], None]] = []
+
+    def add_listener(self, listener: Callable[[bool], None]):
+        """`listener(healthy)` is called whenever the health state flips."""
+        self._listeners.append(listener)
+
+    def record_success(self):
+        self.last_success_at = time.time()
+        self.consecutive_failures = 0
+        if not self.healthy:
+            self._set_healthy(True)
+
+    def record_failure(self, error: Exception):
+        self.last_failure_at = time.time()
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.consecutive_failures += 1
+        REQUEST_FAILURES_TOTAL.inc()
+        threshold = int(utils.get_setting("CONNECTION_FAILURES_BEFORE_PAUSE", 3))
+        if self.healthy and self.consecutive_failures >= threshold:
+            self._set_healthy(False)
+
+    def _set_healthy(self, healthy: bool):
+        self.healthy = healthy
+        API_REACHABLE.set(1 if healthy else 0)
+        if healthy:
+            self.unhealthy_event.clear()
+            logger.info("Connection: Bot API reachable again.")
+        else:
+            self.unhealthy_event.set()
+            logger.warning("Connection: Bot API unreachable after %d failed requests (last error: %s).",
+                           self.consecutive_failures, self.last_error)
+        for listener in list(self._listeners):
+            try:
+                listener(healthy)
+            except Exception as e:
+                logger.error("Connection: Health listener failed: %s", e, exc_info=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+            "last_error": self.last_error,
+        }
+
+
+class HealthTrackingRequest(HTTPXRequest):
+    """HTTPXRequest that reports each request's network outcome to a ConnectionHealth."""
+
+    def __init__(self, health: ConnectionHealth, **kwargs):
+        super().__init__(**kwargs)
+        self.health = health
+        self.connection_pool_size = kwargs.get("connection_pool_size", 1)
+
+    def set_timeouts(self, connect: Optional[float] = None, read: Optional[float] = None,
+                     write: Optional[float] = None, pool: Optional[float] = None):
+        """Changes the default timeouts in place; the client and its open connections are kept."""
+        current = self._client.timeout
+        self._client.timeout = httpx.Timeout(
+            connect=current.connect if connect is None else connect,
+            read=current.read if read is None else read,
+            write=current.write if write is None else write,
+            pool=current.pool if pool is None else pool,
+        )
+
+    async def do_request(self, *args, **kwargs):
+        try:
+            result = await super().do_request(*args, **kwargs)
+        except NetworkError as e:
+            # A pool timeout means the request never left the process; it says nothing about the network.
+            if not isinstance(e.__cause__, httpx.PoolTimeout):
+                self.health.record_failure(e)
+            raise
+        # Any HTTP response, even an error status, proves the API is reachable.
+        self.health.record_success()
+        return result
+
+
+class ConnectivitySupervisor:
+    """Pauses and resumes polling on one Application as its ConnectionHealth changes."""
+
+    def __init__(self, application: Application, health: ConnectionHealth):
+        self.application = application
+        self.health = health
+        self.paused = False
+        self.polling_enabled = True  # False while polling is deliberately paused (warm stop); never resume then
+
+    async def run(self):
+        while self.application.running:
+            await self.health.unhealthy_event.wait()
+            await self._pause_until_reachable()
+
+    async def _pause_until_reachable(self):
+        updater = self.application.updater
+        if updater and updater.running:
+            logger.warning("Connection: Pausing polling until the Bot API is reachable.")
+            self.paused = True
+            POLLING_PAUSES_TOTAL.inc()
+            await updater.stop()
+
+        delay = float(utils.get_setting("CONNECTION_BACKOFF_INITIAL_SECONDS", 1.0))
+        max_delay = float(utils.get_setting("CONNECTION_BACKOFF_MAX_SECONDS", 60.0))
+        while self.application.running and not self.health.healthy:
+            await asyncio.sleep(delay)
+            try:
+                await self.application.bot.get_me()  # Outcome is recorded by HealthTrackingRequest
+            except NetworkError:
+                delay = min(delay * 2, max_delay)
+                logger.info("Connection: Bot API still unreachable, next attempt in %.0fs.", delay)
+
+        if self.paused and self.polling_enabled and self.application.running and updater and not updater.running:
+            logger.info("Connection: Resuming polling.")
+            await updater.start_polling(**polling_kwargs(self.application))
+        self.paused = False
@@ -10,4 +10,14 @@
 
 # You can add other constants here if needed, e.g., default file names
 DEFAULT_SETTINGS_FILE = "settings.json"
-DEFAULT_QUESTIONS_FILE = "questions.json"
\ No newline at end of file
+DEFAULT_QUESTIONS_FILE = "questions.json"
+
+# Human-readable names for metrics/log output (-1 is ConversationHandler.END)
+STATE_NAMES = {
+    STATE_ASKING_QUESTIONS: "asking_questions",
+    STATE_AWAITING_PHOTO: "awaiting_photo",
+    STATE_CONFIRM_CANCEL_EXISTING: "confirm_cancel_existing",
+    STATE_CONFIRM_GLOBAL_CANCEL: "confirm_global_cancel",
+    -1: "end",
+    None: "none",
+}
@@ -0,0 +1,331 @@
+# application_bot/daemon.py
+"""
+Headless daemon: runs the bot without the pywebview GUI and exposes the same
+management operations as PyWebviewApi over a local control API (JSON over HTTP).
+
+On POSIX the API listens on a Unix socket (CONTROL_SOCKET, or --socket; mode
+0600). Over TCP (--host/--port, an empty CONTROL_SOCKET, or on Windows) every
+request must carry `Authorization: Bearer <token>` and a localhost Host header;
+without CONTROL_TOKEN a token is generated and written to CONTROL_TOKEN_FILE (0600).
+
+    GET  /status                 bot state, uptime, last error
+    POST /start, POST /stop      start/pause polling (warm: the bot instance stays alive)
+    GET  /settings, PUT /settings    editable settings (BOT_TOKEN is redacted on GET)
+    GET  /questions, PUT /questions
+    GET  /logs?tail=N&since=SEQ&level=WARNING&search=text
+
+Usage:
+    python -m application_bot.daemon [--host 127.0.0.1 --port 8765 | --socket /run/appbot.sock] [--no-autostart]
+    curl -s --unix-socket /run/appbot.sock http://localhost/status
+    curl -s -H "Authorization: Bearer $(cat control_token)" http://127.0.0.1:8765/status
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from application_bot import utils, management
+from application_bot.bot_runner import BotRunner
+from application_bot.log_buffer import LogRingBuffer
+from application_bot.log_pipeline import install_queue_logging, shutdown_queue_logging
+from application_bot.question_sets import current_question_set
+from application_bot.utils import get_external_file_path, load_settings, load_questions, load_languages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTROL_PORT = 8765
+LOG_BUFFER_CAPACITY = 10_000
+LOG_TAIL_DEFAULT = 200
+MAX_REQUEST_BODY_BYTES = 1024 * 1024
+REDACTED_TOKEN = "[REDACTED]"
+LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1", "::1"})  # Accepted Host headers over TCP (no DNS rebinding)
+UNIX_SOCKETS_SUPPORTED = os.name == "posix" and hasattr(socketserver, "ThreadingUnixStreamServer")
+
+
+class RingBufferLogHandler(logging.Handler):
+    """Keeps formatted log lines in a LogRingBuffer for GET /logs."""
+
+    def __init__(self, buffer: LogRingBuffer):
+        super().__init__()
+        self.buffer = buffer
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.buffer.append_many([(record.levelno, self.format(record))])
+        except Exception:
+            self.handleError(record)
+
+
+class ControlDaemon:
+    def __init__(self, log_buffer: LogRingBuffer, token: str = ""):
+        self.runner = BotRunner()
+        self.log_buffer = log_buffer
+        self.token = token
+        self.started_at = time.time()
+        self.shutdown_requested = threading.Event()
+
+    def status(self) -> Dict[str, Any]:
+        status = self.runner.status()
+        status["daemon_uptime_seconds"] = round(time.time() - self.started_at, 1)
+        status["settings_loaded"] = bool(utils.current_config().SETTINGS)
+        status["questions_count"] = len(questions) if (questions := utils.current_config().QUESTIONS) is not None else None
+        question_set = current_question_set()
+        status["questions_version"] = question_set.version if question_set is not None else None
+        status["log_last_seq"] = self.log_buffer.last_seq
+        return status
+
+    def get_settings(self) -> Dict[str, Any]:
+        settings = management.get_editable_settings()
+        if settings.get("BOT_TOKEN"):
+            settings["BOT_TOKEN"] = REDACTED_TOKEN
+        return settings
+
+    def save_settings(self, data: Any) -> bool:
+        if isinstance(data, dict) and data.get("BOT_TOKEN", REDACTED_TOKEN) == REDACTED_TOKEN and utils.current_config().SETTINGS:
+            # Clients echo back what GET returned; keep the stored token unless a new one is sent.
+            data = dict(data, BOT_TOKEN=utils.current_config().SETTINGS.get("BOT_TOKEN", ""))
+        return management.save_editable_settings(data)
+
+    def logs(self, query: Dict[str, str]) -> Dict[str, Any]:
+        level_name = query.get("level", "").upper()
+        min_level = logging.getLevelName(level_name) if level_name else logging.NOTSET
+        if not isinstance(min_level, int):
+            raise ValueError(f"Unknown log level: {level_name}")
+        if "since" in query:
+            # Incremental polling: clients pass the last seq they have seen.
+            rows = self.log_buffer.rows_since(int(query["since"]), LOG_BUFFER_CAPACITY, min_level, query.get("search", ""))
+            return {"rows": rows, "lastSeq": self.log_buffer.last_seq}
+        tail = int(query.get("tail", LOG_TAIL_DEFAULT))
+        return self.log_buffer.query(-1, max(1, tail), min_level, query.get("search", ""))
+
+
+class _ControlRequestHandler(BaseHTTPRequestHandler):
+    daemon: ControlDaemon = None  # Set on the subclass created per server
+
+    def log_message(self, format: str, *args):  # noqa: A002 - signature from base class
+        logger.debug("Control API: " + format, *args)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "local"
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _host_allowed(self) -> bool:
+        if isinstance(self.server, _UnixHTTPServer):
+            return True  # Only reachable through the filesystem
+        host = urlsplit("//" + self.headers.get("Host", "")).hostname
+        if host in LOCAL_HOSTS:
+            return True
+        self._send_json(403, {"error": "forbidden host"})
+        return False
+
+    def _authorized(self) -> bool:
+        if not self.daemon.token and isinstance(self.server, _UnixHTTPServer):
+            return True
+        if hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {self.daemon.token}"):
+            return True
+        self._send_json(401, {"error": "unauthorized"})
+        return False
+
+    def _read_json_body(self) -> Tuple[bool, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BODY_BYTES:
+            self._send_json(413, {"error": "request body too large"})
+            return False, None
+        try:
+            return True, json.loads(self.rfile.read(length) or b"null")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self._send_json(400, {"error": f"invalid JSON: {e}"})
+            return False, None
+
+    def _route(self, method: str):
+        if not self._host_allowed() or not self._authorized():
+            return
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        daemon = self.daemon
+        try:
+            if method == "GET" and path in ("/", "/status"):
+                self._send_json(200, daemon.status())
+            elif method == "POST" and path == "/start":
+                started = daemon.runner.start()
+                self._send_json(200 if started else 409, {"ok": started, **daemon.status()})
+            elif method == "POST" and path == "/stop":
+                stopped = daemon.runner.stop()
+                self._send_json(200 if stopped else 504, {"ok": stopped, **daemon.status()})
+            elif method == "GET" and path == "/settings":
+                self._send_json(200, daemon.get_settings())
+            elif method == "PUT" and path == "/settings":
+                ok, data = self._read_json_body()
+                if ok:
+                    saved = daemon.save_settings(data)
+                    self._send_json(200 if saved else 400, {"ok": saved})
+            elif method == "GET" and path == "/questions":
+                self._send_json(200, management.get_questions())
+            elif method == "PUT" and path == "/questions":
+                ok, data = self._read_json_body()
+                if ok:
+                    saved = management.save_questions(data)
+                    self._send_json(200 if saved else 400, {"ok": saved})
+            elif method == "GET" and path == "/logs":
+                self._send_json(200, daemon.logs(query))
+            else:
+                self._send_json(404, {"error": f"no route for {method} {path}"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.error("Control API: Error handling %s %s: %s", method, path, e, exc_info=True)
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+
+if UNIX_SOCKETS_SUPPORTED:
+    class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def server_bind(self):
+            socketserver.UnixStreamServer.server_bind(self)
+            # http.server expects these for the request handler's environment.
+            self.server_name = "localhost"
+            self.server_port = 0
+else:
+    class _UnixHTTPServer:  # Never instantiated; keeps the isinstance checks valid
+        pass
+
+
+def control_token(token_file: str) -> str:
+    """CONTROL_TOKEN, or the token in `token_file`, created (mode 0600) with a random token if missing."""
+    token = str(utils.get_setting("CONTROL_TOKEN", "") or "")
+    if token:
+        return token
+    try:
+        with open(token_file, encoding="utf-8") as f:
+            token = f.read().strip()
+    except FileNotFoundError:
+        pass
+    if not token:
+        token = secrets.token_urlsafe(32)
+        fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(token + "\n")
+        logger.info("Control API: Generated an access token in %s", token_file)
+    os.chmod(token_file, 0o600)
+    return token
+
+
+def create_control_server(daemon: ControlDaemon, host: str = "127.0.0.1", port: int = DEFAULT_CONTROL_PORT,
+                          socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    """
+    Binds the control API to a Unix socket (if `socket_path` is given) or to host:port.
+    TCP needs the daemon to have a token: any local user or web page can reach the port.
+    """
+    handler_class = type("ControlRequestHandler", (_ControlRequestHandler,), {"daemon": daemon})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # Stale socket from a previous run
+        server = _UnixHTTPServer(socket_path, handler_class)
+        os.chmod(socket_path, 0o600)
+        logger.info("Control API: Listening on unix socket %s", socket_path)
+    else:
+        if not daemon.token:
+            raise ValueError("the TCP control API needs a CONTROL_TOKEN")
+        server = ThreadingHTTPServer((host, port), handler_class)
+        server.daemon_threads = True
+        logger.info("Control API: Listening on http://%s:%s", host, server.server_address[1])
+    return server
+
+
+def run_daemon(host: str, port: int, socket_path: Optional[str], autostart: bool) -> int:
+    log_buffer = LogRingBuffer(LOG_BUFFER_CAPACITY, escape_html=False)
+    buffer_handler = RingBufferLogHandler(log_buffer)
+    buffer_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    install_queue_logging(extra_handlers=[buffer_handler])
+
+    try:
+        token = str(utils.get_setting("CONTROL_TOKEN", "") or "")
+        if not socket_path:
+            token = control_token(get_external_file_path(utils.get_setting("CONTROL_TOKEN_FILE", "control_token")))
+        daemon = ControlDaemon(log_buffer, token=token)
+        server = create_control_server(daemon, host, port, socket_path)
+    except (OSError, ValueError) as e:
+        logger.critical("Control API: Could not bind: %s", e)
+        return 1
+    server_thread = threading.Thread(target=server.serve_forever, name="ControlAPI", daemon=True)
+    server_thread.start()
+
+    def request_shutdown(signum, _frame):
+        logger.info("Daemon: Received signal %s, shutting down.", signal.Signals(signum).name)
+        daemon.shutdown_requested.set()
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    if autostart:
+        daemon.runner.start()
+    logger.info("Daemon: Running. Send SIGTERM or SIGINT to stop.")
+    daemon.shutdown_requested.wait()
+
+    daemon.runner.close()
+    server.shutdown()
+    server.server_close()
+    if socket_path and os.path.exists(socket_path):
+        os.unlink(socket_path)
+    logger.info("Daemon: Stopped.")
+    shutdown_queue_logging()
+    return 0
+
+
+def main(argv=None) -> int:
+    if not load_settings():
+        sys.exit("CRITICAL: Settings not loaded. Exiting daemon.")
+    config = utils.current_config()
+    parser = argparse.ArgumentParser(description="Run the bot headless with a local control API.")
+    parser.add_argument("--host", help="Listen on TCP instead of the Unix socket (default CONTROL_HOST).")
+    parser.add_argument("--port", type=int, help="Listen on TCP instead of the Unix socket (default CONTROL_PORT).")
+    parser.add_argument("--socket", help="Unix socket path (default CONTROL_SOCKET); takes precedence over --host/--port.")
+    parser.add_argument("--no-autostart", action="store_true", help="Wait for POST /start instead of polling right away.")
+    args = parser.parse_args(argv)
+    socket_path = args.socket
+    if socket_path is None and args.host is None and args.port is None and UNIX_SOCKETS_SUPPORTED:
+        configured_socket = config.SETTINGS.get("CONTROL_SOCKET", "")
+        socket_path = get_external_file_path(configured_socket) if configured_socket else None
+    host = args.host or config.SETTINGS.get("CONTROL_HOST", "127.0.0.1")
+    port = args.port if args.port is not None else int(config.SETTINGS.get("CONTROL_PORT", DEFAULT_CONTROL_PORT))
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if not load_languages():
+        logger.warning("Daemon: Languages not loaded. Bot text might be affected.")
+    if not load_questions():
+        logger.warning("Daemon: Questions not loaded. /apply may be affected.")
+    return run_daemon(host, port, socket_path, autostart=not args.no_autostart)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# application_bot/dashboard.py
+"""
+Aggregates the metrics registry into the small snapshot shown on the GUI's
+dashboard tab. Handlers only ever touch the O(1) counters/histograms in
+metrics.py; rates, windowed percentiles and per-state counts are computed here,
+once per push, from the difference between consecutive samples.
+"""
+import asyncio
+import ctypes
+import os
+import sys
+import time
+from collections import Counter as TallyCounter, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from telegram.ext import Application
+
+from application_bot import metrics
+from application_bot.constants import STATE_NAMES
+
+PERCENTILE_WINDOW_SECONDS = 60.0
+
+_WINDOWED_HISTOGRAMS = {
+    "pdf_render_p95_ms": metrics.PDF_RENDER_SECONDS,
+    "photo_download_p95_ms": metrics.PHOTO_DOWNLOAD_SECONDS,
+}
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if the platform gives no cheap way to read it."""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "rb") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        class _ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+    try:
+        import resource  # macOS: only the peak is available cheaply; ru_maxrss is in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError):
+        return None
+
+
+class DashboardSampler:
+    """Turns metric totals into rates and windowed p95s. Call sample() from one thread only."""
+
+    def __init__(self):
+        self._last_sample_at: Optional[float] = None
+        self._last_updates_total = 0.0
+        # name -> deque of (timestamp, non-cumulative bucket counts) covering the percentile window
+        self._histogram_history: Dict[str, Deque[Tuple[float, list]]] = {name: deque() for name in _WINDOWED_HISTOGRAMS}
+        self._loop_lag_seconds: Optional[float] = None
+
+    def _probe_loop_lag(self, loop: asyncio.AbstractEventLoop):
+        """Schedules a no-op on the bot loop; how late it runs is the lag reported by the next sample."""
+        scheduled_at = time.perf_counter()
+
+        def _record():
+            self._loop_lag_seconds = time.perf_counter() - scheduled_at
+
+        try:
+            loop.call_soon_threadsafe(_record)
+        except RuntimeError:  # Loop closed
+            self._loop_lag_seconds = None
+
+    def _windowed_p95_ms(self, name: str, histogram: metrics.Histogram, now: float) -> Optional[float]:
+        snapshot = histogram.snapshot()
+        if snapshot is None:
+            return None
+        bounds, counts, _ = snapshot
+        history = self._histogram_history[name]
+        history.append((now, counts))
+        while len(history) > 1 and now - history[1][0] >= PERCENTILE_WINDOW_SECONDS:
+            history.popleft()
+        oldest_counts = history[0][1] if len(history) > 1 else [0] * len(counts)
+        p95 = metrics.histogram_quantile(bounds, [c - o for c, o in zip(counts, oldest_counts)], 0.95)
+        return round(p95 * 1000) if p95 is not None else None
+
+    def sample(self, application: Optional[Application], loop: Optional[asyncio.AbstractEventLoop]) -> Dict[str, Any]:
+        now = time.monotonic()
+        updates_total = metrics.UPDATES_TOTAL.total()
+        updates_per_sec = 0.0
+        if self._last_sample_at is not None and now > self._last_sample_at:
+            updates_per_sec = (updates_total - self._last_updates_total) / (now - self._last_sample_at)
+        self._last_sample_at, self._last_updates_total = now, updates_total
+
+        conversations: Dict[str, int] = {}
+        queue_depth = None
+        if application is not None:
+            queue_depth = application.update_queue.qsize()
+            conv_handler = application.bot_data.get("conversation_handler")
+            if conv_handler is not None:
+                # PTB keeps one entry per (chat, user) in progress; values are the state constants.
+                tally = TallyCounter(conv_handler._conversations.values())
+                conversations = {STATE_NAMES.get(state, str(state)): count for state, count in tally.items()}
+
+        watchdog = application.bot_data.get("loop_watchdog") if application is not None else None
+        if watchdog is not None:
+            self._loop_lag_seconds = watchdog.pop_max_lag()  # Worst lag since the previous sample
+        elif loop is not None and loop.is_running():
+            self._probe_loop_lag(loop)
+        else:
+            self._loop_lag_seconds = None
+
+        rss = current_rss_bytes()
+        snapshot = {
+            "updates_per_sec": round(updates_per_sec, 1),
+            "applications_in_progress": int(metrics.CONVERSATIONS_IN_FLIGHT.value()),
+            "conversations": conversations,
+            "queue_depth": queue_depth,
+            "admin_delivery_backlog": int(metrics.ADMIN_DELIVERY_BACKLOG.value()),
+            "memory_rss_mb": round(rss / (1024 * 1024), 1) if rss is not None else None,
+            "loop_lag_ms": round(self._loop_lag_seconds * 1000, 1) if self._loop_lag_seconds is not None else None,
+        }
+        for name, histogram in _WINDOWED_HISTOGRAMS.items():
+            snapshot[name] = self._windowed_p95_ms(name, histogram, now)
+        return snapshot
@@ -0,0 +1,282 @@
+# application_bot/devtools/benchmarks.py
+"""
+Micro-benchmarks for the bot's hot functions.
+
+    python -m application_bot.devtools.benchmarks                     # run all, print table
+    python -m application_bot.devtools.benchmarks -k pdf --rounds 3  # only names containing "pdf"
+    python -m application_bot.devtools.benchmarks --output bench/2026-10.json --compare bench/prev.json
+
+All fixtures (questions, languages, photos, settings) are generated into a
+temp directory, so results do not depend on the local settings.json.
+Results are written as JSON so runs from different releases can be compared.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from PIL import Image as PILImage
+
+from application_bot import utils
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FORMAT_VERSION = 1
+
+
+class BenchmarkCase:
+    def __init__(self, name: str, func: Callable[[], Any], setup: Optional[Callable[[], None]] = None,
+                 teardown: Optional[Callable[[], None]] = None, max_iterations: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.teardown = teardown
+        self.max_iterations = max_iterations
+
+
+def _time_iterations(func: Callable[[], Any], iterations: int) -> float:
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for _ in range(iterations):
+        func()
+    return perf_counter() - started
+
+
+def _calibrate(func: Callable[[], Any], target_seconds: float, max_iterations: Optional[int]) -> int:
+    """Doubles the iteration count until one round takes roughly `target_seconds`."""
+    iterations = 1
+    while True:
+        elapsed = _time_iterations(func, iterations)
+        if elapsed >= target_seconds or (max_iterations and iterations >= max_iterations):
+            return iterations
+        if elapsed <= 0:
+            iterations *= 10
+        else:
+            iterations = max(iterations + 1, int(iterations * target_seconds / elapsed * 1.1))
+        if max_iterations:
+            iterations = min(iterations, max_iterations)
+
+
+def run_case(case: BenchmarkCase, rounds: int, target_seconds: float) -> Dict[str, Any]:
+    if case.setup:
+        case.setup()
+    try:
+        case.func()  # warm-up (first-call caches, imports)
+        iterations = _calibrate(case.func, target_seconds, case.max_iterations)
+        per_call = [_time_iterations(case.func, iterations) / iterations for _ in range(rounds)]
+    finally:
+        if case.teardown:
+            case.teardown()
+    mean = statistics.fmean(per_call)
+    return {
+        "name": case.name,
+        "iterations_per_round": iterations,
+        "rounds": rounds,
+        "mean_us": mean * 1e6,
+        "median_us": statistics.median(per_call) * 1e6,
+        "min_us": min(per_call) * 1e6,
+        "stdev_us": (statistics.stdev(per_call) * 1e6) if len(per_call) > 1 else 0.0,
+        "ops_per_sec": (1.0 / mean) if mean else 0.0,
+    }
+
+
+class BenchmarkFixtures:
+    """Generates synthetic data files and settings in a temp directory and swaps them into utils."""
+
+    def __init__(self, num_questions: int = 25, photo_resolution: tuple = (1280, 960)):
+        self.num_questions = num_questions
+        self.photo_resolution = photo_resolution
+        self._tmp = tempfile.TemporaryDirectory(prefix="appbot_bench_")
+        self.root = self._tmp.name
+        self._saved_globals = None
+        self.photo_paths: List[str] = []
+
+    def __enter__(self) -> "BenchmarkFixtures":
+        config = utils.current_config()
+        self._saved_globals = (copy.deepcopy(config.SETTINGS), copy.deepcopy(config.QUESTIONS), copy.deepcopy(config.LANGUAGES_CACHE))
+        self._write_fixtures()
+        return self
+
+    def __exit__(self, *exc_info):
+        config = utils.current_config()
+        config.SETTINGS, config.QUESTIONS, config.LANGUAGES_CACHE = self._saved_globals
+        self._tmp.cleanup()
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def _write_fixtures(self):
+        os.makedirs(self.path("applications"), exist_ok=True)
+        os.makedirs(self.path("temp_photos"), exist_ok=True)
+
+        self.questions = [{"id": f"q_{i}", "text": f"Synthetic question number {i}: please describe item {i}?"}
+                          for i in range(self.num_questions)]
+        with open(self.path("questions.json"), "w", encoding="utf-8") as f:
+            json.dump(self.questions, f, ensure_ascii=False, indent=2)
+
+        # Real language packs (so PDF/i18n texts are representative), plus a synthetic bulky pack.
+        with open(utils.get_internal_data_path("languages.json"), "r", encoding="utf-8") as f:
+            languages = json.load(f)
+        languages["xx"] = {f"synthetic_key_{i}": f"Synthetic text {i} with {{placeholder}}" for i in range(2000)}
+        with open(self.path("languages.json"), "w", encoding="utf-8") as f:
+            json.dump(languages, f, ensure_ascii=False, indent=4)
+
+        width, height = self.photo_resolution
+        for i in range(5):
+            img = PILImage.linear_gradient("L").resize((width, height)).convert("RGB")
+            photo_path = self.path("temp_photos", f"bench_{i}.jpg")
+            img.save(photo_path, format="JPEG", quality=85)
+            self.photo_paths.append(photo_path)
+
+        utils.current_config().SETTINGS = {
+            "QUESTIONS_FILE": self.path("questions.json"),
+            "LANGUAGES_FILE": self.path("languages.json"),
+            "APPLICATION_FOLDER": self.path("applications"),
+            "TEMP_PHOTO_FOLDER": self.path("temp_photos"),
+            "DEFAULT_LANG": "en",
+        }
+        utils._ensure_default_settings_keys()
+        utils.load_languages()
+        utils.load_questions()
+
+    def clear_applications(self):
+        folder = self.path("applications")
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
+
+
+def build_cases(fx: BenchmarkFixtures) -> List[BenchmarkCase]:
+    # Imported lazily so `--help` stays fast and import errors surface per run.
+    from application_bot.handlers.command_handlers import get_user_lang
+    from application_bot.handlers.conversation_logic import check_rate_limit
+    from application_bot.pdf_generator import _get_and_register_font_from_settings, create_application_pdf
+    from application_bot.session import get_session
+
+    cases: List[BenchmarkCase] = [
+        BenchmarkCase("get_text.hit", lambda: utils.get_text("apply_intro", "en")),
+        BenchmarkCase("get_text.fallback_lang", lambda: utils.get_text("apply_intro", "de")),
+        BenchmarkCase("get_text.fallback_key", lambda: utils.get_text("synthetic_key_5", "en", default="x")),
+        BenchmarkCase("get_text.formatted",
+                      lambda: utils.get_text("rate_limit_exceeded", "en", wait_time=7)),
+    ]
+
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=12345, language_code="ru-RU"))
+    cached_context = SimpleNamespace(user_data={})
+    get_session(cached_context.user_data).lang = "en"
+    cases.append(BenchmarkCase("get_user_lang.cached", lambda: get_user_lang(cached_context, update)))
+
+    def first_call():
+        get_user_lang(SimpleNamespace(user_data={}), update)
+
+    cases.append(BenchmarkCase("get_user_lang.first_call", first_call))
+
+    now = time.time()
+    rate_limits = {uid: now - (uid % 1200) for uid in range(1_000_000)}
+    cases.append(BenchmarkCase("check_rate_limit.1M_entries.hit",
+                               lambda: check_rate_limit(rate_limits.get(500_000, 0))))
+    cases.append(BenchmarkCase("check_rate_limit.1M_entries.miss",
+                               lambda: check_rate_limit(rate_limits.get(5_000_000, 0))))
+
+    cases.append(BenchmarkCase("pdf.register_font", _get_and_register_font_from_settings, max_iterations=50))
+
+    answers = {q["id"]: f"Answer text for {q['id']} " * 4 for q in fx.questions}
+    for photo_count in (0, 1, 5):
+        photos = fx.photo_paths[:photo_count]
+
+        def render(photos=photos):
+            create_application_pdf(user_id=1, username="bench", answers=answers,
+                                   photo_file_paths=photos, user_lang="en")
+
+        cases.append(BenchmarkCase(f"pdf.create_application_pdf.{photo_count}_photos", render,
+                                   teardown=fx.clear_applications, max_iterations=20))
+
+    cases.append(BenchmarkCase("load_questions", utils.load_questions))
+    cases.append(BenchmarkCase("load_languages", utils.load_languages))
+    return cases
+
+
+def _environment_info() -> Dict[str, Any]:
+    info = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        info["git_revision"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_revision"] = None
+    return info
+
+
+def run_benchmarks(name_filter: Optional[str] = None, rounds: int = 5, target_seconds: float = 0.2,
+                   photo_resolution: tuple = (1280, 960)) -> Dict[str, Any]:
+    results = []
+    with BenchmarkFixtures(photo_resolution=photo_resolution) as fx:
+        for case in build_cases(fx):
+            if name_filter and name_filter not in case.name:
+                continue
+            result = run_case(case, rounds, target_seconds)
+            results.append(result)
+            print(f"{result['name']:<45} {result['median_us']:>14.2f} us  (±{result['stdev_us']:.2f}, "
+                  f"{result['iterations_per_round']} it x {rounds})", file=sys.stderr)
+    return {"format_version": RESULTS_FORMAT_VERSION, "environment": _environment_info(), "results": results}
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    baseline_by_name = {r["name"]: r for r in baseline.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        previous = baseline_by_name.get(result["name"])
+        if not previous or not previous.get("median_us"):
+            continue
+        ratio = result["median_us"] / previous["median_us"]
+        marker = "  SLOWER" if ratio > 1.10 else ("  faster" if ratio < 0.90 else "")
+        lines.append(f"{result['name']:<45} {previous['median_us']:>12.2f} -> {result['median_us']:>12.2f} us "
+                     f"(x{ratio:.2f}){marker}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for application_bot hot paths.")
+    parser.add_argument("-k", dest="name_filter", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--target-seconds", type=float, default=0.2, help="Approximate duration of one round")
+    parser.add_argument("--photo-size", default="1280x960", help="WIDTHxHEIGHT of synthetic photos")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.WARNING)
+    width, height = (int(v) for v in args.photo_size.lower().split("x"))
+    report = run_benchmarks(args.name_filter, args.rounds, args.target_seconds, (width, height))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare_results(report, baseline)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+# application_bot/devtools/fake_bot_api.py
+"""
+A local stand-in for the Telegram Bot API, good enough to drive the bot
+end-to-end without touching api.telegram.org.
+
+Point the Application at it with
+    create_bot_application(base_url=server.base_url, base_file_url=server.base_file_url)
+
+Supported methods: getMe, deleteWebhook, setWebhook, getWebhookInfo, getUpdates,
+sendMessage, sendDocument, getFile and file downloads. Any other method answers
+`{"ok": true, "result": true}` so the bot never stalls on something we don't model.
+
+With `local_files_dir`, the server behaves like a self-hosted Bot API server in
+local mode: files are written under that directory, getFile returns their absolute
+paths, and sendDocument accepts `file://` URIs (build the bot with local_mode=True).
+"""
+import os
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+FAKE_BOT_ID = 7000000001
+FAKE_BOT_USERNAME = "fake_application_bot"
+
+
+class FakeBotApiState:
+    """Thread-safe store of pending updates, sent messages and uploaded files."""
+
+    def __init__(self, local_files_dir: Optional[str] = None):
+        self.local_files_dir = local_files_dir
+        self._cond = threading.Condition()
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self.webhook_url = ""
+        self.sent_messages: Dict[int, List[Dict[str, Any]]] = {}
+        self.sent_documents: List[Dict[str, Any]] = []
+        self.files: Dict[str, Tuple[str, bytes]] = {}  # file_id -> (file_path, content)
+        self.method_calls: Dict[str, int] = {}
+        self.on_outgoing: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self._last_outgoing = 0.0
+
+    # --- incoming side (what users "send" to the bot) ---
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        with self._cond:
+            update = dict(update)
+            update["update_id"] = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._cond.notify_all()
+            return update["update_id"]
+
+    def next_message_id(self) -> int:
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+            return message_id
+
+    def get_updates(self, offset: int, limit: int, timeout: float) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            if offset:
+                # Telegram semantics: everything below `offset` is confirmed and dropped.
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+            return list(self._updates[:limit])
+
+    def pending_update_count(self) -> int:
+        with self._cond:
+            return len(self._updates)
+
+    def add_file(self, content: bytes, suffix: str = "jpg", file_id: Optional[str] = None) -> Tuple[str, str]:
+        """Registers downloadable content and returns (file_id, file_unique_id)."""
+        file_id = file_id or f"fake-file-{uuid.uuid4().hex}"
+        file_unique_id = file_id[-16:]
+        file_path = f"photos/{file_unique_id}.{suffix}"
+        if self.local_files_dir:
+            file_path = os.path.join(os.path.abspath(self.local_files_dir), file_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(content)
+        with self._cond:
+            self.files[file_id] = (file_path, content)
+        return file_id, file_unique_id
+
+    def has_file(self, file_id: str) -> bool:
+        with self._cond:
+            return file_id in self.files
+
+    def last_activity(self) -> float:
+        """time.monotonic() of the most recent message sent by the bot (0 if none)."""
+        with self._cond:
+            return self._last_outgoing
+
+    def get_file(self, file_id: str) -> Optional[Tuple[str, bytes]]:
+        with self._cond:
+            return self.files.get(file_id)
+
+    def file_by_path(self, file_path: str) -> Optional[bytes]:
+        with self._cond:
+            for stored_path, content in self.files.values():
+                if stored_path == file_path:
+                    return content
+        return None
+
+    # --- outgoing side (what the bot sends) ---
+
+    def record_outgoing(self, method: str, chat_id: int, payload: Dict[str, Any]):
+        with self._cond:
+            self.sent_messages.setdefault(chat_id, []).append(payload)
+            if method == "sendDocument":
+                self.sent_documents.append(payload)
+            self._last_outgoing = time.monotonic()
+            self._cond.notify_all()
+        if self.on_outgoing:
+            self.on_outgoing(method, payload)
+
+    def count_method(self, method: str):
+        with self._cond:
+            self.method_calls[method] = self.method_calls.get(method, 0) + 1
+
+    def wait_for_messages(self, chat_id: int, count: int, timeout: float) -> bool:
+        """Blocks until at least `count` messages were sent to `chat_id`."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.sent_messages.get(chat_id, [])) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def message_count(self, chat_id: int) -> int:
+        with self._cond:
+            return len(self.sent_messages.get(chat_id, []))
+
+
+def _parse_request_params(handler: BaseHTTPRequestHandler) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """Returns (params, files) for form-encoded, multipart, JSON or query-string requests."""
+    params: Dict[str, Any] = {}
+    files: Dict[str, bytes] = {}
+    query = urlparse(handler.path).query
+    for key, values in parse_qs(query).items():
+        params[key] = values[-1]
+
+    length = int(handler.headers.get("Content-Length") or 0)
+    if not length:
+        return params, files
+    body = handler.rfile.read(length)
+    content_type = handler.headers.get("Content-Type", "")
+
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        for key, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items():
+            params[key] = values[-1]
+    elif content_type.startswith("application/json"):
+        params.update(json.loads(body or b"{}"))
+    elif content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+        )
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if not name:
+                continue
+            payload = part.get_payload(decode=True) or b""
+            if part.get_filename() is not None:
+                files[name] = payload
+            else:
+                params[name] = payload.decode("utf-8")
+    return params, files
+
+
+def _decode_json_param(value: Any) -> Any:
+    """PTB sends non-primitive parameters (reply_markup etc.) as JSON strings."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+class _FakeBotApiHandler(BaseHTTPRequestHandler):
+    server: "FakeBotApiServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args):  # noqa: A002 - signature from base class
+        logger.debug("FakeBotApi: " + format, *args)
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_bytes(self, content: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _dispatch(self):
+        path = unquote(urlparse(self.path).path)
+        token = self.server.token
+
+        file_prefix = f"/file/bot{token}/"
+        if path.startswith(file_prefix):
+            content = self.server.state.file_by_path(path[len(file_prefix):])
+            if content is None:
+                self._send_json({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+            else:
+                self._send_bytes(content)
+            return
+
+        method_prefix = f"/bot{token}/"
+        if not path.startswith(method_prefix):
+            self._send_json({"ok": False, "error_code": 401, "description": "Unauthorized"}, 401)
+            return
+
+        method = path[len(method_prefix):]
+        params, files = _parse_request_params(self)
+        self.server.state.count_method(method)
+        handler = getattr(self.server, f"api_{method}", None)
+        try:
+            result = handler(params, files) if handler else True
+        except Exception as e:
+            logger.error("FakeBotApi: Error handling %s: %s", method, e, exc_info=True)
+            self._send_json({"ok": False, "error_code": 400, "description": f"Bad Request: {e}"}, 400)
+            return
+        self._send_json({"ok": True, "result": result})
+
+
+class FakeBotApiServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that speaks enough of the Bot API for the bot's handlers.
+    Use `start()`/`stop()` or the context manager protocol.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token: str = "123456:FAKE-TOKEN",
+                 local_files_dir: Optional[str] = None):
+        super().__init__((host, port), _FakeBotApiHandler)
+        self.token = token
+        self.state = FakeBotApiState(local_files_dir)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def root_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.root_url}/bot"
+
+    @property
+    def base_file_url(self) -> str:
+        return f"{self.root_url}/file/bot"
+
+    def handle_error(self, request, client_address):
+        # Long polls cut short by the client hanging up are expected; don't dump tracebacks for them.
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self) -> "FakeBotApiServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="FakeBotApiServer", daemon=True)
+        self._thread.start()
+        logger.info("FakeBotApi: Listening on %s", self.root_url)
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("FakeBotApi: Stopped.")
+
+    def __enter__(self) -> "FakeBotApiServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- object builders ---
+
+    @staticmethod
+    def bot_user() -> Dict[str, Any]:
+        return {
+            "id": FAKE_BOT_ID, "is_bot": True, "first_name": "Fake Application Bot",
+            "username": FAKE_BOT_USERNAME, "can_join_groups": False,
+            "can_read_all_group_messages": False, "supports_inline_queries": False,
+        }
+
+    def _outgoing_message(self, chat_id: int, **fields) -> Dict[str, Any]:
+        message = {
+            "message_id": self.state.next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": self.bot_user(),
+        }
+        message.update(fields)
+        return message
+
+    # --- Bot API methods ---
+
+    def api_getMe(self, params, files):
+        return self.bot_user()
+
+    def api_deleteWebhook(self, params, files):
+        self.state.webhook_url = ""
+        return True
+
+    def api_setWebhook(self, params, files):
+        self.state.webhook_url = params.get("url", "")
+        return True
+
+    def api_getWebhookInfo(self, params, files):
+        return {"url": self.state.webhook_url, "has_custom_certificate": False,
+                "pending_update_count": self.state.pending_update_count()}
+
+    def api_getUpdates(self, params, files):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        return self.state.get_updates(offset, limit, timeout)
+
+    def api_sendMessage(self, params, files):
+        chat_id = int(params["chat_id"])
+        message = self._outgoing_message(chat_id, text=params.get("text", ""))
+        reply_markup = _decode_json_param(params.get("reply_markup"))
+        self.state.record_outgoing("sendMessage", chat_id, {"method": "sendMessage", "message": message,
+                                                            "reply_markup": reply_markup,
+                                                            "received_at": time.monotonic()})
+        return message
+
+    def api_sendDocument(self, params, files):
+        chat_id = int(params["chat_id"])
+        content = files.get("document")
+        if content is None:
+            content = self._document_by_reference(params.get("document") or "")
+        file_id, file_unique_id = self.state.add_file(content, suffix="pdf")
+        document = {"file_id": file_id, "file_unique_id": file_unique_id,
+                    "file_name": "application.pdf", "mime_type": "application/pdf",
+                    "file_size": len(content)}
+        message = self._outgoing_message(chat_id, document=document, caption=params.get("caption"))
+        self.state.record_outgoing("sendDocument", chat_id, {"method": "sendDocument", "message": message,
+                                                             "size": len(content),
+                                                             "received_at": time.monotonic()})
+        return message
+
+    def _document_by_reference(self, reference: str) -> bytes:
+        """Content of a document sent by file_id or, in local mode, by file:// URI."""
+        if reference.startswith("file://"):
+            if not self.state.local_files_dir:
+                raise ValueError("file:// URIs are only accepted in local mode")
+            with open(unquote(urlparse(reference).path), "rb") as f:
+                return f.read()
+        stored = self.state.get_file(reference)
+        if stored is None:
+            raise ValueError("wrong file identifier/HTTP URL specified")
+        return stored[1]
+
+    def api_getFile(self, params, files):
+        file_id = params["file_id"]
+        stored = self.state.get_file(file_id)
+        if stored is None:
+            raise ValueError("wrong file_id")
+        file_path, content = stored
+        return {"file_id": file_id, "file_unique_id": file_id[-16:],
+                "file_size": len(content), "file_path": file_path}
+
+    # --- helpers for simulated users ---
+
+    def user_payload(self, user_id: int, lang: str = "en") -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}",
+                "username": f"user{user_id}", "language_code": lang}
+
+    def _user_message(self, user_id: int, **fields) -> Dict[str, Any]:
+        message = {
+            "message_id": self.state.next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self.user_payload(user_id),
+        }
+        message.update(fields)
+        return message
+
+    def send_text(self, user_id: int, text: str) -> int:
+        fields: Dict[str, Any] = {"text": text}
+        if text.startswith("/"):
+            command_length = len(text.split()[0])
+            fields["entities"] = [{"type": "bot_command", "offset": 0, "length": command_length}]
+        return self.state.push_update({"message": self._user_message(user_id, **fields)})
+
+    def send_photo(self, user_id: int, content: bytes, width: int, height: int) -> int:
+        file_id, file_unique_id = self.state.add_file(content)
+        photo_size = {"file_id": file_id, "file_unique_id": file_unique_id,
+                      "width": width, "height": height, "file_size": len(content)}
+        return self.state.push_update({"message": self._user_message(user_id, photo=[photo_size])})
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a fake Telegram Bot API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--token", default="123456:FAKE-TOKEN")
+    parser.add_argument("--local-files-dir", help="Emulate local mode, keeping files in this directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    server = FakeBotApiServer(args.host, args.port, args.token, args.local_files_dir)
+    logger.info("FakeBotApi: base_url=%s base_file_url=%s", server.base_url, server.base_file_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# application_bot/devtools/load_generator.py
+"""
+End-to-end load generator: runs the real Application (as built by
+create_bot_application) against FakeBotApiServer and drives N simulated
+applicants through /apply, every question, the photos and finalization.
+
+    python -m application_bot.devtools.load_generator --users 200 --concurrency 50
+
+Reports overall throughput and p50/p95/p99 latency per stage.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from PIL import Image as PILImage
+
+from application_bot import utils
+from application_bot.devtools.fake_bot_api import FakeBotApiServer
+from application_bot.main import create_bot_application, run_bot_async, stop_bot_async
+from application_bot.sharding import ShardedBot
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("apply", "answer", "photo", "finalize")
+FIRST_USER_ID = 100_000_000
+ADMIN_USER_ID = 42
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def make_jpeg(width: int, height: int, quality: int = 85) -> bytes:
+    """Synthetic photo with some structure so JPEG sizes are realistic."""
+    img = PILImage.linear_gradient("L").resize((width, height)).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def configure_settings_for_load(server: FakeBotApiServer, workdir: str, num_photos: int,
+                                num_questions: Optional[int], record_file: Optional[str] = None):
+    """Loads the normal settings, then points folders/token/admins at throwaway values (in memory only)."""
+    utils.load_settings()
+    utils.load_languages()
+    utils.load_questions()
+    config = utils.current_config()
+    config.SETTINGS["BOT_TOKEN"] = server.token
+    config.SETTINGS["ADMIN_USER_IDS"] = str(ADMIN_USER_ID)
+    config.SETTINGS["APPLICATION_FOLDER"] = f"{workdir}/applications"
+    config.SETTINGS["TEMP_PHOTO_FOLDER"] = f"{workdir}/temp_photos"
+    config.SETTINGS["APPLICATION_PHOTO_NUMB"] = num_photos
+    config.SETTINGS["RATE_LIMIT_SECONDS"] = 0
+    config.SETTINGS["RECORD_UPDATES_FILE"] = os.path.abspath(record_file) if record_file else ""
+    if num_questions is not None:
+        config.QUESTIONS = [{"id": f"q{i}", "text": f"Synthetic question #{i}?"} for i in range(num_questions)]
+    os.makedirs(config.SETTINGS["APPLICATION_FOLDER"], exist_ok=True)
+    os.makedirs(config.SETTINGS["TEMP_PHOTO_FOLDER"], exist_ok=True)
+
+
+class SimulatedUser:
+    def __init__(self, server: FakeBotApiServer, user_id: int, num_questions: int, num_photos: int,
+                 photo_bytes: bytes, photo_size: tuple, step_timeout: float, think_time: float = 0.0):
+        self.server = server
+        self.user_id = user_id
+        self.num_questions = num_questions
+        self.num_photos = num_photos
+        self.photo_bytes = photo_bytes
+        self.photo_size = photo_size
+        self.step_timeout = step_timeout
+        self.think_time = think_time
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.error: Optional[str] = None
+
+    def _step(self, stage: str, send, expected_replies: int) -> bool:
+        if self.think_time:
+            # Real users never answer within microseconds of the bot's reply. Without a pause we mostly
+            # measure the window in which ConversationHandler has sent the reply but not yet stored the new state.
+            time.sleep(self.think_time)
+        target = self.server.state.message_count(self.user_id) + expected_replies
+        started = time.perf_counter()
+        send()
+        if not self.server.state.wait_for_messages(self.user_id, target, self.step_timeout):
+            self.error = f"timeout in stage '{stage}'"
+            return False
+        self.latencies[stage].append(time.perf_counter() - started)
+        return True
+
+    def run(self) -> "SimulatedUser":
+        # /apply -> intro + first question (or photo prompt / finalize when there are no questions).
+        if not self._step("apply", lambda: self.server.send_text(self.user_id, "/apply"), 2):
+            return self
+        for i in range(self.num_questions):
+            answer = f"Answer {i} from {self.user_id}"
+            is_last = i == self.num_questions - 1
+            stage = "finalize" if is_last and self.num_photos == 0 else "answer"
+            expected = 1  # next question, photo prompt or the "submitted" message
+            if not self._step(stage, lambda a=answer: self.server.send_text(self.user_id, a), expected):
+                return self
+        width, height = self.photo_size
+        for i in range(self.num_photos):
+            is_last = i == self.num_photos - 1
+            stage = "finalize" if is_last else "photo"
+            # Last photo: "processing" + "submitted"; otherwise "collecting more".
+            expected = 2 if is_last else 1
+            if not self._step(stage, lambda: self.server.send_photo(self.user_id, self.photo_bytes, width, height), expected):
+                return self
+        return self
+
+
+def _summarize(users: List[SimulatedUser], wall_seconds: float, server: FakeBotApiServer) -> Dict[str, object]:
+    completed = [u for u in users if u.error is None]
+    report: Dict[str, object] = {
+        "users": len(users),
+        "completed": len(completed),
+        "failed": len(users) - len(completed),
+        "wall_seconds": round(wall_seconds, 3),
+        "applications_per_second": round(len(completed) / wall_seconds, 3) if wall_seconds else 0.0,
+        "admin_documents": len(server.state.sent_documents),
+        "api_calls": dict(sorted(server.state.method_calls.items())),
+        "stages": {},
+    }
+    for stage in STAGES:
+        samples = sorted(s for u in users for s in u.latencies[stage])
+        if not samples:
+            continue
+        report["stages"][stage] = {
+            "count": len(samples),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2),
+        }
+    errors: Dict[str, int] = {}
+    for u in users:
+        if u.error:
+            errors[u.error] = errors.get(u.error, 0) + 1
+    if errors:
+        report["errors"] = errors
+    return report
+
+
+def run_load(users: int = 50, concurrency: int = 20, num_photos: int = 1,
+             num_questions: Optional[int] = None, photo_size: tuple = (1280, 960),
+             step_timeout: float = 60.0, record_file: Optional[str] = None,
+             think_time: float = 0.05, local_mode: bool = False, workers: int = 0) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory(prefix="appbot_load_") as workdir, \
+            FakeBotApiServer(local_files_dir=f"{workdir}/bot_api_files" if local_mode else None) as server:
+        configure_settings_for_load(server, workdir, num_photos, num_questions, record_file)
+        if workers:
+            # Ingress in this process, N worker processes sharing a state file (see sharding.py).
+            application = None
+            sharded = ShardedBot(workers, f"{workdir}/shared_state.sqlite3", base_url=server.base_url,
+                                 base_file_url=server.base_file_url, local_mode=local_mode)
+            bot_main, is_polling = sharded.run(), lambda: sharded.ready
+        else:
+            application = create_bot_application(base_url=server.base_url, base_file_url=server.base_file_url,
+                                                 local_mode=local_mode)
+            if application is None:
+                raise RuntimeError("create_bot_application() returned None")
+            bot_main, is_polling = run_bot_async(application), lambda: application.updater and application.updater.running
+
+        bot_loop = asyncio.new_event_loop()
+        bot_thread = threading.Thread(target=bot_loop.run_forever, name="LoadGenBot", daemon=True)
+        bot_thread.start()
+        bot_run = asyncio.run_coroutine_threadsafe(bot_main, bot_loop)
+        # Wait until the bot is polling before firing traffic.
+        deadline = time.monotonic() + 15
+        while not is_polling() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        photo_bytes = make_jpeg(*photo_size)
+        question_count = len(utils.current_config().QUESTIONS or [])
+        simulated = [SimulatedUser(server, FIRST_USER_ID + i, question_count, num_photos,
+                                   photo_bytes, photo_size, step_timeout, think_time) for i in range(users)]
+        logger.info("LoadGen: %s users, concurrency %s, %s questions, %s photo(s).", users, concurrency, question_count, num_photos)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="LoadGenUser") as pool:
+            list(pool.map(SimulatedUser.run, simulated))
+        wall_seconds = time.perf_counter() - started
+
+        stop = stop_bot_async(application) if application is not None else sharded.stop()
+        asyncio.run_coroutine_threadsafe(stop, bot_loop).result(timeout=60)
+        bot_run.result(timeout=30)
+        bot_loop.call_soon_threadsafe(bot_loop.stop)
+        bot_thread.join(timeout=10)
+        bot_loop.close()
+        return _summarize(simulated, wall_seconds, server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive simulated applicants through the bot against a fake Bot API.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--photos", type=int, default=1, help="APPLICATION_PHOTO_NUMB for the run")
+    parser.add_argument("--questions", type=int, default=None, help="Use N synthetic questions instead of questions.json")
+    parser.add_argument("--photo-size", default="1280x960", help="WIDTHxHEIGHT of the synthetic photos")
+    parser.add_argument("--step-timeout", type=float, default=60.0)
+    parser.add_argument("--think-ms", type=float, default=50.0, help="Pause before each simulated user action")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--record", help="Record the generated updates to this .jsonl.gz file (for replay.py)")
+    parser.add_argument("--local-mode", action="store_true",
+                        help="Emulate a self-hosted Bot API server in local mode (files exchanged by path)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run the sharded deployment (sharding.py) with this many worker processes")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        level=logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    width, height = (int(v) for v in args.photo_size.lower().split("x"))
+    report = run_load(args.users, args.concurrency, args.photos, args.questions, (width, height), args.step_timeout,
+                      args.record, args.think_ms / 1000.0, args.local_mode, args.workers)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
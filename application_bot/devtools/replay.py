@@ -0,0 +1,146 @@
+# application_bot/devtools/replay.py
+"""
+Replays an update log written by UpdateRecorder (RECORD_UPDATES_FILE) into an
+Application built by create_bot_application, running against FakeBotApiServer.
+
+    python -m application_bot.devtools.replay traffic.jsonl.gz              # original timing
+    python -m application_bot.devtools.replay traffic.jsonl.gz --speed 10   # 10x faster
+    python -m application_bot.devtools.replay traffic.jsonl.gz --speed 0    # as fast as possible
+
+Updates go through the fake server's getUpdates, so the whole polling pipeline is
+exercised. Photos referenced by recorded file_ids are served as synthetic JPEGs of
+the recorded size, since the real files only exist on Telegram's servers.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from application_bot import utils
+from application_bot.devtools.fake_bot_api import FakeBotApiServer
+from application_bot.devtools.load_generator import make_jpeg
+from application_bot.main import create_bot_application, run_bot_async, stop_bot_async
+from application_bot.update_recorder import read_update_log
+
+logger = logging.getLogger(__name__)
+
+MAX_SYNTHETIC_PHOTO_SIDE = 2560
+
+
+def _register_photo_files(server: FakeBotApiServer, update: Dict[str, Any], jpeg_cache: Dict[tuple, bytes]):
+    message = update.get("message") or update.get("edited_message") or {}
+    for photo_size in message.get("photo") or []:
+        file_id = photo_size.get("file_id")
+        if not file_id or server.state.has_file(file_id):
+            continue
+        width = min(int(photo_size.get("width") or 640), MAX_SYNTHETIC_PHOTO_SIDE)
+        height = min(int(photo_size.get("height") or 480), MAX_SYNTHETIC_PHOTO_SIDE)
+        key = (width, height)
+        if key not in jpeg_cache:
+            jpeg_cache[key] = make_jpeg(width, height)
+        server.state.add_file(jpeg_cache[key], file_id=file_id)
+
+
+def _configure_settings(server: FakeBotApiServer, workdir: str):
+    utils.load_settings()
+    utils.load_languages()
+    utils.load_questions()
+    config = utils.current_config()
+    config.SETTINGS["BOT_TOKEN"] = server.token
+    config.SETTINGS["APPLICATION_FOLDER"] = os.path.join(workdir, "applications")
+    config.SETTINGS["TEMP_PHOTO_FOLDER"] = os.path.join(workdir, "temp_photos")
+    config.SETTINGS["RECORD_UPDATES_FILE"] = ""  # never re-record a replay
+    os.makedirs(config.SETTINGS["APPLICATION_FOLDER"], exist_ok=True)
+    os.makedirs(config.SETTINGS["TEMP_PHOTO_FOLDER"], exist_ok=True)
+
+
+def replay(log_path: str, speed: float = 1.0, settle_seconds: float = 3.0,
+           max_updates: Optional[int] = None) -> Dict[str, Any]:
+    entries: List = list(read_update_log(log_path))
+    if max_updates is not None:
+        entries = entries[:max_updates]
+    if not entries:
+        raise ValueError(f"No updates found in {log_path}")
+
+    with FakeBotApiServer() as server, tempfile.TemporaryDirectory(prefix="appbot_replay_") as workdir:
+        _configure_settings(server, workdir)
+        application = create_bot_application(base_url=server.base_url, base_file_url=server.base_file_url)
+        if application is None:
+            raise RuntimeError("create_bot_application() returned None")
+
+        bot_loop = asyncio.new_event_loop()
+        bot_thread = threading.Thread(target=bot_loop.run_until_complete, args=(run_bot_async(application),),
+                                      name="ReplayBot", daemon=True)
+        bot_thread.start()
+        deadline = time.monotonic() + 15
+        while not (application.updater and application.updater.running) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        jpeg_cache: Dict[tuple, bytes] = {}
+        first_timestamp = entries[0][0]
+        started = time.monotonic()
+        max_lag = 0.0
+        for timestamp, update in entries:
+            if speed > 0:
+                due = started + (timestamp - first_timestamp) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            _register_photo_files(server, update, jpeg_cache)
+            update = {k: v for k, v in update.items() if k != "update_id"}
+            server.state.push_update(update)
+        feed_seconds = time.monotonic() - started
+
+        # Let the bot drain: no pending updates and no outgoing traffic for `settle_seconds`.
+        while True:
+            idle_since = max(server.state.last_activity(), started + feed_seconds)
+            if server.state.pending_update_count() == 0 and time.monotonic() - idle_since >= settle_seconds:
+                break
+            time.sleep(0.1)
+        total_seconds = time.monotonic() - started - settle_seconds
+
+        asyncio.run_coroutine_threadsafe(stop_bot_async(application), bot_loop).result(timeout=30)
+        bot_thread.join(timeout=10)
+        bot_loop.close()
+
+        recorded_span = entries[-1][0] - first_timestamp
+        return {
+            "log": log_path,
+            "updates": len(entries),
+            "speed": speed if speed > 0 else "max",
+            "recorded_span_seconds": round(recorded_span, 3),
+            "feed_seconds": round(feed_seconds, 3),
+            "processing_seconds": round(total_seconds, 3),
+            "updates_per_second": round(len(entries) / total_seconds, 2) if total_seconds > 0 else None,
+            "max_feed_lag_seconds": round(max_lag, 3),
+            "bot_messages": sum(len(v) for v in server.state.sent_messages.values()),
+            "admin_documents": len(server.state.sent_documents),
+            "api_calls": dict(sorted(server.state.method_calls.items())),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded update log against the fake Bot API.")
+    parser.add_argument("log", help="Path to a RECORD_UPDATES_FILE log (.jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed multiplier; 0 replays as fast as possible")
+    parser.add_argument("--settle", type=float, default=3.0, help="Idle seconds that mark the end of processing")
+    parser.add_argument("--limit", type=int, default=None, help="Only replay the first N updates")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        level=logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(json.dumps(replay(args.log, args.speed, args.settle, args.limit), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# application_bot/drain.py
+"""
+Graceful drain of application finalizations on shutdown.
+
+Every finalization (PDF rendering, admin delivery, the "submitted" reply) runs
+as a FinalizationJob that records which of its steps are done. On shutdown,
+stop_bot_async() first stops polling, then calls drain_finalizations():
+  * finalizations already running get up to DRAIN_TIMEOUT_SECONDS to finish;
+  * the ones still running at the deadline are cancelled and written to
+    DRAIN_CHECKPOINT_FOLDER, one JSON file per job, with their temp photos kept;
+  * finalizations that start while the drain is on (updates that were already
+    queued) are checkpointed right away instead of racing the deadline.
+The next start finishes the checkpointed jobs, skipping the steps that are
+already done (conversation_logic.resume_checkpointed_finalizations). Delivery
+is at-least-once: an admin send that was in flight at the deadline is repeated.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from application_bot import async_fs, utils
+from application_bot.metrics import REGISTRY
+from application_bot.utils import get_external_file_path
+
+logger = logging.getLogger(__name__)
+
+DRAIN_FINALIZATIONS_TOTAL = REGISTRY.counter("appbot_drain_finalizations_total",
+                                             "Finalizations seen by the shutdown drain, by outcome.", ["outcome"])
+
+IN_FLIGHT_KEY = "in_flight_finalizations"
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+class FinalizationJob:
+    __slots__ = ("job_id", "user_id", "username", "chat_id", "lang", "question_set_version", "answers",
+                 "photo_paths", "created_at", "pdf_path", "admin_document_id", "admins_done", "applicant_notified",
+                 "checkpointed")
+
+    def __init__(self, user_id: int, username: Optional[str], chat_id: int, lang: Optional[str],
+                 question_set_version: Optional[str], answers: Dict[str, str], photo_paths: List[str]):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.username = username
+        self.chat_id = chat_id
+        self.lang = lang
+        self.question_set_version = question_set_version
+        self.answers = dict(answers)
+        self.photo_paths = list(photo_paths)
+        self.created_at = time.time()
+        # Progress, filled in step by step:
+        self.pdf_path: Optional[str] = None
+        self.admin_document_id: Optional[str] = None  # Telegram file_id once the PDF was uploaded to one admin
+        self.admins_done: List[int] = []
+        self.applicant_notified = False
+        self.checkpointed = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__ if name != "checkpointed"}
+        data["format"] = CHECKPOINT_FORMAT_VERSION
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FinalizationJob":
+        if data.get("format") != CHECKPOINT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint format: {data.get('format')!r}")
+        job = cls.__new__(cls)
+        for name in cls.__slots__:
+            if name != "checkpointed":
+                setattr(job, name, data[name])
+        job.checkpointed = False
+        return job
+
+    def __repr__(self) -> str:
+        return (f"FinalizationJob(user_id={self.user_id!r}, pdf={'yes' if self.pdf_path else 'no'}, "
+                f"admins_done={len(self.admins_done)}, applicant_notified={self.applicant_notified!r})")
+
+
+class InFlightFinalizations:
+    def __init__(self):
+        self._jobs: Dict[asyncio.Task, FinalizationJob] = {}
+        self.draining = False
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    @contextlib.contextmanager
+    def track(self, job: FinalizationJob) -> Iterator[FinalizationJob]:
+        task = asyncio.current_task()
+        self._jobs[task] = job
+        try:
+            yield job
+        finally:
+            self._jobs.pop(task, None)
+
+    async def drain(self, timeout: float) -> int:
+        """Waits up to `timeout` for the running jobs, then checkpoints and cancels the rest; returns how many."""
+        self.draining = True
+        if not self._jobs:
+            return 0
+        running = len(self._jobs)
+        logger.info("Drain: Waiting up to %gs for %d application(s) being finalized...", timeout, running)
+        _, pending = await asyncio.wait(list(self._jobs), timeout=timeout)
+        DRAIN_FINALIZATIONS_TOTAL.inc("finished", amount=running - len(pending))
+        if not pending:
+            logger.info("Drain: All finalizations finished.")
+            return 0
+        jobs = [self._jobs[task] for task in pending if task in self._jobs]
+        for job in jobs:
+            job.checkpointed = True  # Tells the handler to keep the temp photos when it sees the cancellation
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        # Written after the tasks have stopped, so each checkpoint reflects the job's final progress.
+        await checkpoint(jobs)
+        DRAIN_FINALIZATIONS_TOTAL.inc("checkpointed", amount=len(jobs))
+        logger.warning("Drain: %d finalization(s) did not finish in %gs; checkpointed to %s for the next start.",
+                       len(jobs), timeout, checkpoint_folder())
+        return len(jobs)
+
+
+def in_flight(bot_data: Dict[Any, Any]) -> InFlightFinalizations:
+    tracker = bot_data.get(IN_FLIGHT_KEY)
+    if tracker is None:
+        tracker = bot_data[IN_FLIGHT_KEY] = InFlightFinalizations()
+    return tracker
+
+
+async def drain_finalizations(bot_data: Dict[Any, Any], timeout: Optional[float] = None) -> int:
+    if timeout is None:
+        timeout = float(utils.get_setting("DRAIN_TIMEOUT_SECONDS", 20.0))
+    return await in_flight(bot_data).drain(timeout)
+
+
+# --- durable queue ---
+
+def checkpoint_folder() -> str:
+    return get_external_file_path(utils.get_setting("DRAIN_CHECKPOINT_FOLDER", "pending_finalizations"))
+
+
+def _checkpoint_path(folder: str, job_id: str) -> str:
+    return os.path.join(folder, f"{job_id}.json")
+
+
+def _write_checkpoints(folder: str, jobs: List[FinalizationJob]):
+    os.makedirs(folder, exist_ok=True)
+    for job in jobs:
+        path = _checkpoint_path(folder, job.job_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+
+async def checkpoint(jobs: List[FinalizationJob]):
+    for job in jobs:
+        job.checkpointed = True
+    try:
+        await async_fs.run(_write_checkpoints, checkpoint_folder(), jobs)
+    except OSError as e:
+        logger.error("Drain: Could not checkpoint %d finalization(s) to %s: %s", len(jobs), checkpoint_folder(), e)
+
+
+def _read_checkpoints(folder: str) -> List[FinalizationJob]:
+    if not os.path.isdir(folder):
+        return []
+    jobs = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                jobs.append(FinalizationJob.from_dict(json.load(f)))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Drain: Skipping unreadable checkpoint %s: %s", path, e)
+    return jobs
+
+
+async def load_checkpoints() -> List[FinalizationJob]:
+    return await async_fs.run(_read_checkpoints, checkpoint_folder())
+
+
+def _remove_checkpoint(folder: str, job_id: str):
+    try:
+        os.remove(_checkpoint_path(folder, job_id))
+    except FileNotFoundError:
+        pass
+
+
+async def remove_checkpoint(job: FinalizationJob):
+    await async_fs.run(_remove_checkpoint, checkpoint_folder(), job.job_id)
@@ -1,10 +1,12 @@
 # application_bot/handlers/command_handlers.py
 import logging
-from telegram import Update, ReplyKeyboardRemove, KeyboardButton, ReplyKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from application_bot import utils 
-from application_bot.utils import get_text # utils.LANGUAGES_CACHE will be used by get_text
+from application_bot.utils import get_text # The current bot's LANGUAGES_CACHE will be used by get_text
+from application_bot.session import get_session
+from application_bot.keyboards import CONFIRM_ACTION, REMOVE, yes_no_keyboard
 from application_bot.constants import (
     STATE_CONFIRM_GLOBAL_CANCEL,
     STATE_ASKING_QUESTIONS,
@@ -16,88 +18,86 @@ logger = logging.getLogger(__name__)
 def get_user_lang(context: ContextTypes.DEFAULT_TYPE, update: Update = None) -> str:
     user_id = update.effective_user.id if update and update.effective_user else "UnknownUser"
 
-    if "user_lang" in context.user_data:
-        return context.user_data["user_lang"]
+    session = get_session(context.user_data)
+    if session.lang is not None:
+        return session.lang
 
+    config = utils.current_config()
     determined_lang = None
     # SETTINGS should be loaded by now, otherwise get_text will handle it or use defaults
-    override_user_lang = utils.SETTINGS.get("OVERRIDE_USER_LANG", True) if utils.SETTINGS else True
+    override_user_lang = config.SETTINGS.get("OVERRIDE_USER_LANG", True) if config.SETTINGS else True
 
     if not override_user_lang:
         if update and update.effective_user and update.effective_user.language_code:
             user_tg_lang_full = update.effective_user.language_code
             user_tg_lang_short = user_tg_lang_full.split('-')[0]
-            logger.debug(f"User {user_id}: OVERRIDE_USER_LANG is false. Telegram language_code: '{user_tg_lang_full}' (short: '{user_tg_lang_short}')")
+            logger.debug("User %s: OVERRIDE_USER_LANG is false. Telegram language_code: '%s' (short: '%s')", user_id, user_tg_lang_full, user_tg_lang_short)
 
-            # Check against utils.LANGUAGES_CACHE now
-            if utils.LANGUAGES_CACHE:
-                if user_tg_lang_short in utils.LANGUAGES_CACHE:
+            # Check against LANGUAGES_CACHE now
+            if config.LANGUAGES_CACHE:
+                if user_tg_lang_short in config.LANGUAGES_CACHE:
                     determined_lang = user_tg_lang_short
-                    logger.info(f"User {user_id}: Detected language '{determined_lang}' from Telegram client, matching available languages.")
+                    logger.debug("User %s: Detected language '%s' from Telegram client, matching available languages.", user_id, determined_lang)
                 else:
-                    logger.debug(f"User {user_id}: Telegram language '{user_tg_lang_short}' not in available bot languages: {list(utils.LANGUAGES_CACHE.keys())}.")
+                    logger.debug("User %s: Telegram language '%s' not in available bot languages: %s.", user_id, user_tg_lang_short, list(config.LANGUAGES_CACHE.keys()))
             else:
-                logger.warning(f"User {user_id}: utils.LANGUAGES_CACHE not available for Telegram language detection.")
+                logger.warning("User %s: LANGUAGES_CACHE not available for Telegram language detection.", user_id)
         elif update is None or update.effective_user is None or not update.effective_user.language_code:
-             logger.debug(f"User {user_id}: OVERRIDE_USER_LANG is false, but no Telegram client language info available in update.")
+             logger.debug("User %s: OVERRIDE_USER_LANG is false, but no Telegram client language info available in update.", user_id)
     else: 
-        logger.debug(f"User {user_id}: OVERRIDE_USER_LANG is true. Will use DEFAULT_LANG from settings.") # Changed info to debug as it's less critical now
+        logger.debug("User %s: OVERRIDE_USER_LANG is true. Will use DEFAULT_LANG from settings.", user_id) # Changed info to debug as it's less critical now
 
     if not determined_lang:
         source_info = "as primary due to OVERRIDE_USER_LANG" if override_user_lang else "as fallback"
-        if utils.SETTINGS and "DEFAULT_LANG" in utils.SETTINGS:
-            default_lang_from_settings = utils.SETTINGS["DEFAULT_LANG"]
-            # Check against utils.LANGUAGES_CACHE
-            if utils.LANGUAGES_CACHE and utils.LANGUAGES_CACHE.get(default_lang_from_settings):
+        if config.SETTINGS and "DEFAULT_LANG" in config.SETTINGS:
+            default_lang_from_settings = config.SETTINGS["DEFAULT_LANG"]
+            # Check against LANGUAGES_CACHE
+            if config.LANGUAGES_CACHE and config.LANGUAGES_CACHE.get(default_lang_from_settings):
                 determined_lang = default_lang_from_settings
-                logger.info(f"User {user_id}: Using DEFAULT_LANG '{determined_lang}' from settings {source_info}.")
+                logger.debug("User %s: Using DEFAULT_LANG '%s' from settings %s.", user_id, determined_lang, source_info)
             else:
-                logger.warning(f"User {user_id}: DEFAULT_LANG '{default_lang_from_settings}' from settings is not a configured language. Falling back to 'en'.")
+                logger.warning("User %s: DEFAULT_LANG '%s' from settings is not a configured language. Falling back to 'en'.", user_id, default_lang_from_settings)
                 determined_lang = "en" 
         else:
-            logger.warning(f"User {user_id}: SETTINGS or SETTINGS['DEFAULT_LANG'] not available. Falling back to 'en'.")
+            logger.warning("User %s: SETTINGS or SETTINGS['DEFAULT_LANG'] not available. Falling back to 'en'.", user_id)
             determined_lang = "en" 
 
-    context.user_data["user_lang"] = determined_lang
-    logger.debug(f"User {user_id}: Cached language '{determined_lang}' to user_data.")
+    session.lang = determined_lang
+    logger.debug("User %s: Cached language '%s' in the session.", user_id, determined_lang)
     return determined_lang
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     lang = get_user_lang(context, update) 
-    logger.info(f"User {user.id} ({user.username}) started bot. Effective language for session: {lang}")
+    logger.info("User %s (%s) started bot. Effective language for session: %s", user.id, user.username, lang)
     await update.message.reply_text(get_text("start_message", lang))
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     lang = get_user_lang(context, update)
-    await update.message.reply_text(get_text("help_message", lang), reply_markup=ReplyKeyboardRemove())
+    await update.message.reply_text(get_text("help_message", lang), reply_markup=REMOVE)
 
 async def cancel_command_entry_point(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     lang = get_user_lang(context, update)
 
-    if ('current_question_index' in context.user_data or
-        context.user_data.get('is_awaiting_photo', False) or
-        context.user_data.get('current_state_for_cancel_confirmation') is not None):
+    if session.in_application or session.cancel_return_state is not None:
 
-        yes_text = get_text("confirm_action_yes", lang)
-        no_text = get_text("confirm_action_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup = yes_no_keyboard(CONFIRM_ACTION, lang)
 
-        current_q_state = context.user_data.get('current_q_state')
+        current_q_state = session.state
         if current_q_state == STATE_ASKING_QUESTIONS:
-             context.user_data['current_state_for_cancel_confirmation'] = STATE_ASKING_QUESTIONS
+             session.cancel_return_state = STATE_ASKING_QUESTIONS
         elif current_q_state == STATE_AWAITING_PHOTO:
-             context.user_data['current_state_for_cancel_confirmation'] = STATE_AWAITING_PHOTO
-        elif 'current_question_index' in context.user_data and not context.user_data.get('is_awaiting_photo', False):
-             context.user_data['current_state_for_cancel_confirmation'] = STATE_ASKING_QUESTIONS
-        elif context.user_data.get('is_awaiting_photo', False):
-             context.user_data['current_state_for_cancel_confirmation'] = STATE_AWAITING_PHOTO
+             session.cancel_return_state = STATE_AWAITING_PHOTO
+        elif session.question_index is not None and not session.awaiting_photo:
+             session.cancel_return_state = STATE_ASKING_QUESTIONS
+        elif session.awaiting_photo:
+             session.cancel_return_state = STATE_AWAITING_PHOTO
         else:
-             context.user_data['current_state_for_cancel_confirmation'] = None
+             session.cancel_return_state = None
 
         await update.message.reply_text(get_text("cancel_prompt", lang), reply_markup=reply_markup)
         return STATE_CONFIRM_GLOBAL_CANCEL
     else:
-        await update.message.reply_text(get_text("no_active_application_to_cancel", lang), reply_markup=ReplyKeyboardRemove())
+        await update.message.reply_text(get_text("no_active_application_to_cancel", lang), reply_markup=REMOVE)
         return ConversationHandler.END
\ No newline at end of file
@@ -1,10 +1,13 @@
 # telegram_application_bot/handlers/conversation_logic.py
+import asyncio
 import logging
 import os
 import time
 from datetime import datetime
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
-from telegram.ext import ContextTypes, ConversationHandler
+from pathlib import Path
+from typing import Callable, Optional
+from telegram import Update
+from telegram.ext import Application, ContextTypes, ConversationHandler
 
 # MODIFIED IMPORTS:
 from application_bot import utils
@@ -13,151 +16,205 @@ from application_bot.constants import (
     STATE_ASKING_QUESTIONS, STATE_AWAITING_PHOTO,
     STATE_CONFIRM_CANCEL_EXISTING, STATE_CONFIRM_GLOBAL_CANCEL
 )
-from application_bot.pdf_generator import create_application_pdf
+from application_bot.pdf_generator import render_application_pdf
+from application_bot import async_fs, drain, metrics, tracing
+from application_bot.drain import FinalizationJob
 from application_bot.handlers.command_handlers import get_user_lang
+from application_bot.session import get_session
+from application_bot.keyboards import CONFIRM_ACTION, CONFIRM_CANCEL, NO, REMOVE, YES, match_answer, yes_no_keyboard
+from application_bot.question_sets import QuestionSet, current_question_set, pinned_question_set
 
 
 logger = logging.getLogger(__name__)
 
-def check_rate_limit(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    now = time.time()
-    limit_seconds = utils.SETTINGS.get("RATE_LIMIT_SECONDS", 600) if utils.SETTINGS else 600 # MODIFIED
+async def last_submission_time(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> float:
+    store = context.bot_data.get("shared_state")
+    if store is not None:
+        # Worker processes share one submission index (see shared_state.py); it can wait on another worker's write.
+        return await async_fs.run(store.last_submission_time, user_id)
     if "rate_limits" not in context.bot_data:
         context.bot_data["rate_limits"] = {}
-    last_submission_time = context.bot_data["rate_limits"].get(user_id, 0)
-    return now - last_submission_time < limit_seconds
-
-def update_rate_limit_timestamp(user_id: int, context: ContextTypes.DEFAULT_TYPE):
-    if "rate_limits" not in context.bot_data: 
-        context.bot_data["rate_limits"] = {}
-    context.bot_data["rate_limits"][user_id] = time.time()
-
-def cleanup_user_application_data(context: ContextTypes.DEFAULT_TYPE):
-    temp_photo_paths = context.user_data.pop('application_photo_paths', [])
-    temp_photo_folder_name = utils.SETTINGS.get("TEMP_PHOTO_FOLDER", "temp_photos") if utils.SETTINGS else "temp_photos" # MODIFIED
+    return context.bot_data["rate_limits"].get(user_id, 0)
+
+def check_rate_limit(last_submitted: float) -> bool:
+    limit_seconds = utils.get_setting("RATE_LIMIT_SECONDS", 600) # MODIFIED
+    return time.time() - last_submitted < limit_seconds
+
+async def record_submission(user_id: int, bot_data: dict, pdf_path: Optional[str] = None):
+    store = bot_data.get("shared_state")
+    if store is not None:
+        submission_number = await async_fs.run(store.record_submission, user_id, pdf_path)
+        logger.info("Application of user %s is submission #%s.", user_id, submission_number)
+        return
+    if "rate_limits" not in bot_data: 
+        bot_data["rate_limits"] = {}
+    bot_data["rate_limits"][user_id] = time.time()
+
+def cleanup_user_application_data(context: ContextTypes.DEFAULT_TYPE, keep_photos: bool = False):
+    session = get_session(context.user_data)
+    temp_photo_paths = session.reset()
+    if not keep_photos:  # Kept when a checkpointed finalization still needs them (see drain.py)
+        remove_temp_photos(temp_photo_paths, context.bot.local_mode)
+
+def remove_temp_photos(temp_photo_paths, local_mode: bool):
+    temp_photo_folder_name = utils.get_setting("TEMP_PHOTO_FOLDER", "temp_photos") # MODIFIED
     base_path_arg = temp_photo_folder_name if temp_photo_folder_name else "temp_photos"
     temp_photo_base_path = get_external_file_path(base_path_arg)
 
-
+    abs_temp_base_path = os.path.abspath(temp_photo_base_path)
+    photos_to_delete = []
     for photo_path in temp_photo_paths:
         abs_photo_path = os.path.abspath(photo_path)
-        abs_temp_base_path = os.path.abspath(temp_photo_base_path)
         if os.path.commonpath([abs_temp_base_path, abs_photo_path]) == abs_temp_base_path:
-            try:
-                if os.path.exists(photo_path):
-                    os.remove(photo_path)
-                    logger.info(f"Cleaned up temp photo: {photo_path}")
-            except OSError as e:
-                logger.warning(f"Could not remove temp photo {photo_path}: {e}")
+            photos_to_delete.append(photo_path)
+        elif local_mode:
+            logger.debug("Left photo %s to the local Bot API server.", photo_path)
         else:
-            logger.error(f"Attempted to delete photo outside temp folder: {photo_path} (base: {abs_temp_base_path}). Skipped.")
-
-    keys_to_remove = ['current_question_index', 'current_question_id', 'answers',
-                      'is_awaiting_photo', 'current_q_state', 'current_state_for_cancel_confirmation']
-    for key in keys_to_remove:
-        context.user_data.pop(key, None)
+            logger.error("Attempted to delete photo outside temp folder: %s (base: %s). Skipped.", photo_path, abs_temp_base_path)
+    async_fs.remove_files_soon(photos_to_delete)  # One background batch; nothing here waits on the disk
 
 async def apply_command_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     user = update.effective_user
     lang = get_user_lang(context, update)
-    context.user_data['current_q_state'] = STATE_ASKING_QUESTIONS
 
-    if not utils.QUESTIONS: # MODIFIED
-        if not load_questions(): # This function updates utils.QUESTIONS internally
-            logger.warning(f"User {user.id} tried /apply, but questions are not loaded and reload failed.")
-            await update.message.reply_text(get_text("application_failed", lang) + " (No questions configured)", reply_markup=ReplyKeyboardRemove())
+    if not utils.current_config().QUESTIONS: # MODIFIED
+        if not await async_fs.run(load_questions): # This function updates utils.current_config().QUESTIONS internally
+            logger.warning("User %s tried /apply, but questions are not loaded and reload failed.", user.id)
+            await update.message.reply_text(get_text("application_failed", lang) + " (No questions configured)", reply_markup=REMOVE)
             return ConversationHandler.END
         logger.info("Successfully reloaded questions on demand.")
 
 
-    if 'current_question_index' in context.user_data or context.user_data.get('is_awaiting_photo', False):
-        yes_text = get_text("confirm_cancel_yes", lang)
-        no_text = get_text("confirm_cancel_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+    if session.in_application:
+        reply_markup = yes_no_keyboard(CONFIRM_CANCEL, lang)
         await update.message.reply_text(get_text("already_in_application", lang), reply_markup=reply_markup)
-        context.user_data['current_q_state'] = STATE_CONFIRM_CANCEL_EXISTING
+        session.state = STATE_CONFIRM_CANCEL_EXISTING
         return STATE_CONFIRM_CANCEL_EXISTING
 
-    if check_rate_limit(user.id, context):
-        last_submission_time = context.bot_data["rate_limits"].get(user.id, 0)
-        rate_limit_sec = utils.SETTINGS.get("RATE_LIMIT_SECONDS", 600) if utils.SETTINGS else 600 # MODIFIED
-        wait_time_total_seconds = rate_limit_sec - (time.time() - last_submission_time)
+    last_submitted = await last_submission_time(user.id, context)
+    if check_rate_limit(last_submitted):
+        metrics.RATE_LIMIT_REJECTIONS_TOTAL.inc()
+        rate_limit_sec = utils.get_setting("RATE_LIMIT_SECONDS", 600) # MODIFIED
+        wait_time_total_seconds = rate_limit_sec - (time.time() - last_submitted)
         wait_time_minutes = int(wait_time_total_seconds / 60) + 1
-        await update.message.reply_text(get_text("rate_limit_exceeded", lang, wait_time=wait_time_minutes), reply_markup=ReplyKeyboardRemove())
+        await update.message.reply_text(get_text("rate_limit_exceeded", lang, wait_time=wait_time_minutes), reply_markup=REMOVE)
         return ConversationHandler.END
 
-    context.user_data['answers'] = {}
-    context.user_data['current_question_index'] = 0
-    context.user_data['application_photo_paths'] = []
-    context.user_data['is_awaiting_photo'] = False
+    question_set = current_question_set()
+    if question_set is None:
+        logger.warning("User %s tried /apply, but no question set is available.", user.id)
+        await update.message.reply_text(get_text("application_failed", lang) + " (No questions configured)", reply_markup=REMOVE)
+        return ConversationHandler.END
+    session.begin(question_set.version)
+    session.state = STATE_ASKING_QUESTIONS  # Only now: a rejected /apply must not leave a state behind
 
-    await update.message.reply_text(get_text("apply_intro", lang), reply_markup=ReplyKeyboardRemove())
+    await update.message.reply_text(get_text("apply_intro", lang), reply_markup=REMOVE)
     return await ask_next_question(update, context)
 
 async def handle_confirm_cancel_existing(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     user_response = update.message.text
     lang = get_user_lang(context, update)
 
-    if user_response == get_text("confirm_cancel_yes", lang):
-        await update.message.reply_text(get_text("application_cancelled", lang), reply_markup=ReplyKeyboardRemove())
+    answer = match_answer(CONFIRM_CANCEL, lang, user_response)
+
+    if answer == YES:
+        await update.message.reply_text(get_text("application_cancelled", lang), reply_markup=REMOVE)
         cleanup_user_application_data(context)
         return await apply_command_entry(update, context)
-    elif user_response == get_text("confirm_cancel_no", lang):
-        await update.message.reply_text(get_text("continue_current_application", lang), reply_markup=ReplyKeyboardRemove())
-        if context.user_data.get('is_awaiting_photo', False):
-            context.user_data['current_q_state'] = STATE_AWAITING_PHOTO
+    elif answer == NO:
+        await update.message.reply_text(get_text("continue_current_application", lang), reply_markup=REMOVE)
+        if session.awaiting_photo:
+            session.state = STATE_AWAITING_PHOTO
             return await prompt_for_photo(update, context)
         else:
-            context.user_data['current_q_state'] = STATE_ASKING_QUESTIONS
+            session.state = STATE_ASKING_QUESTIONS
             return await ask_next_question(update, context, resume=True)
     else:
-        yes_text = get_text("confirm_cancel_yes", lang)
-        no_text = get_text("confirm_cancel_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup = yes_no_keyboard(CONFIRM_CANCEL, lang)
         await update.message.reply_text(get_text("already_in_application", lang), reply_markup=reply_markup)
-        context.user_data['current_q_state'] = STATE_CONFIRM_CANCEL_EXISTING
+        session.state = STATE_CONFIRM_CANCEL_EXISTING
         return STATE_CONFIRM_CANCEL_EXISTING
 
+async def end_without_questions(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                question_set: Optional[QuestionSet]) -> int:
+    """Ends the application when it has no questions to go on: its pinned version is gone, or none are loaded."""
+    session = get_session(context.user_data)
+    lang = get_user_lang(context, update)
+    if question_set is None and session.question_set_version is not None:
+        # Carrying on with another list would skip or repeat questions under the same index.
+        logger.warning("User %s: Question set version %s is unavailable; ending the application.",
+                       update.effective_user.id, session.question_set_version)
+        text = get_text("questions_changed", lang)
+    else:
+        logger.error("User %s: No questions are loaded; ending the application.", update.effective_user.id)
+        text = get_text("application_failed", lang) + " (No questions available)"
+    await context.bot.send_message(chat_id=update.effective_chat.id, text=text, reply_markup=REMOVE)
+    cleanup_user_application_data(context)
+    return ConversationHandler.END
+
 async def ask_next_question(update: Update, context: ContextTypes.DEFAULT_TYPE, resume: bool = False) -> int:
-    current_q_index = context.user_data.get('current_question_index', 0)
-    context.user_data['current_q_state'] = STATE_ASKING_QUESTIONS
+    session = get_session(context.user_data)
+    current_q_index = session.question_index or 0
+    session.state = STATE_ASKING_QUESTIONS
     lang = get_user_lang(context, update) 
 
-    if not utils.QUESTIONS: # MODIFIED
-        logger.error("ask_next_question: QUESTIONS not loaded!")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=get_text("application_failed", lang) + " (No questions available)")
-        cleanup_user_application_data(context)
-        return ConversationHandler.END
+    question_set = await pinned_question_set(session.question_set_version)
+    if not question_set:
+        return await end_without_questions(update, context, question_set)
 
-    if current_q_index < len(utils.QUESTIONS): # MODIFIED
-        question_data = utils.QUESTIONS[current_q_index] # MODIFIED
-        context.user_data['current_question_id'] = question_data['id']
+    if current_q_index < len(question_set):
+        question_text = question_set.text(current_q_index, lang)
+        reply_markup = question_set.questions[current_q_index].keyboard or REMOVE
         target_message = update.message or (update.callback_query and update.callback_query.message)
         if target_message:
-            await target_message.reply_text(question_data['text'], reply_markup=ReplyKeyboardRemove())
+            await target_message.reply_text(question_text, reply_markup=reply_markup)
         else: 
-            await context.bot.send_message(chat_id=update.effective_chat.id, text=question_data['text'], reply_markup=ReplyKeyboardRemove())
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=question_text, reply_markup=reply_markup)
         return STATE_ASKING_QUESTIONS
     else:
-        context.user_data['is_awaiting_photo'] = True
-        context.user_data['current_q_state'] = STATE_AWAITING_PHOTO
+        session.awaiting_photo = True
+        session.state = STATE_AWAITING_PHOTO
         return await prompt_for_photo(update, context)
 
 async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     user_answer = update.message.text
-    question_id = context.user_data.get('current_question_id')
-    if question_id:
-        context.user_data['answers'][question_id] = user_answer
-    context.user_data['current_question_index'] += 1
+    question_set = await pinned_question_set(session.question_set_version)
+    index = session.question_index
+    if index is None:
+        # A persisted STATE_ASKING_QUESTIONS whose session was reset (or lost); there is nothing to answer.
+        logger.warning("User %s answered a question with no application in progress; ending the conversation.",
+                       update.effective_user.id)
+        cleanup_user_application_data(context)
+        await update.message.reply_text(get_text("application_cancelled", get_user_lang(context, update)), reply_markup=REMOVE)
+        return ConversationHandler.END
+    if not question_set:
+        return await end_without_questions(update, context, question_set)
+    if index >= len(question_set):
+        # Every question is answered already (e.g. a repeated message); go on to the photos.
+        session.awaiting_photo = True
+        return await prompt_for_photo(update, context)
+
+    question = question_set.questions[index]
+    valid, result = question.validate(user_answer)
+    if not valid:
+        lang = get_user_lang(context, update)
+        error_key, error_kwargs = result
+        error_text = question_set.error_text(index, lang) or get_text(error_key, lang, **error_kwargs)
+        await update.message.reply_text(error_text, reply_markup=question.keyboard or REMOVE)
+        return STATE_ASKING_QUESTIONS
+    session.answers[question.id] = result
+    session.question_index = question.next_position(result)
     return await ask_next_question(update, context)
 
 async def prompt_for_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     lang = get_user_lang(context, update)
-    num_photos_required = utils.SETTINGS.get("APPLICATION_PHOTO_NUMB", 1) if utils.SETTINGS else 1 # MODIFIED
-    collected_photos = len(context.user_data.get('application_photo_paths', []))
-    context.user_data['current_q_state'] = STATE_AWAITING_PHOTO
+    num_photos_required = utils.get_setting("APPLICATION_PHOTO_NUMB", 1) # MODIFIED
+    collected_photos = len(session.photo_paths)
+    session.state = STATE_AWAITING_PHOTO
 
     message_text = ""
     if num_photos_required == 1:
@@ -168,23 +225,24 @@ async def prompt_for_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         else:
             message_text = get_text("ask_photo_multiple", lang, count=num_photos_required, collected=collected_photos, total=num_photos_required)
     else: 
-        logger.info(f"User {update.effective_user.id}: 0 photos required, skipping photo stage.")
+        logger.info("User %s: 0 photos required, skipping photo stage.", update.effective_user.id)
         return await finalize_application(update, context)
 
     target_message = update.message or (update.callback_query and update.callback_query.message)
     if target_message:
-        await target_message.reply_text(message_text, reply_markup=ReplyKeyboardRemove())
+        await target_message.reply_text(message_text, reply_markup=REMOVE)
     else:
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=message_text, reply_markup=ReplyKeyboardRemove())
+        await context.bot.send_message(chat_id=update.effective_chat.id, text=message_text, reply_markup=REMOVE)
     return STATE_AWAITING_PHOTO
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     user = update.effective_user
     lang = get_user_lang(context, update)
-    num_photos_required = utils.SETTINGS.get("APPLICATION_PHOTO_NUMB", 1) if utils.SETTINGS else 1 # MODIFIED
-    max_file_size_mb = utils.SETTINGS.get("MAX_ALLOWED_FILE_SIZE_MB", 10) if utils.SETTINGS else 10 # MODIFIED
+    num_photos_required = utils.get_setting("APPLICATION_PHOTO_NUMB", 1) # MODIFIED
+    max_file_size_mb = utils.get_setting("MAX_ALLOWED_FILE_SIZE_MB", 10) # MODIFIED
     max_file_size_bytes = max_file_size_mb * 1024 * 1024
-    context.user_data['current_q_state'] = STATE_AWAITING_PHOTO
+    session.state = STATE_AWAITING_PHOTO
 
 
     if not update.message or not update.message.photo:
@@ -196,16 +254,16 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             
             if file_size and file_size > max_file_size_bytes:
                 await update.message.reply_text(get_text("file_too_large_or_unsupported_type", lang, max_size_mb=max_file_size_mb))
-                logger.warning(f"User {user.id} sent a non-photo file that is too large: {file_size} bytes.")
+                logger.warning("User %s sent a non-photo file that is too large: %s bytes.", user.id, file_size)
                 return STATE_AWAITING_PHOTO 
 
             await update.message.reply_text(get_text("please_send_photo_not_other_file", lang))
-            logger.warning(f"User {user.id} sent a non-photo file type when photo was expected.")
+            logger.warning("User %s sent a non-photo file type when photo was expected.", user.id)
             return STATE_AWAITING_PHOTO 
 
         elif update.message and update.message.text: 
             await update.message.reply_text(get_text("please_send_photo_not_other_file", lang))
-            logger.warning(f"User {user.id} sent text when photo was expected.")
+            logger.warning("User %s sent text when photo was expected.", user.id)
             return STATE_AWAITING_PHOTO
 
         await context.bot.send_message(chat_id=update.effective_chat.id, text=get_text("not_a_photo", lang))
@@ -214,140 +272,227 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     largest_photo = update.message.photo[-1] 
     if largest_photo.file_size and largest_photo.file_size > max_file_size_bytes:
         await update.message.reply_text(get_text("file_too_large_or_unsupported_type", lang, max_size_mb=max_file_size_mb))
-        logger.warning(f"User {user.id} sent a photo that is too large: {largest_photo.file_size} bytes.")
+        logger.warning("User %s sent a photo that is too large: %s bytes.", user.id, largest_photo.file_size)
         return STATE_AWAITING_PHOTO 
 
-    temp_photo_folder_name = utils.SETTINGS.get("TEMP_PHOTO_FOLDER", "temp_photos") if utils.SETTINGS else "temp_photos" # MODIFIED
+    temp_photo_folder_name = utils.get_setting("TEMP_PHOTO_FOLDER", "temp_photos") # MODIFIED
     temp_photo_dir = get_external_file_path(temp_photo_folder_name)
-    os.makedirs(temp_photo_dir, exist_ok=True)
+    await async_fs.makedirs(temp_photo_dir)
 
-    current_photo_paths = context.user_data.get('application_photo_paths', [])
+    current_photo_paths = session.photo_paths
 
     if len(current_photo_paths) < num_photos_required:
         try:
-            photo_file = await largest_photo.get_file() 
-            photo_filename = f"{user.id}_{int(time.time())}_{len(current_photo_paths)}.jpg"
-            local_photo_path = os.path.join(temp_photo_dir, photo_filename)
-            await photo_file.download_to_drive(local_photo_path)
+            download_started = time.perf_counter()
+            with tracing.span("photo.get_file"):
+                photo_file = await largest_photo.get_file() 
+            if context.bot.local_mode and photo_file.file_path and os.path.isabs(photo_file.file_path):
+                # A local Bot API server already stored the photo on this disk; use it in place instead of copying.
+                local_photo_path = photo_file.file_path
+            else:
+                photo_filename = f"{user.id}_{int(time.time())}_{len(current_photo_paths)}.jpg"
+                local_photo_path = os.path.join(temp_photo_dir, photo_filename)
+                with tracing.span("photo.download", file_size=largest_photo.file_size):
+                    await photo_file.download_to_drive(local_photo_path)
+            metrics.PHOTO_DOWNLOAD_SECONDS.observe(time.perf_counter() - download_started)
+            metrics.PHOTO_DOWNLOAD_BYTES.inc(amount=photo_file.file_size or largest_photo.file_size or 0)
             current_photo_paths.append(local_photo_path)
-            logger.info(f"User {user.id} sent photo, saved to {local_photo_path} (Size: {largest_photo.width}x{largest_photo.height}, FileSize: {largest_photo.file_size or 'N/A'})")
+            logger.info("User %s sent photo, saved to %s (Size: %sx%s, FileSize: %s)", user.id, local_photo_path, largest_photo.width, largest_photo.height, largest_photo.file_size or 'N/A')
         except Exception as e:
-            logger.error(f"Error downloading photo for user {user.id}: {e}")
+            metrics.PHOTO_DOWNLOAD_FAILURES_TOTAL.inc()
+            logger.error("Error downloading photo for user %s: %s", user.id, e)
             await update.message.reply_text(get_text("application_failed", lang) + " (Photo error)")
             return STATE_AWAITING_PHOTO
 
-    context.user_data['application_photo_paths'] = current_photo_paths
-
     if len(current_photo_paths) < num_photos_required:
         remaining_needed = num_photos_required - len(current_photo_paths)
         await update.message.reply_text(get_text("photo_received_collecting_more", lang, remaining_photos=remaining_needed))
         return STATE_AWAITING_PHOTO
     else:
-        await update.message.reply_text(get_text("all_photos_received_processing", lang), reply_markup=ReplyKeyboardRemove())
-        context.user_data['is_awaiting_photo'] = False
+        await update.message.reply_text(get_text("all_photos_received_processing", lang), reply_markup=REMOVE)
+        session.awaiting_photo = False
         return await finalize_application(update, context)
 
 
 async def finalize_application(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    user = update.effective_user
-    lang = get_user_lang(context, update)
+    with tracing.trace_update("finalize_application", update), tracing.maybe_profile("finalize_application"):
+        return await _finalize_application(update, context)
 
+
+async def _finalize_application(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
+    user = update.effective_user
+    job = FinalizationJob(user.id, user.username, update.effective_chat.id, get_user_lang(context, update),
+                          session.question_set_version, session.answers, session.photo_paths)
+    in_flight = drain.in_flight(context.bot_data)
     try:
-        pdf_filepath = create_application_pdf(
-            user_id=user.id,
-            username=user.username,
-            answers=context.user_data.get('answers', {}),
-            photo_file_paths=context.user_data.get('application_photo_paths', []),
-            user_lang=lang
-        )
-
-        if not pdf_filepath:
-            logger.error(f"PDF generation failed for user {user.id}.")
-            await update.message.reply_text(get_text("application_failed", lang) + " (PDF Error)")
-            return ConversationHandler.END
+        if in_flight.draining:
+            # The bot is shutting down; finish this one after the restart instead of racing the drain deadline.
+            await drain.checkpoint([job])
+            logger.info("User %s: Finalization checkpointed during shutdown.", user.id)
+        else:
+            with in_flight.track(job):
+                await run_finalization(context.bot, context.bot_data, job)
+    except asyncio.CancelledError:
+        if not job.checkpointed:
+            raise
+        logger.info("User %s: Finalization interrupted by shutdown; it continues after the restart.", user.id)
+    finally:
+        cleanup_user_application_data(context, keep_photos=job.checkpointed)
+
+    return ConversationHandler.END
+
 
-        if utils.SETTINGS and utils.SETTINGS.get("SEND_PDF_TO_ADMINS", True): # MODIFIED
-            admin_ids_str = utils.SETTINGS.get("ADMIN_USER_IDS", "") # MODIFIED
+async def run_finalization(bot, bot_data: dict, job: FinalizationJob):
+    """Renders the PDF, delivers it to the admins and tells the applicant, skipping the steps `job` has done."""
+    lang = job.lang
+    try:
+        if not job.pdf_path or not await async_fs.run(os.path.exists, job.pdf_path):
+            question_set = await pinned_question_set(job.question_set_version)
+            if question_set is None and job.answers:
+                # The version is gone; label each answer with its question id rather than another set's wording.
+                question_set = QuestionSet.from_list([{"id": question_id, "text": question_id} for question_id in job.answers])
+            render_started = time.perf_counter()
+            with tracing.span("pdf.render", photos=len(job.photo_paths)):
+                pdf_filepath = await render_application_pdf(
+                    user_id=job.user_id,
+                    username=job.username,
+                    answers=job.answers,
+                    photo_file_paths=job.photo_paths,
+                    user_lang=lang,
+                    question_set=question_set
+                )
+
+            if pdf_filepath:
+                metrics.PDF_RENDER_SECONDS.observe(time.perf_counter() - render_started)
+                metrics.PDF_SIZE_BYTES.observe(await async_fs.getsize(pdf_filepath))
+                job.pdf_path = pdf_filepath
+            else:
+                metrics.PDF_FAILURES_TOTAL.inc()
+                logger.error("PDF generation failed for user %s.", job.user_id)
+                await bot.send_message(chat_id=job.chat_id, text=get_text("application_failed", lang) + " (PDF Error)")
+                return
+        pdf_filepath = job.pdf_path
+
+        if utils.get_setting("SEND_PDF_TO_ADMINS", True): # MODIFIED
+            admin_ids_str = utils.current_config().SETTINGS.get("ADMIN_USER_IDS", "") # MODIFIED
             admin_ids = [int(admin_id.strip()) for admin_id in admin_ids_str.split(',') if admin_id.strip().isdigit()]
 
             if not admin_ids:
-                logger.warning(f"No valid ADMIN_USER_IDS configured to send PDF for user {user.id}.")
+                logger.warning("No valid ADMIN_USER_IDS configured to send PDF for user %s.", job.user_id)
             else:
                 admin_notification_text = get_text("admin_notification", lang,
-                                                   username=user.username or "N/A",
-                                                   user_id=user.id,
-                                                   submission_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                for admin_id in admin_ids:
+                                                   username=job.username or "N/A",
+                                                   user_id=job.user_id,
+                                                   submission_time=datetime.fromtimestamp(job.created_at).strftime("%Y-%m-%d %H:%M:%S"))
+                pdf_filename = os.path.basename(pdf_filepath)
+                pending_admin_ids = [admin_id for admin_id in admin_ids if admin_id not in job.admins_done]
+                if job.admin_document_id or not pending_admin_ids:
+                    document = job.admin_document_id
+                elif bot.local_mode:
+                    document = Path(os.path.abspath(pdf_filepath))  # A local Bot API server reads it from disk
+                else:
+                    document = await async_fs.read_bytes(pdf_filepath)  # Read once for all admins
+                metrics.ADMIN_DELIVERY_BACKLOG.inc(amount=len(pending_admin_ids))
+                for admin_id in pending_admin_ids:
+                    delivery_started = time.perf_counter()
                     try:
-                        with open(pdf_filepath, 'rb') as pdf_file_obj:
-                            await context.bot.send_document(chat_id=admin_id, document=pdf_file_obj, caption=admin_notification_text)
-                        logger.info(f"Sent PDF to admin {admin_id} for user {user.id}")
+                        with tracing.span("admin.send_document", admin_id=admin_id):
+                            sent = await bot.send_document(chat_id=admin_id, document=document, filename=pdf_filename,
+                                                           caption=admin_notification_text)
+                        if sent.document and isinstance(document, (bytes, Path)):
+                            # Uploaded once; the other admins get the same file by id
+                            document = job.admin_document_id = sent.document.file_id
+                        job.admins_done.append(admin_id)  # Only on success, so a resumed checkpoint retries the failed ones
+                        metrics.ADMIN_DELIVERY_SECONDS.observe(time.perf_counter() - delivery_started)
+                        logger.info("Sent PDF to admin %s for user %s", admin_id, job.user_id)
                     except Exception as e:
-                        logger.error(f"Failed to send PDF to admin {admin_id} for user {user.id}: {e}")
+                        metrics.ADMIN_DELIVERY_FAILURES_TOTAL.inc()
+                        logger.error("Failed to send PDF to admin %s for user %s: %s", admin_id, job.user_id, e)
+                    finally:
+                        metrics.ADMIN_DELIVERY_BACKLOG.dec()
         else:
-            logger.info(f"SEND_PDF_TO_ADMINS is false. PDF for user {user.id} saved at {pdf_filepath} but not sent.")
+            logger.info("SEND_PDF_TO_ADMINS is false. PDF for user %s saved at %s but not sent.", job.user_id, pdf_filepath)
 
-        await update.message.reply_text(get_text("application_submitted", lang))
-        update_rate_limit_timestamp(user.id, context)
+        if not job.applicant_notified:
+            await bot.send_message(chat_id=job.chat_id, text=get_text("application_submitted", lang))
+            job.applicant_notified = True
+        await record_submission(job.user_id, bot_data, pdf_filepath)
 
     except Exception as e:
-        logger.error(f"Critical error during finalize_application for user {user.id}: {e}", exc_info=True)
-        await update.message.reply_text(get_text("application_failed", lang))
-    finally:
-        cleanup_user_application_data(context)
+        logger.error("Critical error during finalize_application for user %s: %s", job.user_id, e, exc_info=True)
+        await bot.send_message(chat_id=job.chat_id, text=get_text("application_failed", lang))
 
-    return ConversationHandler.END
+
+async def resume_checkpointed_finalizations(application: Application,
+                                            owns_user: Optional[Callable[[int], bool]] = None) -> int:
+    """Schedules the finalizations checkpointed by the last shutdown's drain; returns how many."""
+    jobs = [job for job in await drain.load_checkpoints() if owns_user is None or owns_user(job.user_id)]
+    for job in jobs:
+        application.create_task(_resume_finalization(application, job), name=f"ResumeFinalization-{job.user_id}")
+    if jobs:
+        logger.info("Resuming %d application finalization(s) checkpointed at the last shutdown.", len(jobs))
+    return len(jobs)
+
+
+async def _resume_finalization(application: Application, job: FinalizationJob):
+    try:
+        with drain.in_flight(application.bot_data).track(job):
+            await run_finalization(application.bot, application.bot_data, job)
+    except asyncio.CancelledError:
+        if not job.checkpointed:
+            raise
+        return  # Interrupted by another shutdown; its checkpoint was rewritten with the progress made
+    await drain.remove_checkpoint(job)
+    drain.DRAIN_FINALIZATIONS_TOTAL.inc("resumed")
+    remove_temp_photos(job.photo_paths, application.bot.local_mode)
 
 async def cancel_application_flow(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     lang = get_user_lang(context, update)
 
-    if ('current_question_index' in context.user_data or
-        context.user_data.get('is_awaiting_photo', False) or
-        context.user_data.get('current_state_for_cancel_confirmation') is not None):
+    if session.in_application or session.cancel_return_state is not None:
 
-        yes_text = get_text("confirm_action_yes", lang)
-        no_text = get_text("confirm_action_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup = yes_no_keyboard(CONFIRM_ACTION, lang)
 
-        context.user_data['current_state_for_cancel_confirmation'] = context.user_data.get('current_q_state')
+        session.cancel_return_state = session.state
 
         await update.message.reply_text(get_text("cancel_prompt", lang), reply_markup=reply_markup)
         return STATE_CONFIRM_GLOBAL_CANCEL
     else:
-        await update.message.reply_text(get_text("no_active_application_to_cancel", lang), reply_markup=ReplyKeyboardRemove())
+        await update.message.reply_text(get_text("no_active_application_to_cancel", lang), reply_markup=REMOVE)
         return ConversationHandler.END
 
 async def handle_confirm_global_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     user_response = update.message.text
     lang = get_user_lang(context, update)
-    stored_previous_state = context.user_data.pop('current_state_for_cancel_confirmation', None)
+    stored_previous_state, session.cancel_return_state = session.cancel_return_state, None
+
+    answer = match_answer(CONFIRM_ACTION, lang, user_response)
 
-    if user_response == get_text("confirm_action_yes", lang):
+    if answer == YES:
         cleanup_user_application_data(context)
-        await update.message.reply_text(get_text("application_cancelled", lang), reply_markup=ReplyKeyboardRemove())
+        await update.message.reply_text(get_text("application_cancelled", lang), reply_markup=REMOVE)
         return ConversationHandler.END
-    elif user_response == get_text("confirm_action_no", lang):
-        await update.message.reply_text(get_text("continue_current_application", lang), reply_markup=ReplyKeyboardRemove())
+    elif answer == NO:
+        await update.message.reply_text(get_text("continue_current_application", lang), reply_markup=REMOVE)
         if stored_previous_state == STATE_AWAITING_PHOTO:
             return await prompt_for_photo(update, context)
         elif stored_previous_state == STATE_ASKING_QUESTIONS:
             return await ask_next_question(update, context, resume=True)
         else: 
-            if context.user_data.get('is_awaiting_photo', False):
+            if session.awaiting_photo:
                  return await prompt_for_photo(update, context)
-            elif 'current_question_index' in context.user_data :
+            elif session.question_index is not None:
                  return await ask_next_question(update, context, resume=True)
-            logger.warning(f"Global cancel 'No': Could not determine state to return to. Ending conversation for user {update.effective_user.id}")
-            await update.message.reply_text(get_text("generic_error_prompt", lang), reply_markup=ReplyKeyboardRemove()) 
+            logger.warning("Global cancel 'No': Could not determine state to return to. Ending conversation for user %s", update.effective_user.id)
+            await update.message.reply_text(get_text("generic_error_prompt", lang), reply_markup=REMOVE) 
             cleanup_user_application_data(context)
             return ConversationHandler.END
     else: 
-        yes_text = get_text("confirm_action_yes", lang)
-        no_text = get_text("confirm_action_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-        context.user_data['current_state_for_cancel_confirmation'] = stored_previous_state 
+        reply_markup = yes_no_keyboard(CONFIRM_ACTION, lang)
+        session.cancel_return_state = stored_previous_state 
         await update.message.reply_text(get_text("cancel_prompt", lang), reply_markup=reply_markup) 
         return STATE_CONFIRM_GLOBAL_CANCEL
 
@@ -358,50 +503,45 @@ async def conversation_timeout_handler_function(update: Update, context: Context
     if hasattr(context, '_user_id') and context._user_id: user_id = context._user_id
     if hasattr(context, '_chat_id') and context._chat_id: chat_id = context._chat_id
     
-    lang = context.user_data.get("user_lang", utils.SETTINGS.get("DEFAULT_LANG", "en") if utils.SETTINGS else "en") # MODIFIED
+    lang = get_session(context.user_data).lang or (utils.get_setting("DEFAULT_LANG", "en")) # MODIFIED
     if isinstance(update, Update):
         lang = get_user_lang(context, update)
         if not chat_id and update.effective_chat: chat_id = update.effective_chat.id
         if user_id == "UnknownUser" and update.effective_user: user_id = update.effective_user.id
     
-    logger.info(f"Conversation timed out for user {user_id} in chat {chat_id}.")
+    logger.info("Conversation timed out for user %s in chat %s.", user_id, chat_id)
 
     if chat_id:
         try:
-            await context.bot.send_message(chat_id=chat_id, text=get_text("timeout_message", lang), reply_markup=ReplyKeyboardRemove())
+            await context.bot.send_message(chat_id=chat_id, text=get_text("timeout_message", lang), reply_markup=REMOVE)
         except Exception as e:
-            logger.error(f"Error sending timeout message to {chat_id}: {e}")
+            logger.error("Error sending timeout message to %s: %s", chat_id, e)
             
     cleanup_user_application_data(context)
     return ConversationHandler.END
 
 async def unhandled_message_in_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = get_session(context.user_data)
     lang = get_user_lang(context, update)
-    current_conv_state = context.user_data.get('current_q_state')
+    current_conv_state = session.state
     user_message_text = update.message.text if update.message and update.message.text else "<non-text_message>"
-    logger.warning(f"User {update.effective_user.id} sent unhandled message: '{user_message_text}' in state {current_conv_state}")
+    logger.warning("User %s sent unhandled message: '%s' in state %s", update.effective_user.id, user_message_text, current_conv_state)
 
     if current_conv_state == STATE_AWAITING_PHOTO:
-        await update.message.reply_text(get_text("please_send_photo_not_other_file", lang), reply_markup=ReplyKeyboardRemove())
+        await update.message.reply_text(get_text("please_send_photo_not_other_file", lang), reply_markup=REMOVE)
         return STATE_AWAITING_PHOTO 
     elif current_conv_state == STATE_ASKING_QUESTIONS:
-        await update.message.reply_text(get_text("generic_error_prompt", lang), reply_markup=ReplyKeyboardRemove()) 
+        await update.message.reply_text(get_text("generic_error_prompt", lang), reply_markup=REMOVE) 
         return await ask_next_question(update, context, resume=True) 
     elif current_conv_state == STATE_CONFIRM_CANCEL_EXISTING:
-        yes_text = get_text("confirm_cancel_yes", lang)
-        no_text = get_text("confirm_cancel_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup = yes_no_keyboard(CONFIRM_CANCEL, lang)
         await update.message.reply_text(get_text("already_in_application", lang), reply_markup=reply_markup)
         return STATE_CONFIRM_CANCEL_EXISTING
     elif current_conv_state == STATE_CONFIRM_GLOBAL_CANCEL:
-        yes_text = get_text("confirm_action_yes", lang)
-        no_text = get_text("confirm_action_no", lang)
-        keyboard = [[KeyboardButton(yes_text)], [KeyboardButton(no_text)]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup = yes_no_keyboard(CONFIRM_ACTION, lang)
         await update.message.reply_text(get_text("cancel_prompt", lang), reply_markup=reply_markup)
         return STATE_CONFIRM_GLOBAL_CANCEL
     
-    await update.message.reply_text(get_text("generic_error_prompt", lang), reply_markup=ReplyKeyboardRemove())
-    logger.error(f"Unhandled message in conv reached a generic fallback for user {update.effective_user.id}. State: {current_conv_state}")
+    await update.message.reply_text(get_text("generic_error_prompt", lang), reply_markup=REMOVE)
+    logger.error("Unhandled message in conv reached a generic fallback for user %s. State: %s", update.effective_user.id, current_conv_state)
     return current_conv_state if current_conv_state else ConversationHandler.END 
\ No newline at end of file
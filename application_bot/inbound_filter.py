@@ -0,0 +1,134 @@
+# application_bot/inbound_filter.py
+"""
+Pre-dispatch stage that drops unwanted updates before any handler runs.
+
+InboundFilter is registered as a TypeHandler in group -1, ahead of the
+ConversationHandler. It stops an update (ApplicationHandlerStop) when:
+
+  * it carries a document, video, animation, audio, voice note or photo larger
+    than MAX_ALLOWED_FILE_SIZE_MB ("oversize_file");
+  * the sender's inbound token bucket is empty: INBOUND_BURST updates at once,
+    refilled at INBOUND_RATE_PER_SECOND ("flood");
+  * it is another sticker from a user who is being asked for a photo and was
+    already answered about a sticker within INBOUND_WARNING_INTERVAL_SECONDS
+    ("coalesced"), so a sticker burst gets one "please send a photo" reply.
+
+Dropped updates are counted in appbot_inbound_dropped_total by reason. The user
+gets at most one warning per INBOUND_WARNING_INTERVAL_SECONDS, no matter how many
+updates were dropped in between.
+"""
+import logging
+import time
+from typing import Dict, Optional
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from application_bot import utils
+from application_bot.constants import STATE_AWAITING_PHOTO
+from application_bot.handlers.command_handlers import get_user_lang
+from application_bot.metrics import REGISTRY
+from application_bot.session import SESSION_KEY
+from application_bot.utils import get_text
+
+logger = logging.getLogger(__name__)
+
+INBOUND_DROPPED_TOTAL = REGISTRY.counter("appbot_inbound_dropped_total",
+                                         "Updates dropped by the pre-dispatch filter before any handler ran.", ["reason"])
+
+PRUNE_EVERY_N_USERS = 10_000  # Idle, fully refilled buckets are forgotten once this many users are tracked
+
+
+class _UserBucket:
+    __slots__ = ("tokens", "updated", "warned_at", "sticker_answered_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.warned_at: Optional[float] = None
+        self.sticker_answered_at: Optional[float] = None
+
+
+def _oversize_file_size(update: Update, max_size_bytes: int) -> int:
+    """Size of the update's attachment if it exceeds `max_size_bytes`, else 0."""
+    message = update.message
+    if message is None:
+        return 0
+    attachment = (message.document or message.video or message.animation or message.audio or message.voice
+                  or (message.photo[-1] if message.photo else None))
+    file_size = getattr(attachment, "file_size", None) or 0
+    return file_size if file_size > max_size_bytes else 0
+
+
+class InboundFilter:
+    def __init__(self):
+        self._buckets: Dict[int, _UserBucket] = {}
+        self._prune_at = PRUNE_EVERY_N_USERS
+
+    async def handle_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is None:
+            return
+        now = time.monotonic()
+        bucket = self._take_token(user.id, now)
+
+        max_size_mb = utils.get_setting("MAX_ALLOWED_FILE_SIZE_MB", 10)
+        file_size = _oversize_file_size(update, max_size_mb * 1024 * 1024)
+        if file_size:
+            logger.debug("Inbound filter: Dropped a %s-byte file from user %s (max %s MB).", file_size, user.id, max_size_mb)
+            await self._drop(update, context, bucket, now, "oversize_file",
+                             "file_too_large_or_unsupported_type", max_size_mb=max_size_mb)
+
+        if bucket.tokens < 0:
+            bucket.tokens = 0.0
+            await self._drop(update, context, bucket, now, "flood", "inbound_flood_warning")
+
+        message = update.message
+        if message is not None and message.sticker is not None:
+            session = context.user_data.get(SESSION_KEY) if context.user_data is not None else None
+            if session is not None and session.state == STATE_AWAITING_PHOTO:
+                answered_at = bucket.sticker_answered_at
+                warning_interval = utils.get_setting("INBOUND_WARNING_INTERVAL_SECONDS", 30.0)
+                if answered_at is not None and now - answered_at < warning_interval:
+                    INBOUND_DROPPED_TOTAL.inc("coalesced")
+                    raise ApplicationHandlerStop
+                bucket.sticker_answered_at = now
+
+    def _take_token(self, user_id: int, now: float) -> _UserBucket:
+        rate = float(utils.get_setting("INBOUND_RATE_PER_SECOND", 1.0))
+        burst = float(utils.get_setting("INBOUND_BURST", 8))
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= self._prune_at:
+                self._prune(now, rate, burst)
+            bucket = self._buckets[user_id] = _UserBucket(burst, now)
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+        bucket.tokens -= 1.0
+        return bucket
+
+    def _prune(self, now: float, rate: float, burst: float):
+        idle_after = burst / rate if rate > 0 else float("inf")
+        warning_interval = utils.get_setting("INBOUND_WARNING_INTERVAL_SECONDS", 30.0)
+        self._buckets = {
+            user_id: bucket for user_id, bucket in self._buckets.items()
+            if now - bucket.updated < max(idle_after, warning_interval)
+        }
+        self._prune_at = max(PRUNE_EVERY_N_USERS, 2 * len(self._buckets))
+
+    async def _drop(self, update: Update, context: ContextTypes.DEFAULT_TYPE, bucket: _UserBucket, now: float,
+                    reason: str, warning_key: str, **warning_kwargs):
+        INBOUND_DROPPED_TOTAL.inc(reason)
+        warned_at = bucket.warned_at
+        if update.effective_chat is not None and (
+                warned_at is None or now - warned_at >= utils.get_setting("INBOUND_WARNING_INTERVAL_SECONDS", 30.0)):
+            bucket.warned_at = now
+            logger.warning("Inbound filter: Dropping updates from user %s (%s); warned the user.", update.effective_user.id, reason)
+            try:
+                await context.bot.send_message(chat_id=update.effective_chat.id,
+                                               text=get_text(warning_key, get_user_lang(context, update), **warning_kwargs))
+            except TelegramError as e:
+                logger.warning("Inbound filter: Could not warn user %s: %s", update.effective_user.id, e)
+        raise ApplicationHandlerStop
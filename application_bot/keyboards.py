@@ -0,0 +1,67 @@
+# application_bot/keyboards.py
+"""
+Prebuilt reply markups for the bot's fixed keyboards.
+
+PTB markup objects are immutable once built, so one instance per (keyboard kind,
+language) is shared by every reply, and REMOVE replaces per-reply
+ReplyKeyboardRemove() instances. Each yes/no keyboard also has a reverse map from
+button text to action, so the confirm handlers match an answer with one dict
+lookup instead of comparing against get_text() results.
+
+The caches are tied to the LANGUAGES_CACHE object they were built from (one per
+bot when several run in one process, see utils.current_config()); load_languages() installs a new
+dict, which drops them on the next lookup.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+from application_bot import utils
+from application_bot.utils import get_text
+
+YES = "yes"
+NO = "no"
+
+CONFIRM_CANCEL = "confirm_cancel"  # "Cancel the current application and start a new one?"
+CONFIRM_ACTION = "confirm_action"  # "Cancel the current application?"
+
+REMOVE = ReplyKeyboardRemove()
+
+MAX_CACHED_SOURCES = 16
+
+_Entry = Tuple[ReplyKeyboardMarkup, Dict[str, str]]
+# id(languages dict) -> (that dict, {(kind, lang): entry}); the dict is kept so its id can't be reused.
+_caches: Dict[int, Tuple[Optional[dict], Dict[Tuple[str, Optional[str]], _Entry]]] = {}
+_lock = threading.Lock()
+
+
+def _entry(kind: str, lang: Optional[str]) -> _Entry:
+    languages = utils.current_config().LANGUAGES_CACHE
+    source_entry = _caches.get(id(languages))
+    if source_entry is None or source_entry[0] is not languages:
+        with _lock:
+            source_entry = _caches.get(id(languages))
+            if source_entry is None or source_entry[0] is not languages:
+                if len(_caches) >= MAX_CACHED_SOURCES:
+                    _caches.pop(next(iter(_caches)))
+                source_entry = _caches[id(languages)] = (languages, {})
+    cache = source_entry[1]
+    key = (kind, lang)
+    entry = cache.get(key)
+    if entry is None:
+        yes_text = get_text(f"{kind}_yes", lang)
+        no_text = get_text(f"{kind}_no", lang)
+        markup = ReplyKeyboardMarkup([[KeyboardButton(yes_text)], [KeyboardButton(no_text)]],
+                                     one_time_keyboard=True, resize_keyboard=True)
+        entry = cache[key] = (markup, {yes_text: YES, no_text: NO})
+    return entry
+
+
+def yes_no_keyboard(kind: str, lang: Optional[str]) -> ReplyKeyboardMarkup:
+    return _entry(kind, lang)[0]
+
+
+def match_answer(kind: str, lang: Optional[str], text: Optional[str]) -> Optional[str]:
+    """YES or NO if `text` is one of the keyboard's buttons, else None."""
+    return _entry(kind, lang)[1].get(text)
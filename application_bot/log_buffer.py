@@ -0,0 +1,139 @@
+# application_bot/log_buffer.py
+"""
+Ring buffer of GUI log lines with a filter index, so the webview only ever holds
+the rows it is displaying.
+
+Lines get consecutive sequence numbers; the line with sequence `seq` lives in slot
+`seq % capacity`, so lookups by sequence are O(1) and old lines are overwritten in
+place. Level/search views are kept as sorted lists of matching sequence numbers,
+built once and then extended incrementally as lines arrive (a small LRU of views
+covers switching back and forth between filters).
+"""
+import bisect
+import html
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_CAPACITY = 100_000
+MAX_CACHED_VIEWS = 8
+
+
+class _FilterView:
+    __slots__ = ("seqs", "scanned_upto")
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        self.scanned_upto = 0
+
+
+class LogRingBuffer:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, escape_html: bool = True):
+        self.capacity = capacity
+        self.escape_html = escape_html  # The webview wants HTML-safe lines; the daemon's JSON API wants raw ones
+        self._slots: List[Optional[Tuple[int, str]]] = [None] * capacity  # (levelno, line)
+        self.last_seq = 0
+        self._first_seq = 1  # Oldest line still stored; set on append and resize, never derived from capacity
+        self._views: "OrderedDict[Tuple[int, str], _FilterView]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def first_seq(self) -> int:
+        return self._first_seq
+
+    def __len__(self) -> int:
+        return self.last_seq - self.first_seq + 1 if self.last_seq else 0
+
+    def append_many(self, items: Sequence[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Stores (levelno, raw message) items; returns their (seq, stored line). Escaping happens only here."""
+        with self._lock:
+            appended = []
+            for levelno, message in items:
+                self.last_seq += 1
+                escaped = html.escape(message, quote=False) if self.escape_html else message
+                self._slots[self.last_seq % self.capacity] = (levelno, escaped)
+                appended.append((self.last_seq, escaped))
+            self._first_seq = max(self._first_seq, self.last_seq - self.capacity + 1)
+            return appended
+
+    def resize(self, capacity: int):
+        with self._lock:
+            first = max(self._first_seq, self.last_seq - capacity + 1)
+            kept = [(seq, self._slots[seq % self.capacity]) for seq in range(first, self.last_seq + 1)] if self.last_seq else []
+            self.capacity = capacity
+            self._slots = [None] * capacity
+            for seq, entry in kept:
+                self._slots[seq % capacity] = entry
+            self._first_seq = first
+            self._views.clear()
+
+    def tail(self, count: int) -> Tuple[int, List[str]]:
+        with self._lock:
+            start = max(self.first_seq, self.last_seq - count + 1)
+            return start, [self._slots[seq % self.capacity][1] for seq in range(start, self.last_seq + 1)]
+
+    def _view_for(self, min_level: int, needle: str) -> _FilterView:
+        key = (min_level, needle)
+        view = self._views.get(key)
+        if view is None:
+            view = self._views[key] = _FilterView()
+            if len(self._views) > MAX_CACHED_VIEWS:
+                self._views.popitem(last=False)
+        else:
+            self._views.move_to_end(key)
+
+        first = self.first_seq
+        if view.seqs and view.seqs[0] < first:
+            del view.seqs[:bisect.bisect_left(view.seqs, first)]
+        capacity, slots = self.capacity, self._slots
+        for seq in range(max(view.scanned_upto + 1, first), self.last_seq + 1):
+            levelno, line = slots[seq % capacity]
+            if levelno >= min_level and (not needle or needle in line.lower()):
+                view.seqs.append(seq)
+        view.scanned_upto = self.last_seq
+        return view
+
+    def _needle(self, search: str) -> str:
+        needle = search.strip().lower() if search else ""
+        return html.escape(needle, quote=False) if needle and self.escape_html else needle
+
+    def _row(self, seq: int) -> Dict[str, Any]:
+        levelno, line = self._slots[seq % self.capacity]
+        return {"seq": seq, "level": logging.getLevelName(levelno), "text": line}
+
+    def rows_since(self, last_seq: int, count: int, min_level: int = logging.NOTSET, search: str = "") -> List[Dict[str, Any]]:
+        """Up to `count` filtered rows after `last_seq`, oldest first (for incremental polling)."""
+        needle = self._needle(search)
+        with self._lock:
+            start = max(last_seq + 1, self.first_seq)
+            if min_level <= logging.NOTSET and not needle:
+                seqs = range(start, min(start + count, self.last_seq + 1))
+            else:
+                view = self._view_for(min_level, needle)
+                index = bisect.bisect_left(view.seqs, start)
+                seqs = view.seqs[index:index + count]
+            return [self._row(seq) for seq in seqs]
+
+    def query(self, start: int, count: int, min_level: int = logging.NOTSET, search: str = "") -> Dict[str, Any]:
+        """
+        Rows [start, start + count) of the view filtered by level and a case-insensitive
+        substring; a negative `start` means the last `count` rows. `total` is the number
+        of rows in the view, `firstSeq` identifies row 0.
+        """
+        needle = self._needle(search)
+        with self._lock:
+            if min_level <= logging.NOTSET and not needle:
+                first = self.first_seq
+                total = len(self)
+                start = max(0, total - count) if start < 0 else start
+                seqs = range(first + start, min(first + start + count, self.last_seq + 1))
+                first_view_seq = first
+            else:
+                view = self._view_for(min_level, needle)
+                total = len(view.seqs)
+                start = max(0, total - count) if start < 0 else start
+                seqs = view.seqs[start:start + count]
+                first_view_seq = view.seqs[0] if view.seqs else None
+            rows = [self._row(seq) for seq in seqs]
+            return {"total": total, "start": start, "rows": rows, "firstSeq": first_view_seq, "lastSeq": self.last_seq}
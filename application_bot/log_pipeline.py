@@ -0,0 +1,138 @@
+# application_bot/log_pipeline.py
+"""
+Non-blocking logging: the root logger only gets a QueueHandler, and the real
+handlers (stderr, GUI, JSON file) run on a QueueListener thread. A log call in
+the event loop thread is therefore one queue put; formatting and I/O happen on
+the listener thread.
+
+Optional JSON-lines sink, configured in settings.json:
+    LOG_JSON_FILE          - path relative to the app root ("" = disabled).
+    LOG_JSON_MAX_BYTES     - rotate when the file reaches this size.
+    LOG_JSON_BACKUP_COUNT  - rotated files to keep (log.jsonl.1, .2, ...).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from application_bot import utils
+from application_bot.utils import get_external_file_path
+
+logger = logging.getLogger(__name__)
+
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record; `extra={...}` fields are included as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    The stock QueueHandler formats the message in the caller's thread so records
+    can be pickled. Our queue never leaves the process, so records go through
+    untouched and %-formatting happens lazily on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_pipeline_lock = threading.Lock()
+
+
+def _build_json_file_handler() -> Optional[logging.Handler]:
+    json_file = utils.get_setting("LOG_JSON_FILE")
+    if not json_file:
+        return None
+    path = get_external_file_path(json_file)
+    try:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(utils.current_config().SETTINGS.get("LOG_JSON_MAX_BYTES", 10 * 1024 * 1024)),
+            backupCount=int(utils.current_config().SETTINGS.get("LOG_JSON_BACKUP_COUNT", 5)), encoding="utf-8", delay=True,
+        )
+    except (OSError, ValueError) as e:
+        logger.error("Log pipeline: Cannot open JSON log file %s: %s", path, e)
+        return None
+    handler.setFormatter(JsonLinesFormatter())
+    return handler
+
+
+def install_queue_logging(extra_handlers: Iterable[logging.Handler] = ()) -> logging.handlers.QueueListener:
+    """
+    Moves the root logger's current handlers, `extra_handlers` and the JSON sink
+    (if configured) behind a QueueListener. Calling it again rebuilds the
+    pipeline with the same handlers plus the new extras.
+    """
+    global _listener, _queue_handler
+    with _pipeline_lock:
+        root_logger = logging.getLogger()
+        handlers: List[logging.Handler] = []
+        if _listener is not None:
+            _listener.stop()
+            handlers.extend(h for h in _listener.handlers if not isinstance(h, logging.handlers.RotatingFileHandler))
+            root_logger.removeHandler(_queue_handler)
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+            handlers.append(handler)
+        handlers.extend(h for h in extra_handlers if h not in handlers)
+        json_handler = _build_json_file_handler()
+        if json_handler:
+            handlers.append(json_handler)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _queue_handler = _InProcessQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        root_logger.addHandler(_queue_handler)
+    logger.debug("Log pipeline: %d handler(s) running behind the queue listener.", len(handlers))
+    return _listener
+
+
+def queue_logging_handlers() -> List[logging.Handler]:
+    """Handlers currently fed by the listener (empty when the pipeline is not installed)."""
+    return list(_listener.handlers) if _listener is not None else []
+
+
+def shutdown_queue_logging():
+    """Flushes pending records and puts the handlers back on the root logger."""
+    global _listener, _queue_handler
+    with _pipeline_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root_logger = logging.getLogger()
+        root_logger.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            if isinstance(handler, logging.handlers.RotatingFileHandler):
+                handler.close()
+            else:
+                root_logger.addHandler(handler)
+        _listener = None
+        _queue_handler = None
+
+
+atexit.register(shutdown_queue_logging)
@@ -0,0 +1,111 @@
+# application_bot/loop_watchdog.py
+"""
+Event-loop lag monitor and blocking-call detector for the bot's loop.
+
+A heartbeat task on the loop sleeps LOOP_WATCHDOG_INTERVAL_SECONDS and records
+how late it woke up (appbot_event_loop_lag_seconds). A watcher thread checks the
+heartbeat; when the loop has not come back for more than
+LOOP_BLOCKED_THRESHOLD_SECONDS, whatever is running on the loop thread right then
+is the blocking call, so its stack is logged once per blocking episode and
+counted in appbot_event_loop_blocked_total.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from application_bot import utils
+from application_bot.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_STACK_FRAMES = 25
+
+EVENT_LOOP_LAG = REGISTRY.histogram("appbot_event_loop_lag_seconds",
+                                    "How late the watchdog heartbeat ran on the bot's event loop.", buckets=LOOP_LAG_BUCKETS)
+EVENT_LOOP_BLOCKED_TOTAL = REGISTRY.counter("appbot_event_loop_blocked_total",
+                                            "Times a callback held the bot's event loop longer than LOOP_BLOCKED_THRESHOLD_SECONDS.")
+
+
+class LoopWatchdog:
+    """Start with start() from a coroutine on the loop to watch; stop() may be called from any thread."""
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None):
+        if interval is None:
+            interval = utils.get_setting("LOOP_WATCHDOG_INTERVAL_SECONDS", 0.1)
+        if threshold is None:
+            threshold = utils.get_setting("LOOP_BLOCKED_THRESHOLD_SECONDS", 0.25)
+        self.interval = float(interval)
+        self.threshold = float(threshold)
+        self.blocked_count = 0
+        self._last_beat = time.monotonic()
+        self._beat_number = 0
+        self._reported_beat = -1
+        self._max_lag = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watcher = threading.Thread(target=self._watch, name="LoopWatchdog", daemon=True)
+        self._watcher.start()
+        logger.info("Event loop: Watchdog started (interval %.0fms, blocking threshold %.0fms).",
+                    self.interval * 1000, self.threshold * 1000)
+
+    def stop(self):
+        self._stop_event.set()
+        task, self._task = self._task, None
+        if task is not None:
+            try:
+                task.get_loop().call_soon_threadsafe(task.cancel)
+            except RuntimeError:  # Loop already closed
+                pass
+
+    async def aclose(self):
+        """stop() from a coroutine on the watched loop, waiting until the heartbeat task has finished."""
+        task = self._task
+        self.stop()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    def pop_max_lag(self) -> float:
+        """Worst lag seen since the previous call, in seconds (for the GUI dashboard)."""
+        max_lag, self._max_lag = self._max_lag, 0.0
+        return max_lag
+
+    async def _heartbeat(self):
+        interval = self.interval
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self._beat_number += 1
+            if lag > self._max_lag:
+                self._max_lag = lag
+            EVENT_LOOP_LAG.observe(lag)  # Blocking episodes are logged once, with their stack, by _watch
+
+    def _watch(self):
+        # Checking a few times per threshold keeps the captured stack close to the start of the blocking call.
+        poll = max(0.01, min(self.interval, self.threshold) / 2)
+        while not self._stop_event.wait(poll):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            beat = self._beat_number
+            if stalled < self.threshold or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            self.blocked_count += 1
+            EVENT_LOOP_BLOCKED_TOTAL.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=MAX_STACK_FRAMES)) if frame else "  (loop thread stack unavailable)\n"
+            logger.warning("Event loop: No heartbeat for %.0fms; the loop thread is busy in:\n%s", stalled * 1000, stack.rstrip())
@@ -2,17 +2,28 @@
 import logging
 import sys
 import asyncio
+from typing import Dict, Optional, Tuple
 
 from telegram import Update 
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ConversationHandler, ContextTypes 
-from telegram.request import HTTPXRequest
+from telegram.ext import Application, BasePersistence, CommandHandler, MessageHandler, filters, ConversationHandler, TypeHandler
 
 from application_bot import utils
-from application_bot.utils import load_settings, load_questions, load_languages, get_text # Added load_languages
+from application_bot.utils import load_settings, load_questions, load_languages, get_text, get_external_file_path # Added load_languages
+from application_bot.update_recorder import UpdateRecorder
 from application_bot.constants import (
     STATE_ASKING_QUESTIONS, STATE_AWAITING_PHOTO,
-    STATE_CONFIRM_CANCEL_EXISTING, STATE_CONFIRM_GLOBAL_CANCEL
+    STATE_CONFIRM_CANCEL_EXISTING, STATE_CONFIRM_GLOBAL_CANCEL, STATE_NAMES
 )
+from application_bot.metrics import instrument_handler, start_metrics_server
+from application_bot.tracing import traced
+from application_bot.log_pipeline import install_queue_logging
+from application_bot.connection_health import ConnectionHealth, ConnectivitySupervisor, HealthTrackingRequest
+from application_bot import async_fs, pdf_generator
+from application_bot.drain import drain_finalizations
+from application_bot.loop_watchdog import LoopWatchdog
+from application_bot.inbound_filter import InboundFilter
+from application_bot.polling import catch_up, polling_kwargs
+from application_bot.prewarm import TIMINGS_KEY as PREWARM_TIMINGS_KEY, prewarm
 from application_bot.handlers.command_handlers import (
     start_command as ch_start_command,
     help_command as ch_help_command,
@@ -27,128 +38,278 @@ from application_bot.handlers.conversation_logic import (
     handle_confirm_global_cancel as cl_handle_confirm_global_cancel,
     unhandled_message_in_conv as cl_unhandled_message_in_conv,
     conversation_timeout_handler_function as cl_conversation_timeout_handler,
-    cleanup_user_application_data
+    cleanup_user_application_data,
+    resume_checkpointed_finalizations
 )
 
 logger = logging.getLogger(__name__)
 
-async def global_file_size_filter(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    if not utils.SETTINGS: return True
-
-    max_size_mb = utils.SETTINGS.get("MAX_ALLOWED_FILE_SIZE_MB", 10)
-    max_size_bytes = max_size_mb * 1024 * 1024
-    message = update.message
-
-    file_to_check = None
-    if message:
-        if message.document: file_to_check = message.document
-        elif message.video: file_to_check = message.video
-        elif message.animation: file_to_check = message.animation
-        elif message.audio: file_to_check = message.audio
-        elif message.voice: file_to_check = message.voice
-
-    if file_to_check and hasattr(file_to_check, 'file_size') and file_to_check.file_size and file_to_check.file_size > max_size_bytes:
-        user_id = message.from_user.id if message.from_user else "UnknownUser"
-        file_type = "file"
-        if message.document: file_type = "document"
-        elif message.video: file_type = "video"
-
-        logger.warning(
-            f"User {user_id} sent a large unsolicited {file_type} "
-            f"({file_to_check.file_size} bytes). Max allowed: {max_size_bytes} bytes. Message will be ignored by this filter."
-        )
-        return False 
-    return True 
+def bot_api_endpoint(base_url: Optional[str] = None, base_file_url: Optional[str] = None,
+                     local_mode: Optional[bool] = None) -> Tuple[str, str, bool]:
+    """(base_url, base_file_url, local_mode); arguments that are None come from the BOT_API_* settings."""
+    config = utils.current_config()
+    if base_url is None:
+        base_url = config.SETTINGS.get("BOT_API_BASE_URL", "")
+    if base_file_url is None:
+        base_file_url = config.SETTINGS.get("BOT_API_BASE_FILE_URL", "")
+    if local_mode is None:
+        local_mode = bool(config.SETTINGS.get("BOT_API_LOCAL_MODE", False))
+    return base_url or "", base_file_url or "", local_mode
 
-def create_bot_application():
-    if not utils.SETTINGS or not utils.SETTINGS.get("BOT_TOKEN"):
+def create_bot_application(base_url: Optional[str] = None, base_file_url: Optional[str] = None,
+                           local_mode: Optional[bool] = None, persistence: Optional[BasePersistence] = None):
+    """
+    Builds the Application with all handlers registered.
+    `base_url`/`base_file_url` point the bot at a different Bot API server
+    (a self-hosted one, or the fake server in devtools) and `local_mode` enables
+    that server's local mode; each falls back to its BOT_API_* setting, and PTB
+    defaults are used when both are empty. With `persistence`, user data and
+    conversation states are stored there (see shared_state.py).
+    """
+    config = utils.current_config()
+    if not utils.get_setting("BOT_TOKEN"):
         logger.critical("BOT_TOKEN not found in settings. Bot cannot be created.")
         return None
-    if utils.QUESTIONS is None:
+    if config.QUESTIONS is None:
         logger.warning("QUESTIONS not loaded. /apply command might fail.")
-    if utils.LANGUAGES_CACHE is None: # Added check for languages
+    if config.LANGUAGES_CACHE is None: # Added check for languages
         logger.warning("LANGUAGES_CACHE not loaded. Bot text might be affected.")
 
 
-    connect_timeout = utils.SETTINGS.get("HTTP_CONNECT_TIMEOUT", 10.0)
-    read_timeout = utils.SETTINGS.get("HTTP_READ_TIMEOUT", 30.0)
-    write_timeout = utils.SETTINGS.get("HTTP_WRITE_TIMEOUT", 30.0)
-    pool_timeout = utils.SETTINGS.get("HTTP_POOL_TIMEOUT", 15.0)
-    logger.info(
-        f"Configuring HTTPX timeouts: connect={connect_timeout}s, read={read_timeout}s, "
-        f"write={write_timeout}s, pool={pool_timeout}s"
+    base_url, base_file_url, local_mode = bot_api_endpoint(base_url, base_file_url, local_mode)
+    timeouts = _http_timeouts()
+    # Both request objects report their outcomes here; see connection_health.py.
+    health = ConnectionHealth()
+    custom_request = HealthTrackingRequest(
+        health, connect_timeout=timeouts["connect"], read_timeout=timeouts["read"],
+        write_timeout=timeouts["write"], pool_timeout=timeouts["pool"]
     )
-    custom_request = HTTPXRequest(
-        connect_timeout=connect_timeout, read_timeout=read_timeout,
-        write_timeout=write_timeout, pool_timeout=pool_timeout
+    get_updates_request = HealthTrackingRequest(health, connect_timeout=timeouts["connect"], pool_timeout=timeouts["pool"])
+    app_builder = (
+        Application.builder().token(config.SETTINGS["BOT_TOKEN"]).concurrent_updates(True)
+        .request(custom_request).get_updates_request(get_updates_request)
     )
-    app_builder = Application.builder().token(utils.SETTINGS["BOT_TOKEN"]).concurrent_updates(True).request(custom_request)
+    if base_url:
+        logger.info("Using custom Bot API base URL: %s", base_url)
+        app_builder = app_builder.base_url(base_url)
+    if base_file_url:
+        app_builder = app_builder.base_file_url(base_file_url)
+    if local_mode:
+        # Files are exchanged as paths on the Bot API server's disk: no downloads, no uploads, no 20 MB limit.
+        logger.info("Bot API local mode is on; photos are read and PDFs sent by local path.")
+        app_builder = app_builder.local_mode(True)
+    if persistence is not None:
+        app_builder = app_builder.persistence(persistence)
     application = app_builder.build()
+    application.bot_data["connection_health"] = health
+    application.bot_data["http_requests"] = (custom_request, get_updates_request)
+    _register_handlers(application)
+
+    logger.info("Telegram Bot Application instance created and configured with custom timeouts and file filters.")
+    return application
+
+def _http_timeouts() -> Dict[str, float]:
+    config = utils.current_config()
+    timeouts = {
+        "connect": config.SETTINGS.get("HTTP_CONNECT_TIMEOUT", 10.0),
+        "read": config.SETTINGS.get("HTTP_READ_TIMEOUT", 30.0),
+        "write": config.SETTINGS.get("HTTP_WRITE_TIMEOUT", 30.0),
+        "pool": config.SETTINGS.get("HTTP_POOL_TIMEOUT", 15.0),
+    }
+    logger.info(
+        f"Configuring HTTPX timeouts: connect={timeouts['connect']}s, read={timeouts['read']}s, "
+        f"write={timeouts['write']}s, pool={timeouts['pool']}s"
+    )
+    return timeouts
+
+def _handler_config() -> Tuple:
+    """The settings _register_handlers depends on; a change means the handlers must be rebuilt."""
+    settings = utils.current_config().SETTINGS
+    return (settings.get("CONVERSATION_TIMEOUT_SECONDS", 1200), settings.get("RECORD_UPDATES_FILE"),
+            settings.get("INBOUND_FILTER_ENABLED", True))
+
+def _register_handlers(application: Application):
+    config = utils.current_config()
+
+    def conv(name, callback):
+        return instrument_handler(name, traced(name, callback), STATE_NAMES)
 
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("apply", cl_apply_command_entry)],
+        entry_points=[CommandHandler("apply", conv("apply_command_entry", cl_apply_command_entry))],
         states={
             STATE_ASKING_QUESTIONS: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, cl_handle_answer)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, conv("handle_answer", cl_handle_answer))
             ],
             STATE_AWAITING_PHOTO: [
                 MessageHandler(
                     filters.PHOTO | filters.TEXT | filters.Document.DOC | filters.VIDEO | filters.ANIMATION | filters.AUDIO | filters.VOICE | filters.Sticker.ALL, 
-                    cl_handle_photo 
+                    conv("handle_photo", cl_handle_photo)
                 )
             ],
             STATE_CONFIRM_CANCEL_EXISTING: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, cl_handle_confirm_cancel_existing)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, conv("handle_confirm_cancel_existing", cl_handle_confirm_cancel_existing))
             ],
             STATE_CONFIRM_GLOBAL_CANCEL: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, cl_handle_confirm_global_cancel)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, conv("handle_confirm_global_cancel", cl_handle_confirm_global_cancel))
+            ],
+            ConversationHandler.TIMEOUT: [
+                TypeHandler(Update, conv("conversation_timeout", cl_conversation_timeout_handler))
             ],
         },
         fallbacks=[
-            CommandHandler("cancel", ch_cancel_entry_point), 
-            MessageHandler(filters.COMMAND, cl_unhandled_message_in_conv),
+            CommandHandler("cancel", conv("cancel_command_entry_point", ch_cancel_entry_point)), 
+            MessageHandler(filters.COMMAND, conv("unhandled_message_in_conv", cl_unhandled_message_in_conv)),
         ],
-        conversation_timeout=utils.SETTINGS.get("CONVERSATION_TIMEOUT_SECONDS", 1200),
+        conversation_timeout=config.SETTINGS.get("CONVERSATION_TIMEOUT_SECONDS", 1200),
         per_user=True,
         per_chat=True,
-        # Removed timeout handler from fallbacks, it's a direct kwarg.
-        # map_to_parent is not used here.
+        name="application",
+        persistent=application.persistence is not None,
     )
-    # Add conversation_timeout_handler_function as a direct argument to ConversationHandler
-    # application.add_handler(TypeHandler(Update, cl_conversation_timeout_handler), group=-1) # This is how PTB examples show it for timeout
+
+    record_updates_file = config.SETTINGS.get("RECORD_UPDATES_FILE")
+    if record_updates_file:
+        recorder = UpdateRecorder(get_external_file_path(record_updates_file))
+        application.bot_data["update_recorder"] = recorder
+        # Lowest group so every update is recorded before any handler can consume it.
+        application.add_handler(TypeHandler(Update, recorder.handle_update, block=False), group=-100)
+
+    if config.SETTINGS.get("INBOUND_FILTER_ENABLED", True):
+        # Keep the per-user buckets across warm restarts so a flood can't reset its own limit.
+        inbound_filter = application.bot_data.get("inbound_filter") or InboundFilter()
+        application.bot_data["inbound_filter"] = inbound_filter
+        # Group -1 runs before the conversation; the filter stops oversize files and floods there.
+        application.add_handler(TypeHandler(Update, inbound_filter.handle_update), group=-1)
+    else:
+        application.bot_data.pop("inbound_filter", None)
 
     application.add_handler(conv_handler)
-    application.add_handler(CommandHandler("start", ch_start_command))
-    application.add_handler(CommandHandler("help", ch_help_command))
+    application.add_handler(CommandHandler("start", instrument_handler("start_command", traced("start_command", ch_start_command))))
+    application.add_handler(CommandHandler("help", instrument_handler("help_command", traced("help_command", ch_help_command))))
+    application.bot_data["conversation_handler"] = conv_handler
+    application.bot_data["handler_config"] = _handler_config()
 
-    logger.info("Telegram Bot Application instance created and configured with custom timeouts and file filters.")
-    return application
+def reconfigure_application(application: Application):
+    """
+    Applies the current bot's settings to an existing Application for a warm restart:
+    HTTP timeouts are changed in place (the connection pool is kept) and handlers are
+    rebuilt only if their settings changed, carrying in-progress conversations over.
+    BOT_TOKEN changes need a new Application.
+    """
+    timeouts = _http_timeouts()
+    custom_request, get_updates_request = application.bot_data["http_requests"]
+    custom_request.set_timeouts(**timeouts)
+    get_updates_request.set_timeouts(connect=timeouts["connect"], pool=timeouts["pool"])
+
+    if application.bot_data.get("handler_config") == _handler_config():
+        return
+    logger.info("Handler settings changed; re-registering handlers.")
+    old_conv_handler = application.bot_data.get("conversation_handler")
+    old_recorder = application.bot_data.pop("update_recorder", None)
+    for group, handlers in list(application.handlers.items()):
+        for handler in list(handlers):
+            application.remove_handler(handler, group)
+    if old_recorder:
+        old_recorder.stop()
+    _register_handlers(application)
+    if old_conv_handler:
+        # PTB keeps conversation states on the handler itself; move them so nobody loses their place.
+        application.bot_data["conversation_handler"]._conversations.update(old_conv_handler._conversations)
+
+async def start_bot_async(application: Application, loop_watchdog: bool = True):
+    """
+    Brings the Application up to polling. Steps that are already done are skipped,
+    so this also resumes polling on an Application paused by pause_polling_async.
+    `loop_watchdog=False` skips this bot's LoopWatchdog, for hosts that watch the loop themselves.
+    """
+    config = utils.current_config()
+    if "rate_limits" not in application.bot_data:
+        application.bot_data["rate_limits"] = {}
+    recorder = application.bot_data.get("update_recorder")
+    if recorder:
+        recorder.start()
+    metrics_port = utils.get_setting("METRICS_PORT")
+    if metrics_port:
+        start_metrics_server(config.SETTINGS.get("METRICS_HOST", "127.0.0.1"), int(metrics_port))
+    if loop_watchdog and config.SETTINGS.get("LOOP_WATCHDOG_ENABLED", True) and "loop_watchdog" not in application.bot_data:
+        watchdog = application.bot_data["loop_watchdog"] = LoopWatchdog()
+        watchdog.start()
+    logger.info("Initializing bot application...")
+    await application.initialize()  # No-op once initialized
+    supervisor = application.bot_data.get("connectivity_supervisor")
+    if supervisor:
+        supervisor.polling_enabled = True
+    prewarm_task = None
+    if config.SETTINGS.get("PREWARM_ENABLED", True) and PREWARM_TIMINGS_KEY not in application.bot_data:
+        # Overlaps the backlog catch-up; finished before the first update is polled.
+        prewarm_task = asyncio.create_task(prewarm(application))
+    if not application.updater.running:
+        polling = polling_kwargs(application)
+        if config.SETTINGS.get("CATCH_UP_ENABLED", True):
+            await catch_up(application, polling["allowed_updates"])
+        if prewarm_task:
+            await prewarm_task
+        logger.info("Starting bot updater to poll for updates (%s)...", ", ".join(polling["allowed_updates"]))
+        await application.updater.start_polling(**polling)
+    if prewarm_task and not prewarm_task.done():
+        await prewarm_task
+    if not application.running:
+        logger.info("Starting bot application processor...")
+        await application.start()
+    if not application.bot_data.get("checkpoints_resumed"):
+        # Applications a previous shutdown could not finish in time (see drain.py).
+        application.bot_data["checkpoints_resumed"] = True
+        await resume_checkpointed_finalizations(application)
+    health = application.bot_data.get("connection_health")
+    if health and supervisor is None:
+        supervisor = application.bot_data["connectivity_supervisor"] = ConnectivitySupervisor(application, health)
+        application.bot_data["connectivity_supervisor_task"] = asyncio.create_task(supervisor.run())
+    logger.info("Bot is now running and polling for messages.")
+
+async def pause_polling_async(application: Application):
+    """Stops fetching updates but keeps the Application, its connections and conversations alive."""
+    supervisor = application.bot_data.get("connectivity_supervisor")
+    if supervisor:
+        supervisor.polling_enabled = False
+    if application.updater and application.updater.running:
+        logger.info("Pausing bot updater...")
+        await application.updater.stop()
+
+def _cancel_supervisor(application: Application):
+    application.bot_data.pop("connectivity_supervisor", None)
+    supervisor_task = application.bot_data.pop("connectivity_supervisor_task", None)
+    if supervisor_task:
+        supervisor_task.cancel()
+
+def _stop_loop_watchdog(application: Application):
+    watchdog = application.bot_data.pop("loop_watchdog", None)
+    if watchdog:
+        watchdog.stop()
 
-async def run_bot_async(application: Application):
+async def run_bot_async(application: Application, loop_watchdog: bool = True):
     if not application:
         logger.error("Application instance is None. Cannot run bot.")
         return
     try:
-        logger.info("Initializing bot application...")
-        if "rate_limits" not in application.bot_data:
-            application.bot_data["rate_limits"] = {}
-        await application.initialize()
-        logger.info("Starting bot updater to poll for updates...")
-        await application.updater.start_polling()
-        logger.info("Starting bot application processor...")
-        await application.start()
-        logger.info("Bot is now running and polling for messages.")
-        while application.updater and application.updater.running:
+        await start_bot_async(application, loop_watchdog=loop_watchdog)
+        supervisor = application.bot_data.get("connectivity_supervisor")
+        # Polling may be paused by the supervisor while the Bot API is unreachable; that is not a stop.
+        while application.running and application.updater and (application.updater.running or (supervisor and supervisor.paused)):
             await asyncio.sleep(1)
         logger.info("Bot polling has stopped (updater not running).")
     except Exception as e:
-        logger.error(f"Exception during bot operation: {e}", exc_info=True)
+        logger.error("Exception during bot operation: %s", e, exc_info=True)
     finally:
         logger.info("Bot run_bot_async function is finishing. Ensuring cleanup...")
+        _cancel_supervisor(application)
+        _stop_loop_watchdog(application)
         if application.running:
             await application.stop()
         if application.updater and application.updater.running:
             await application.updater.stop()
+        recorder = application.bot_data.get("update_recorder")
+        if recorder:
+            recorder.stop()
 
 async def stop_bot_async(application: Application):
     if not application:
@@ -156,28 +317,44 @@ async def stop_bot_async(application: Application):
         return
     try:
         logger.info("Attempting to stop bot gracefully...")
+        _cancel_supervisor(application)
+        _stop_loop_watchdog(application)
         if application.updater and application.updater.running:
             logger.info("Stopping updater...")
             await application.updater.stop()
         else:
             logger.info("Updater not running or not present.")
         if application.running:
+            # No new updates arrive now; give running finalizations their deadline, checkpoint the rest.
+            await drain_finalizations(application.bot_data)
             logger.info("Stopping application processor...")
             await application.stop()
         else:
             logger.info("Application processor not running.")
         logger.info("Shutting down application...")
         await application.shutdown()
+        recorder = application.bot_data.get("update_recorder")
+        if recorder:
+            recorder.stop()
         logger.info("Bot has been shut down.")
     except Exception as e:
-        logger.error(f"Exception during bot stop: {e}", exc_info=True)
+        logger.error("Exception during bot stop: %s", e, exc_info=True)
+
+def shutdown_pools():
+    """
+    Stops the process-wide filesystem and PDF render pools. They are shared by every
+    bot in the process (see tenants.py), so this runs once at process shutdown, not per
+    Application. Queued temp photo deletes still run; the caller does not wait for them.
+    """
+    async_fs.shutdown(wait=False)
+    pdf_generator.shutdown(wait=False)
 
 def main_cli():
-    if not load_settings(): # Loads settings into utils.SETTINGS
+    if not load_settings(): # Loads settings into utils.current_config().SETTINGS
         sys.exit("CRITICAL: Settings not loaded. Exiting CLI.")
-    if not load_languages(): # Loads languages into utils.LANGUAGES_CACHE
+    if not load_languages(): # Loads languages into utils.current_config().LANGUAGES_CACHE
         logger.warning("CLI: Languages not loaded. Bot text might be affected.")
-    if not load_questions(): # Loads questions into utils.QUESTIONS
+    if not load_questions(): # Loads questions into utils.current_config().QUESTIONS
         logger.warning("CLI: Questions not loaded. /apply may be affected.")
 
     if not logging.getLogger().handlers:
@@ -185,6 +362,7 @@ def main_cli():
             format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
         )
         logging.getLogger("httpx").setLevel(logging.WARNING)
+    install_queue_logging()
 
     logger.info("Starting bot in CLI mode...")
     application = create_bot_application()
@@ -199,6 +377,7 @@ def main_cli():
             if application: 
                  loop.run_until_complete(stop_bot_async(application))
         finally:
+            shutdown_pools()
             if loop.is_running():
                 loop.stop() 
             # loop.close() # Not typically needed here as run_until_complete handles it
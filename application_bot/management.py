@@ -0,0 +1,190 @@
+# application_bot/management.py
+"""
+Settings and questions operations shared by every control surface (the pywebview
+GUI and the headless daemon's control API). No UI dependencies.
+"""
+import copy
+import logging
+from typing import Any, Dict, List
+
+from application_bot import utils
+from application_bot.utils import save_settings
+from application_bot.question_engine import compile_questions
+
+logger = logging.getLogger(__name__)
+
+
+def get_questions():
+    logger.info("Management: Received request for questions.")
+    config = utils.current_config()
+    if config.QUESTIONS is None:
+        logger.info("Management: QUESTIONS is None, attempting to load.")
+        utils.load_questions()
+
+    if config.QUESTIONS is not None:
+        logger.debug("Management: Returning questions: %s", config.QUESTIONS)
+        return config.QUESTIONS
+    else:
+        logger.warning("Management: Questions still not loaded after attempt, returning empty list to UI.")
+        return []
+
+
+def save_questions(questions_data: List[dict]):
+    logger.info("Management: Received request to save questions. Count: %s", len(questions_data) if questions_data else 'None')
+    if not isinstance(questions_data, list):
+        logger.error("Management: Invalid data format for saving questions. Expected a list.")
+        return False 
+
+    for i, q_item in enumerate(questions_data):
+        if not isinstance(q_item, dict) or "id" not in q_item or "text" not in q_item:
+            logger.error("Management: Invalid question item format at index %s: %s. Missing 'id' or 'text'.", i, q_item)
+            return False
+        if not q_item["text"]:
+             logger.error("Management: Question text is empty at index %s: %s.", i, q_item)
+             return False 
+
+    compile_errors: List[str] = []
+    compile_questions(questions_data, compile_errors)
+    if compile_errors:
+        for error in compile_errors:
+            logger.error("Management: Invalid question definition: %s", error)
+        return False
+
+    if utils.save_questions(questions_data):
+        logger.info("Management: Questions saved and reloaded successfully via utils.save_questions.")
+        return True 
+    else:
+        logger.error("Management: Failed to save questions via utils.save_questions.")
+        return False 
+
+
+def get_editable_settings() -> Dict[str, Any]:
+    logger.info("Management: Received request for all settings.")
+    config = utils.current_config()
+    if not config.SETTINGS:
+        logger.critical("Management: SETTINGS is unexpectedly None in get_editable_settings. This shouldn't happen.")
+        return {
+            "OVERRIDE_USER_LANG": True, "DEFAULT_LANG": "en", "THEME": "default-dark",
+            "SELECTED_LOGO": "default", 
+            "BOT_TOKEN": "", "ADMIN_USER_IDS": "",
+            "APPLICATION_PHOTO_NUMB": 1, "SEND_PDF_TO_ADMINS": True,
+            "TRACING_ENABLED": False, "PROFILE_SAMPLE_EVERY_N": 0,
+            "FONT_FILE_PATH": "fonts/DejaVuSans.ttf",
+            "PDF_SETTINGS": {
+                "page_width_mm": 210, "page_height_mm": 297, "margin_mm": 15,
+                "photo_position": "top_right", "photo_width_mm": 80,
+                "font_name_registered": "CustomUnicodeFont", "title_font_size": 16,
+                "header_font_size": 10, "question_font_size": 12,
+                "question_bold": True, "answer_font_size": 10
+            }
+        }
+
+    pdf_settings_data = config.SETTINGS.get("PDF_SETTINGS", {}).copy()
+    default_pdf_config = {
+        "page_width_mm": 210, "page_height_mm": 297, "margin_mm": 15,
+        "photo_position": "top_right", "photo_width_mm": 80,
+        "font_name_registered": "CustomUnicodeFont", "title_font_size": 16,
+        "header_font_size": 10, "question_font_size": 12,
+        "question_bold": True, "answer_font_size": 10
+    }
+    for key, default_value in default_pdf_config.items():
+        pdf_settings_data.setdefault(key, default_value)
+
+    return {
+        "OVERRIDE_USER_LANG": config.SETTINGS.get("OVERRIDE_USER_LANG", True),
+        "DEFAULT_LANG": config.SETTINGS.get("DEFAULT_LANG", "en"),
+        "THEME": config.SETTINGS.get("THEME", "default-dark"),
+        "SELECTED_LOGO": config.SETTINGS.get("SELECTED_LOGO", "default"), 
+        "BOT_TOKEN": config.SETTINGS.get("BOT_TOKEN", ""),
+        "ADMIN_USER_IDS": config.SETTINGS.get("ADMIN_USER_IDS", ""),
+        "APPLICATION_PHOTO_NUMB": config.SETTINGS.get("APPLICATION_PHOTO_NUMB", 1),
+        "SEND_PDF_TO_ADMINS": config.SETTINGS.get("SEND_PDF_TO_ADMINS", True),
+        "TRACING_ENABLED": config.SETTINGS.get("TRACING_ENABLED", False),
+        "PROFILE_SAMPLE_EVERY_N": config.SETTINGS.get("PROFILE_SAMPLE_EVERY_N", 0),
+        "FONT_FILE_PATH": config.SETTINGS.get("FONT_FILE_PATH", "fonts/DejaVuSans.ttf"),
+        "PDF_SETTINGS": pdf_settings_data
+    }
+
+
+def save_editable_settings(new_settings_data: Dict[str, Any]) -> bool:
+    config = utils.current_config()
+    loggable_settings_data = copy.deepcopy(new_settings_data)
+    if "BOT_TOKEN" in loggable_settings_data:
+        loggable_settings_data["BOT_TOKEN"] = "[REDACTED]"
+
+    logger.info("Management: Received request to save all settings: %s", loggable_settings_data) 
+
+    if not config.SETTINGS:
+        logger.error("Management: Cannot save settings, SETTINGS not loaded/initialized.")
+        return False
+    if not isinstance(new_settings_data, dict):
+        logger.error("Management: Invalid structure for settings data: %s", new_settings_data) 
+        return False
+
+    config.SETTINGS["OVERRIDE_USER_LANG"] = bool(new_settings_data.get("OVERRIDE_USER_LANG", True))
+    config.SETTINGS["THEME"] = str(new_settings_data.get("THEME", "default-dark"))
+    config.SETTINGS["SELECTED_LOGO"] = str(new_settings_data.get("SELECTED_LOGO", "default")) 
+
+    bot_token = str(new_settings_data.get("BOT_TOKEN", "")).strip()
+    if not bot_token:
+        logger.error("Management: Bot Token cannot be empty.")
+        return False 
+    config.SETTINGS["BOT_TOKEN"] = bot_token 
+    config.SETTINGS["ADMIN_USER_IDS"] = str(new_settings_data.get("ADMIN_USER_IDS", "")).strip()
+
+    try:
+        photo_numb = int(new_settings_data.get("APPLICATION_PHOTO_NUMB", 1))
+        if photo_numb < 0: raise ValueError("Cannot be negative")
+        config.SETTINGS["APPLICATION_PHOTO_NUMB"] = photo_numb
+    except (ValueError, TypeError):
+        logger.error("Management: Invalid value for APPLICATION_PHOTO_NUMB.")
+        return False
+    config.SETTINGS["SEND_PDF_TO_ADMINS"] = bool(new_settings_data.get("SEND_PDF_TO_ADMINS", True))
+    # Tracing and profiling are read per update, so these apply to the running bot immediately.
+    config.SETTINGS["TRACING_ENABLED"] = bool(new_settings_data.get("TRACING_ENABLED", False))
+    try:
+        profile_every_n = int(new_settings_data.get("PROFILE_SAMPLE_EVERY_N", 0))
+        if profile_every_n < 0: raise ValueError("Cannot be negative")
+        config.SETTINGS["PROFILE_SAMPLE_EVERY_N"] = profile_every_n
+    except (ValueError, TypeError):
+        logger.error("Management: Invalid value for PROFILE_SAMPLE_EVERY_N.")
+        return False
+
+    if "FONT_FILE_PATH" in new_settings_data and \
+       "PDF_SETTINGS" in new_settings_data and \
+       isinstance(new_settings_data["PDF_SETTINGS"], dict):
+
+        config.SETTINGS["FONT_FILE_PATH"] = str(new_settings_data["FONT_FILE_PATH"]).strip()
+
+        if "PDF_SETTINGS" not in config.SETTINGS:
+            config.SETTINGS["PDF_SETTINGS"] = {}
+
+        pdf_sub_settings_from_ui = new_settings_data["PDF_SETTINGS"]
+        current_pdf_settings = config.SETTINGS["PDF_SETTINGS"]
+
+        try:
+            current_pdf_settings["font_name_registered"] = str(pdf_sub_settings_from_ui.get("font_name_registered", "CustomUnicodeFont")).strip()
+            current_pdf_settings["photo_position"] = str(pdf_sub_settings_from_ui.get("photo_position", "top_right"))
+
+            numeric_keys_float = ["page_width_mm", "page_height_mm", "margin_mm", "photo_width_mm"]
+            for key in numeric_keys_float:
+                current_pdf_settings[key] = float(pdf_sub_settings_from_ui.get(key, current_pdf_settings.get(key, 0.0)))
+
+            numeric_keys_int = ["title_font_size", "header_font_size", "question_font_size", "answer_font_size"]
+            for key in numeric_keys_int:
+                 current_pdf_settings[key] = int(pdf_sub_settings_from_ui.get(key, current_pdf_settings.get(key, 0)))
+
+            current_pdf_settings["question_bold"] = bool(pdf_sub_settings_from_ui.get("question_bold", True))
+
+        except (ValueError, TypeError) as e:
+            logger.error("Management: Invalid data type in PDF sub-settings: %s. Data: %s", e, pdf_sub_settings_from_ui)
+            return False 
+    else:
+        logger.warning("Management: FONT_FILE_PATH or PDF_SETTINGS structure missing/malformed in save_all_settings data.")
+
+    if save_settings(config.SETTINGS):
+        logger.info("Management: All settings saved successfully to settings.json.")
+        return True 
+    else:
+        logger.error("Management: Failed to save updated settings to settings.json.")
+        return False
@@ -0,0 +1,318 @@
+# application_bot/metrics.py
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms keyed by label values. Updating a
+metric is a dict lookup plus an add under a per-metric lock, so it is cheap
+enough for the handler hot path. Enable the HTTP endpoint with METRICS_PORT
+(and optionally METRICS_HOST) in settings.json; it serves GET /metrics.
+"""
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from application_bot.session import SESSION_KEY, applications_in_flight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape_label_value(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Tuple) -> Tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return labels
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(tuple(labels), 0.0)
+
+    def total(self) -> float:
+        """Sum over all label sets."""
+        with self._lock:
+            return sum(self._values.values())
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Optional[Callable[[], float]]):
+        """Makes an unlabeled gauge report `function()` whenever it is read, instead of a stored value."""
+        if self.labelnames:
+            raise ValueError(f"{self.name}: set_function needs an unlabeled gauge")
+        self._function = function
+
+    def set(self, value: float, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._values.get(tuple(labels), 0.0)
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {self.value()}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, *labels) -> Optional[Tuple[Tuple[float, ...], List[int], float]]:
+        """(bucket bounds, non-cumulative counts incl. +Inf, sum) for one label set."""
+        with self._lock:
+            series = self._values.get(tuple(labels))
+            if series is None:
+                return None
+            return self.buckets, list(series[:-1]), series[-1]
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le_label = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le_label)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le_label = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def histogram_quantile(bounds: Sequence[float], counts: Sequence[float], q: float) -> Optional[float]:
+    """
+    Estimates the q-quantile from non-cumulative bucket counts (last entry = +Inf),
+    interpolating linearly inside the bucket like Prometheus' histogram_quantile.
+    """
+    total = sum(counts)
+    if total <= 0:
+        return None
+    rank = q * total
+    cumulative = 0.0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count > 0:
+            if index >= len(bounds):
+                return bounds[-1] if bounds else None  # Falls in +Inf: the largest finite bound is the best estimate
+            lower = bounds[index - 1] if index > 0 else 0.0
+            return lower + (bounds[index] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return bounds[-1] if bounds else None
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Bot runtime metrics ---
+UPDATES_TOTAL = REGISTRY.counter("appbot_updates_total", "Updates dispatched to each handler.", ["handler"])
+HANDLER_ERRORS_TOTAL = REGISTRY.counter("appbot_handler_errors_total", "Handler invocations that raised.", ["handler"])
+HANDLER_LATENCY = REGISTRY.histogram("appbot_handler_latency_seconds", "Handler wall time.", ["handler"])
+STATE_TRANSITIONS_TOTAL = REGISTRY.counter("appbot_conversation_transitions_total",
+                                           "Conversation state transitions.", ["from_state", "to_state"])
+CONVERSATIONS_IN_FLIGHT = REGISTRY.gauge("appbot_conversations_in_flight", "Applications currently in progress.")
+CONVERSATIONS_IN_FLIGHT.set_function(applications_in_flight)
+PDF_RENDER_SECONDS = REGISTRY.histogram("appbot_pdf_render_seconds", "Time to render an application PDF.")
+PDF_SIZE_BYTES = REGISTRY.histogram("appbot_pdf_size_bytes", "Size of rendered application PDFs.",
+                                    buckets=SIZE_BUCKETS)
+PDF_FAILURES_TOTAL = REGISTRY.counter("appbot_pdf_failures_total", "PDF renders that produced no file.")
+PHOTO_DOWNLOAD_SECONDS = REGISTRY.histogram("appbot_photo_download_seconds", "Time to fetch one applicant photo.")
+PHOTO_DOWNLOAD_BYTES = REGISTRY.counter("appbot_photo_download_bytes_total", "Bytes of applicant photos downloaded.")
+PHOTO_DOWNLOAD_FAILURES_TOTAL = REGISTRY.counter("appbot_photo_download_failures_total",
+                                                 "Photo downloads that failed.")
+ADMIN_DELIVERY_SECONDS = REGISTRY.histogram("appbot_admin_delivery_seconds", "Time to send one PDF to one admin.")
+ADMIN_DELIVERY_FAILURES_TOTAL = REGISTRY.counter("appbot_admin_delivery_failures_total",
+                                                 "PDF deliveries to admins that failed.")
+ADMIN_DELIVERY_BACKLOG = REGISTRY.gauge("appbot_admin_delivery_backlog", "PDF deliveries to admins not yet attempted or in progress.")
+RATE_LIMIT_REJECTIONS_TOTAL = REGISTRY.counter("appbot_rate_limit_rejections_total",
+                                               "/apply attempts rejected by the submission rate limit.")
+
+
+def instrument_handler(name: str, callback: Callable, state_names: Optional[Dict[object, str]] = None) -> Callable:
+    """
+    Wraps an async PTB handler callback to count calls, time them and, if
+    `state_names` is given, record the conversation state transition it returns.
+    """
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        from_state = None
+        if state_names is not None and context.user_data is not None:
+            session = context.user_data.get(SESSION_KEY)
+            from_state = state_names.get(session.state if session is not None else None, "none")
+        started = time.perf_counter()
+        try:
+            result = await callback(update, context, *args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS_TOTAL.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+            UPDATES_TOTAL.inc(name)
+        if state_names is not None:
+            STATE_TRANSITIONS_TOTAL.inc(from_state, state_names.get(result, str(result)))
+        return result
+    return wrapper
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args):  # noqa: A002 - signature from base class
+        logger.debug("Metrics endpoint: " + format, *args)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host: str, port: int) -> Optional[ThreadingHTTPServer]:
+    """Starts the /metrics endpoint once per process; later calls return the running server."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        except OSError as e:
+            logger.error("Metrics: Could not listen on %s:%s: %s", host, port, e)
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+        _server = server
+        logger.info("Metrics: Serving Prometheus metrics on http://%s:%s/metrics", host, server.server_address[1])
+        return server
+
+
+def stop_metrics_server():
+    global _server
+    with _server_lock:
+        if _server is None:
+            return
+        _server.shutdown()
+        _server.server_close()
+        _server = None
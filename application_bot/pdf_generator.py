@@ -7,17 +7,32 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_CENTER # Removed TA_LEFT, TA_RIGHT as they were not used here.
 from PIL import Image as PILImage
+import asyncio
+import contextvars
+import functools
+import io
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
-from application_bot import utils # utils.SETTINGS and utils.QUESTIONS will be accessed here
+from application_bot import utils # The current bot's settings and questions are read through utils.current_config()
 from application_bot.utils import get_text, get_external_file_path
+from application_bot.question_sets import QuestionSet, current_question_set
 
 logger = logging.getLogger(__name__)
 
-# No longer need _font_registered global flag here
+# Process-wide caches, shared by every bot in the process (see tenants.py). TTF parsing and
+# stylesheet construction are the expensive parts of a render, so each happens once per
+# font file / style configuration instead of once per PDF.
+_registered_fonts: Dict[str, str] = {}  # absolute font path -> name registered with ReportLab
+_styles_cache: Dict[Tuple, Tuple[ParagraphStyle, ParagraphStyle, ParagraphStyle, ParagraphStyle]] = {}
+_font_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
 
 def _get_and_register_font_from_settings() -> str:
     """
@@ -25,15 +40,16 @@ def _get_and_register_font_from_settings() -> str:
     and returns the font name to be used in PDF styles.
     Falls back to "Helvetica" if custom font is not specified, not found, or fails to register.
     """
+    config = utils.current_config()
     default_font_name = "Helvetica" # ReportLab's default
 
-    if not utils.SETTINGS:
+    if not config.SETTINGS:
         logger.warning("PDF Generator: SETTINGS not loaded. Falling back to default font '%s'.", default_font_name)
         return default_font_name
 
-    pdf_cfg = utils.SETTINGS.get("PDF_SETTINGS", {})
+    pdf_cfg = config.SETTINGS.get("PDF_SETTINGS", {})
     font_name_to_register = pdf_cfg.get("font_name_registered", "CustomUnicodeFont") # The alias for reportlab
-    font_file_relative_path = utils.SETTINGS.get("FONT_FILE_PATH")
+    font_file_relative_path = config.SETTINGS.get("FONT_FILE_PATH")
 
     if not font_file_relative_path:
         logger.warning(
@@ -52,13 +68,26 @@ def _get_and_register_font_from_settings() -> str:
         )
         return default_font_name
 
+    registered_name = _registered_fonts.get(font_abs_path)
+    if registered_name is not None:
+        return registered_name
+
     try:
-        # Attempt to register the font. If it's already registered with the same name and TTFont object,
-        # reportlab usually handles this gracefully.
-        # If the font file or name changed, this will register the new one.
-        pdfmetrics.registerFont(TTFont(font_name_to_register, font_abs_path))
-        logger.info("PDF Generator: Successfully registered font '%s' from '%s'.", font_name_to_register, font_abs_path)
-        return font_name_to_register # Use the custom registered font name
+        with _font_lock:
+            registered_name = _registered_fonts.get(font_abs_path)
+            if registered_name is not None:
+                return registered_name
+            # ReportLab's font registry is global; another bot may already use this name for a different file.
+            taken_names = set(_registered_fonts.values())
+            registered_name = font_name_to_register
+            suffix = 1
+            while registered_name in taken_names:
+                suffix += 1
+                registered_name = f"{font_name_to_register}-{suffix}"
+            pdfmetrics.registerFont(TTFont(registered_name, font_abs_path))
+            _registered_fonts[font_abs_path] = registered_name
+        logger.info("PDF Generator: Successfully registered font '%s' from '%s'.", registered_name, font_abs_path)
+        return registered_name # Use the custom registered font name
     except Exception as e:
         logger.error(
             "PDF Generator: Error registering font '%s' from '%s': %s. "
@@ -68,10 +97,100 @@ def _get_and_register_font_from_settings() -> str:
         return default_font_name
 
 
+def _get_styles(font_name: str, pdf_cfg: Dict[str, Any]) -> Tuple[ParagraphStyle, ParagraphStyle, ParagraphStyle, ParagraphStyle]:
+    """(title, header, question, answer) paragraph styles, built once per font and size settings."""
+    key = (font_name, pdf_cfg.get("title_font_size", 16), pdf_cfg.get("header_font_size", 10),
+           pdf_cfg.get("question_font_size", 12), bool(pdf_cfg.get("question_bold", True)),
+           pdf_cfg.get("answer_font_size", 10))
+    styles_for_key = _styles_cache.get(key)
+    if styles_for_key is not None:
+        return styles_for_key
+
+    styles = getSampleStyleSheet()
+
+    # Use the determined (and possibly newly registered) font name
+    title_style = ParagraphStyle('PdfTitle', parent=styles['h1'], fontName=font_name,
+                                 fontSize=pdf_cfg.get("title_font_size", 16),
+                                 alignment=TA_CENTER, spaceAfter=6*mm)
+
+    header_style = ParagraphStyle('PdfHeaderInfo', parent=styles['Normal'], fontName=font_name,
+                                  fontSize=pdf_cfg.get("header_font_size", 10), spaceAfter=2*mm)
+
+    question_style = ParagraphStyle('PdfQuestion', parent=styles['Normal'], fontName=font_name,
+                                    fontSize=pdf_cfg.get("question_font_size", 12),
+                                    leading=pdf_cfg.get("question_font_size", 12) * 1.2,
+                                    fontWeight='bold' if pdf_cfg.get("question_bold", True) else 'normal',
+                                    spaceAfter=1*mm)
+
+    answer_style = ParagraphStyle('PdfAnswer', parent=styles['Normal'], fontName=font_name,
+                                  fontSize=pdf_cfg.get("answer_font_size", 10),
+                                  leading=pdf_cfg.get("answer_font_size", 10) * 1.2,
+                                  leftIndent=0,
+                                  spaceAfter=3*mm)
+
+    styles_for_key = _styles_cache[key] = (title_style, header_style, question_style, answer_style)
+    return styles_for_key
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(utils.get_setting("PDF_WORKER_THREADS", 2))
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="PdfRender")
+        return _executor
+
+
+def shutdown(wait: bool = True):
+    """Stops the render threads (running renders finish first when `wait`). The pool is recreated on next use."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def render_application_pdf(*args, **kwargs) -> Optional[str]:
+    """create_application_pdf() on the shared render pool, so rendering never blocks the event loop."""
+    # The caller's context carries its bot's configuration (utils.ConfigScope) into the worker thread.
+    call = functools.partial(contextvars.copy_context().run, create_application_pdf, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+
+def prewarm_renderer():
+    """
+    Pays the first render's one-time costs up front: TTF parsing, the paragraph
+    styles, PIL's image plugins and ReportLab's JPEG path. The PDF is rendered
+    into memory and discarded.
+    """
+    font_name = _get_and_register_font_from_settings()
+    pdf_cfg = utils.get_setting("PDF_SETTINGS", {})
+    title_style, header_style, question_style, answer_style = _get_styles(font_name, pdf_cfg)
+    PILImage.init()
+    photo = io.BytesIO()
+    PILImage.new("RGB", (8, 8), "white").save(photo, format="JPEG")
+    photo.seek(0)
+    PILImage.open(photo).load()
+    photo.seek(0)
+    doc = SimpleDocTemplate(io.BytesIO())
+    doc.build([Paragraph("Prewarm", title_style), Paragraph("Prewarm", header_style), Image(photo, width=8 * mm, height=8 * mm),
+               Paragraph("Prewarm?", question_style), Paragraph("Prewarm.", answer_style)])
+
+
+async def prewarm_renderer_async():
+    """prewarm_renderer() on the render pool, which also starts its first thread."""
+    call = functools.partial(contextvars.copy_context().run, prewarm_renderer)
+    await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+
 def create_application_pdf(user_id: int, username: Optional[str], answers: Dict[str, str],
                            photo_file_paths: List[str],
-                           user_lang: str) -> Optional[str]:
-    if not utils.SETTINGS or not utils.QUESTIONS:
+                           user_lang: str, question_set: Optional[QuestionSet] = None) -> Optional[str]:
+    """Renders the application; `question_set` is the version the applicant answered (default: current)."""
+    config = utils.current_config()
+    if question_set is None:
+        question_set = current_question_set()
+    if not config.SETTINGS or not question_set:
         logger.error("PDF Generator: Settings or Questions not loaded. Cannot generate PDF.")
         return None
 
@@ -80,17 +199,19 @@ def create_application_pdf(user_id: int, username: Optional[str], answers: Dict[
     actual_font_name_for_pdf = _get_and_register_font_from_settings()
     logger.debug("PDF Generator: Using font '%s' for PDF generation.", actual_font_name_for_pdf)
 
-    pdf_cfg = utils.SETTINGS.get("PDF_SETTINGS", {}) # Get PDF_SETTINGS again for other configs
+    pdf_cfg = config.SETTINGS.get("PDF_SETTINGS", {}) # Get PDF_SETTINGS again for other configs
 
-    app_folder_name = utils.SETTINGS.get("APPLICATION_FOLDER", "applications")
+    app_folder_name = config.SETTINGS.get("APPLICATION_FOLDER", "applications")
     app_folder_path = get_external_file_path(app_folder_name)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     pdf_filename = f"application_{user_id}_{timestamp}.pdf"
     pdf_filepath = os.path.join(app_folder_path, pdf_filename)
 
+    # Built under a temporary name and renamed when complete, so an interrupted render never leaves a partial PDF.
+    partial_filepath = pdf_filepath + ".part"
     try:
-        doc = SimpleDocTemplate(pdf_filepath,
+        doc = SimpleDocTemplate(partial_filepath,
                                 pagesize=(pdf_cfg.get("page_width_mm", 210) * mm, pdf_cfg.get("page_height_mm", 297) * mm),
                                 leftMargin=pdf_cfg.get("margin_mm", 15) * mm,
                                 rightMargin=pdf_cfg.get("margin_mm", 15) * mm,
@@ -98,27 +219,7 @@ def create_application_pdf(user_id: int, username: Optional[str], answers: Dict[
                                 bottomMargin=pdf_cfg.get("margin_mm", 15) * mm)
 
         story = []
-        styles = getSampleStyleSheet()
-
-        # Use the determined (and possibly newly registered) font name
-        title_style = ParagraphStyle('PdfTitle', parent=styles['h1'], fontName=actual_font_name_for_pdf,
-                                     fontSize=pdf_cfg.get("title_font_size", 16),
-                                     alignment=TA_CENTER, spaceAfter=6*mm)
-
-        header_style = ParagraphStyle('PdfHeaderInfo', parent=styles['Normal'], fontName=actual_font_name_for_pdf,
-                                      fontSize=pdf_cfg.get("header_font_size", 10), spaceAfter=2*mm)
-
-        question_style = ParagraphStyle('PdfQuestion', parent=styles['Normal'], fontName=actual_font_name_for_pdf,
-                                        fontSize=pdf_cfg.get("question_font_size", 12),
-                                        leading=pdf_cfg.get("question_font_size", 12) * 1.2,
-                                        fontWeight='bold' if pdf_cfg.get("question_bold", True) else 'normal',
-                                        spaceAfter=1*mm)
-
-        answer_style = ParagraphStyle('PdfAnswer', parent=styles['Normal'], fontName=actual_font_name_for_pdf,
-                                      fontSize=pdf_cfg.get("answer_font_size", 10),
-                                      leading=pdf_cfg.get("answer_font_size", 10) * 1.2,
-                                      leftIndent=0,
-                                      spaceAfter=3*mm)
+        title_style, header_style, question_style, answer_style = _get_styles(actual_font_name_for_pdf, pdf_cfg)
 
         story.append(Paragraph(get_text("pdf_header", user_lang), title_style))
         username_display = username if username else "N/A"
@@ -132,7 +233,7 @@ def create_application_pdf(user_id: int, username: Optional[str], answers: Dict[
 
         for photo_path in photo_file_paths:
             if not os.path.exists(photo_path):
-                logger.warning(f"PDF Generator: Photo file not found for PDF: {photo_path}")
+                logger.warning("PDF Generator: Photo file not found for PDF: %s", photo_path)
                 story.append(Paragraph(f"[Image not found: {os.path.basename(photo_path)}]", answer_style))
                 continue
             try:
@@ -153,14 +254,12 @@ def create_application_pdf(user_id: int, username: Optional[str], answers: Dict[
                 story.append(img)
                 story.append(Spacer(1, 3 * mm))
             except Exception as e:
-                logger.error(f"PDF Generator: Error adding image {photo_path} to PDF: {e}", exc_info=True)
+                logger.error("PDF Generator: Error adding image %s to PDF: %s", photo_path, e, exc_info=True)
                 story.append(Paragraph(f"[Error loading image: {os.path.basename(photo_path)}]", answer_style))
 
         story.append(Spacer(1, 5 * mm))
 
-        for q_data in utils.QUESTIONS:
-            q_id = q_data["id"]
-            q_text_from_json = q_data["text"]
+        for q_id, q_text_from_json in zip(question_set.ids, question_set.texts_for(user_lang)):
             answer_text = answers.get(q_id, get_text("not_answered_placeholder", user_lang, default="[No Answer Given]"))
 
             story.append(Paragraph(q_text_from_json, question_style))
@@ -168,14 +267,15 @@ def create_application_pdf(user_id: int, username: Optional[str], answers: Dict[
             story.append(Spacer(1, 2*mm))
 
         doc.build(story)
-        logger.info(f"PDF Generator: PDF generated successfully: {pdf_filepath}")
+        os.replace(partial_filepath, pdf_filepath)
+        logger.info("PDF Generator: PDF generated successfully: %s", pdf_filepath)
         return pdf_filepath
 
     except Exception as e:
-        logger.error(f"PDF Generator: Failed to generate PDF for user {user_id}: {e}", exc_info=True)
-        if os.path.exists(pdf_filepath):
+        logger.error("PDF Generator: Failed to generate PDF for user %s: %s", user_id, e, exc_info=True)
+        if os.path.exists(partial_filepath):
             try:
-                os.remove(pdf_filepath)
+                os.remove(partial_filepath)
             except OSError:
-                logger.warning(f"PDF Generator: Could not remove partially created PDF: {pdf_filepath}")
+                logger.warning("PDF Generator: Could not remove partially created PDF: %s", partial_filepath)
         return None
\ No newline at end of file
@@ -0,0 +1,157 @@
+# application_bot/polling.py
+"""
+getUpdates configuration and startup catch-up.
+
+polling_kwargs() derives `allowed_updates` from the handlers actually registered
+on the Application (so Telegram never sends update types nobody handles) and
+takes the long-poll timeout from POLLING_TIMEOUT_SECONDS.
+
+catch_up() runs once before polling starts. It drains the backlog that piled up
+while the bot was down in pages of POLLING_BATCH_LIMIT with no long-poll wait,
+confirms it, and queues it for processing after two clean-ups:
+  * repeated commands from one user collapse to the newest one (five /apply
+    sent during an outage start one application, not five);
+  * with CATCH_UP_DROP_STALE, messages older than CONVERSATION_TIMEOUT_SECONDS
+    are dropped, since their conversation would have timed out anyway.
+Polling then starts from the first unconfirmed update as usual.
+"""
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import (Application, BaseHandler, CallbackQueryHandler, CommandHandler, ConversationHandler,
+                          MessageHandler, TypeHandler)
+
+from application_bot import utils
+from application_bot.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CATCH_UP_UPDATES_TOTAL = REGISTRY.counter("appbot_catch_up_updates_total",
+                                          "Backlog updates handled by the startup catch-up, by outcome.", ["outcome"])
+
+# Update types each handler class can receive. MessageHandler/CommandHandler would also accept edited
+# messages, but an edit is not a new answer, so the bot does not subscribe to them.
+HANDLER_UPDATE_TYPES = {
+    CommandHandler: (Update.MESSAGE,),
+    MessageHandler: (Update.MESSAGE,),
+    CallbackQueryHandler: (Update.CALLBACK_QUERY,),
+}
+
+
+def _handler_update_types(handler: BaseHandler) -> Optional[Set[str]]:
+    """Update types `handler` needs; None when it cannot be narrowed down."""
+    if isinstance(handler, ConversationHandler):
+        types: Set[str] = set()
+        nested = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            nested.extend(state_handlers)
+        for nested_handler in nested:
+            nested_types = _handler_update_types(nested_handler)
+            if nested_types is None:
+                return None
+            types |= nested_types
+        return types
+    if isinstance(handler, TypeHandler) and handler.type is Update:
+        return set()  # Sees whatever the other handlers subscribe to (recorder, inbound filter)
+    for handler_class, update_types in HANDLER_UPDATE_TYPES.items():
+        if isinstance(handler, handler_class):
+            return set(update_types)
+    return None
+
+
+def allowed_updates(application: Application) -> List[str]:
+    types: Set[str] = set()
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler_types = _handler_update_types(handler)
+            if handler_types is None:
+                logger.warning("Polling: Cannot tell which updates %s needs; subscribing to all update types.",
+                               type(handler).__name__)
+                return list(Update.ALL_TYPES)
+            types |= handler_types
+    return sorted(types)
+
+
+def polling_kwargs(application: Application) -> Dict[str, Any]:
+    """Keyword arguments for Updater.start_polling()."""
+    return {
+        "timeout": int(utils.get_setting("POLLING_TIMEOUT_SECONDS", 30)),
+        "allowed_updates": allowed_updates(application),
+    }
+
+
+def _command_key(update: Update) -> Optional[Tuple[int, str]]:
+    message = update.message
+    if message is None or update.effective_user is None or not message.text or not message.text.startswith("/"):
+        return None
+    command = message.text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+    return update.effective_user.id, command
+
+
+def collapse_backlog(updates: Iterable[Update], stale_before: Optional[float] = None) -> Tuple[List[Update], int, int]:
+    """
+    (updates to process, collapsed, stale). Of repeated commands from one user only the
+    newest is kept; with `stale_before` (a Unix time), older messages are dropped.
+    """
+    kept: List[Update] = []
+    seen_commands: Set[Tuple[int, str]] = set()
+    collapsed = stale = 0
+    for update in reversed(list(updates)):
+        message = update.effective_message
+        if stale_before is not None and message is not None and message.date.timestamp() < stale_before:
+            stale += 1
+            continue
+        command_key = _command_key(update)
+        if command_key is not None:
+            if command_key in seen_commands:
+                collapsed += 1
+                continue
+            seen_commands.add(command_key)
+        kept.append(update)
+    kept.reverse()
+    return kept, collapsed, stale
+
+
+async def catch_up(application: Application, allowed: Optional[List[str]] = None):
+    """Drains, confirms and queues the pending backlog. Errors are logged; polling then fetches what is left."""
+    limit = max(1, min(100, int(utils.get_setting("POLLING_BATCH_LIMIT", 100))))
+    max_updates = int(utils.get_setting("CATCH_UP_MAX_UPDATES", 10000))
+    started = time.perf_counter()
+    backlog: List[Update] = []
+    offset = 0
+    confirmed_below = 0  # A successful getUpdates with offset N confirms every update below N
+    pages = 0
+    try:
+        while len(backlog) < max_updates:
+            page = await application.bot.get_updates(offset=offset, limit=limit, timeout=0, allowed_updates=allowed)
+            confirmed_below = offset
+            if not page:
+                break
+            pages += 1
+            backlog.extend(page)
+            offset = page[-1].update_id + 1
+        if offset > confirmed_below:
+            # Anything this returns stays unconfirmed and is fetched again by polling.
+            await application.bot.get_updates(offset=offset, limit=1, timeout=0, allowed_updates=allowed)
+            confirmed_below = offset
+    except TelegramError as e:
+        # Only confirmed updates are queued; polling fetches the rest again, so nothing is lost or doubled.
+        logger.warning("Polling: Catch-up stopped after %d updates; polling takes over the rest: %s", len(backlog), e)
+        backlog = [update for update in backlog if update.update_id < confirmed_below]
+    if not backlog:
+        return
+
+    stale_before = None
+    if utils.get_setting("CATCH_UP_DROP_STALE", False):
+        stale_before = time.time() - float(utils.get_setting("CONVERSATION_TIMEOUT_SECONDS", 1200))
+    updates, collapsed, stale = collapse_backlog(backlog, stale_before)
+    for update in updates:
+        await application.update_queue.put(update)
+    CATCH_UP_UPDATES_TOTAL.inc("queued", amount=len(updates))
+    CATCH_UP_UPDATES_TOTAL.inc("collapsed", amount=collapsed)
+    CATCH_UP_UPDATES_TOTAL.inc("stale", amount=stale)
+    logger.info("Polling: Caught up on %d backlog updates in %d pages (%.2fs): %d queued, %d duplicate commands collapsed, %d stale dropped.",
+                len(backlog), pages, time.perf_counter() - started, len(updates), collapsed, stale)
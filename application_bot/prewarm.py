@@ -0,0 +1,93 @@
+# application_bot/prewarm.py
+"""
+Startup prewarm: pays the one-time costs of the first application before
+polling starts, instead of on the first user's /apply.
+
+The steps run concurrently, each on the pool it would use later:
+  * questions: builds the current QuestionSet (validation and version hash);
+  * i18n: builds the yes/no keyboards and their reverse maps for every language;
+  * pdf: parses the TTF font, builds the paragraph styles and renders a
+    throwaway PDF with a photo into memory, on the PDF render pool;
+  * folders: creates the temp photo and application folders;
+  * http: opens the Bot API connections of the request pool.
+A failing step is logged and skipped; prewarm never keeps the bot from
+starting. The timings are logged, exported as appbot_prewarm_seconds{step} and
+kept in bot_data["prewarm_timings"].
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+from telegram.ext import Application
+
+from application_bot import async_fs, keyboards, pdf_generator, utils
+from application_bot.metrics import REGISTRY
+from application_bot.question_sets import current_question_set
+from application_bot.utils import get_external_file_path
+
+logger = logging.getLogger(__name__)
+
+PREWARM_SECONDS = REGISTRY.gauge("appbot_prewarm_seconds", "Duration of each startup prewarm step.", ["step"])
+
+TIMINGS_KEY = "prewarm_timings"
+
+
+async def _questions(application: Application):
+    if utils.current_config().QUESTIONS is None:
+        await async_fs.run(utils.load_questions)
+    current_question_set()
+
+
+async def _i18n(application: Application):
+    for lang in list(utils.current_config().LANGUAGES_CACHE or {}):
+        for kind in (keyboards.CONFIRM_CANCEL, keyboards.CONFIRM_ACTION):
+            keyboards.yes_no_keyboard(kind, lang)
+
+
+async def _pdf(application: Application):
+    await pdf_generator.prewarm_renderer_async()
+
+
+async def _folders(application: Application):
+    for folder_key, default in (("TEMP_PHOTO_FOLDER", "temp_photos"), ("APPLICATION_FOLDER", "applications")):
+        await async_fs.makedirs(get_external_file_path(utils.get_setting(folder_key, default)))
+
+
+async def _http(application: Application):
+    # Concurrent calls make the pool open one connection each (TLS handshake included).
+    connections = getattr(application.bot.request, "connection_pool_size", 1)
+    await asyncio.gather(*(application.bot.get_me() for _ in range(max(1, connections))))
+
+
+STEPS: Dict[str, Callable[[Application], Awaitable[None]]] = {
+    "questions": _questions,
+    "i18n": _i18n,
+    "pdf": _pdf,
+    "folders": _folders,
+    "http": _http,
+}
+
+
+async def _timed(name: str, step: Callable[[Application], Awaitable[None]], application: Application) -> float:
+    started = time.perf_counter()
+    try:
+        await step(application)
+    except Exception as e:
+        logger.warning("Prewarm: Step '%s' failed; its cost moves to the first request: %s", name, e)
+    elapsed = time.perf_counter() - started
+    PREWARM_SECONDS.set(elapsed, name)
+    return elapsed
+
+
+async def prewarm(application: Application) -> Dict[str, float]:
+    """Runs every prewarm step concurrently and returns their durations in seconds."""
+    started = time.perf_counter()
+    durations = await asyncio.gather(*(_timed(name, step, application) for name, step in STEPS.items()))
+    timings = dict(zip(STEPS, durations))
+    total = time.perf_counter() - started
+    PREWARM_SECONDS.set(total, "total")
+    application.bot_data[TIMINGS_KEY] = timings
+    logger.info("Prewarm: Done in %.0f ms (%s).", total * 1000,
+                ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()))
+    return timings
@@ -0,0 +1,194 @@
+# application_bot/question_engine.py
+"""
+Compiles question definitions from questions.json into lookup tables.
+
+Beyond `id` and `text`, a question may declare:
+
+    "type":        "text" (default) | "phone" | "email" | "number" | "choice"
+    "min_length", "max_length"        answer length limits (characters)
+    "pattern":     regular expression the whole answer must match
+    "min", "max":  bounds for "number" answers
+    "choices":     list of options for "choice" (shown as a reply keyboard)
+    "next":        {"<answer>": "<question id>" | "end", "*": ...}  where to go after
+                   this answer ("*" matches any other answer; default: the next question)
+    "error_text" / "error_texts": {"<lang>": ...}   message shown when validation fails
+
+Everything is compiled once per question set version (see question_sets.py):
+regexes are precompiled, choices and branch targets become dicts keyed by the
+case-folded answer, and jump targets become positions, so checking an answer and
+picking the next question are constant-time. Branches may only jump forward,
+which rules out loops.
+"""
+import re
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+
+ANSWER_TYPES = ("text", "phone", "email", "number", "choice")
+END_TARGET = "end"
+DEFAULT_BRANCH = "*"
+
+_PHONE_RE = re.compile(r"\+?[\d\s\-().]{7,25}")
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+class CompiledQuestion:
+    __slots__ = ("id", "answer_type", "min_length", "max_length", "pattern", "minimum", "maximum",
+                 "choices", "choice_lookup", "keyboard", "branches", "default_next", "error_texts")
+
+    def __init__(self, question_id: str, answer_type: str):
+        self.id = question_id
+        self.answer_type = answer_type
+        self.min_length: Optional[int] = None
+        self.max_length: Optional[int] = None
+        self.pattern: Optional[re.Pattern] = None
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.choices: Tuple[str, ...] = ()
+        self.choice_lookup: Dict[str, str] = {}  # case-folded answer -> canonical choice
+        self.keyboard: Optional[ReplyKeyboardMarkup] = None
+        self.branches: Dict[str, int] = {}  # case-folded answer -> position of the next question
+        self.default_next = 0  # Position after this question when no branch matches
+        self.error_texts: Mapping[Optional[str], str] = {}  # lang (None = default) -> custom error text
+
+    def validate(self, answer: str) -> Tuple[bool, Any]:
+        """(True, normalized answer) or (False, (language key, format kwargs)) for the error message."""
+        answer = answer.strip()
+        if not answer:
+            return False, ("invalid_answer_empty", {})
+        if self.min_length is not None and len(answer) < self.min_length:
+            return False, ("invalid_answer_too_short", {"min_length": self.min_length})
+        if self.max_length is not None and len(answer) > self.max_length:
+            return False, ("invalid_answer_too_long", {"max_length": self.max_length})
+
+        answer_type = self.answer_type
+        if answer_type == "choice":
+            choice = self.choice_lookup.get(answer.casefold())
+            if choice is None:
+                return False, ("invalid_answer_choice", {})
+            answer = choice
+        elif answer_type == "phone":
+            if not _PHONE_RE.fullmatch(answer) or sum(ch.isdigit() for ch in answer) < 7:
+                return False, ("invalid_answer_phone", {})
+        elif answer_type == "email":
+            if not _EMAIL_RE.fullmatch(answer):
+                return False, ("invalid_answer_email", {})
+        elif answer_type == "number":
+            try:
+                number = float(answer.replace(",", ".").replace(" ", ""))
+            except ValueError:
+                return False, ("invalid_answer_number", {})
+            if self.minimum is not None and number < self.minimum:
+                return False, ("invalid_answer_number_too_small", {"minimum": _format_number(self.minimum)})
+            if self.maximum is not None and number > self.maximum:
+                return False, ("invalid_answer_number_too_large", {"maximum": _format_number(self.maximum)})
+
+        if self.pattern is not None and not self.pattern.fullmatch(answer):
+            return False, ("invalid_answer_format", {})
+        return True, answer
+
+    def next_position(self, answer: str) -> int:
+        if not self.branches:
+            return self.default_next
+        return self.branches.get(answer.casefold(), self.default_next)
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _optional_int(question: Dict[str, Any], key: str, errors: List[str], label: str) -> Optional[int]:
+    value = question.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        errors.append(f"{label}: '{key}' must be a non-negative integer.")
+        return None
+    return value
+
+
+def _optional_number(question: Dict[str, Any], key: str, errors: List[str], label: str) -> Optional[float]:
+    value = question.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        errors.append(f"{label}: '{key}' must be a number.")
+        return None
+    return float(value)
+
+
+def localized(question: Dict[str, Any], key: str, lang_key: str) -> Dict[Optional[str], str]:
+    """{None: question[key], lang: question[lang_key][lang], ...} without empty entries."""
+    texts = {None: str(question[key])} if question.get(key) else {}
+    per_lang = question.get(lang_key)
+    if isinstance(per_lang, dict):
+        texts.update({str(lang): str(text) for lang, text in per_lang.items() if text})
+    return texts
+
+
+def compile_questions(questions: Sequence[Dict[str, Any]], errors: Optional[List[str]] = None) -> Tuple[CompiledQuestion, ...]:
+    """
+    Compiles a question list. Problems are appended to `errors` (if given) and the
+    offending rule is dropped, so a bad file degrades to simpler questions instead
+    of breaking /apply.
+    """
+    errors = errors if errors is not None else []
+    positions = {str(q.get("id")): i for i, q in enumerate(questions)}
+    if len(positions) != len(questions):
+        errors.append("Question ids must be unique.")
+    compiled = []
+    for index, question in enumerate(questions):
+        question_id = str(question.get("id"))
+        label = f"Question '{question_id}'"
+        answer_type = question.get("type") or "text"
+        if answer_type not in ANSWER_TYPES:
+            errors.append(f"{label}: unknown type '{answer_type}' (expected one of {', '.join(ANSWER_TYPES)}).")
+            answer_type = "text"
+        cq = CompiledQuestion(question_id, answer_type)
+        cq.default_next = index + 1
+        cq.min_length = _optional_int(question, "min_length", errors, label)
+        cq.max_length = _optional_int(question, "max_length", errors, label)
+        cq.minimum = _optional_number(question, "min", errors, label)
+        cq.maximum = _optional_number(question, "max", errors, label)
+
+        pattern = question.get("pattern")
+        if pattern:
+            try:
+                cq.pattern = re.compile(str(pattern))
+            except re.error as e:
+                errors.append(f"{label}: invalid pattern: {e}")
+
+        if answer_type == "choice":
+            choices = question.get("choices")
+            if not isinstance(choices, list) or not choices:
+                errors.append(f"{label}: a 'choice' question needs a non-empty 'choices' list.")
+                cq.answer_type = "text"
+            else:
+                cq.choices = tuple(str(choice) for choice in choices)
+                cq.choice_lookup = {choice.casefold(): choice for choice in cq.choices}
+                cq.keyboard = ReplyKeyboardMarkup([[KeyboardButton(choice)] for choice in cq.choices],
+                                                  one_time_keyboard=True, resize_keyboard=True)
+
+        branches = question.get("next")
+        if branches is not None and not isinstance(branches, dict):
+            errors.append(f"{label}: 'next' must be an object mapping answers to question ids.")
+        elif branches:
+            for answer, target in branches.items():
+                if target == END_TARGET:
+                    position = len(questions)
+                elif target in positions:
+                    position = positions[target]
+                else:
+                    errors.append(f"{label}: 'next' refers to unknown question '{target}'.")
+                    continue
+                if position <= index:
+                    errors.append(f"{label}: 'next' may only jump forward (to '{target}').")
+                    continue
+                if answer == DEFAULT_BRANCH:
+                    cq.default_next = position
+                else:
+                    cq.branches[str(answer).casefold()] = position
+
+        cq.error_texts = localized(question, "error_text", "error_texts")
+        compiled.append(cq)
+    return tuple(compiled)
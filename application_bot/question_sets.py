@@ -0,0 +1,223 @@
+# application_bot/question_sets.py
+"""
+Immutable, content-hashed versions of the question list.
+
+A conversation pins the QuestionSet that was current when the user ran /apply
+and stores only its version id and an index (see session.py), so saving new
+questions from the GUI or the control API mid-conversation never makes a running
+applicant skip or repeat a question, and the PDF lists exactly the questions
+they were asked.
+
+current_question_set() notices a new QUESTIONS list by identity (load and
+save always assign a new list), builds its QuestionSet once and keeps the last
+QUESTION_SET_CACHE_SIZE versions in an LRU. Several bots in one process (see
+tenants.py) each have their own QUESTIONS; the registry remembers the set
+for each of those lists, so switching between them never rebuilds anything.
+Every version is also archived on disk as its canonical question JSON, keyed
+by the version hash (QUESTION_SET_ARCHIVE_FOLDER). Sessions are persisted and
+resumed after restarts and shard moves (shared_state.py), so a version missing
+from the LRU is loaded back from there; a conversation whose version can't be
+found at all ends instead of carrying on with another list.
+
+Each version precomputes its ids, an id -> position map and the question texts
+per language (a question may carry `"texts": {"en": "...", "ru": "..."}` next
+to its default `"text"`), so lookups on the hot path are plain tuple/dict
+indexing. Answer validation and branching
+are compiled per version as well (question_engine.py).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from application_bot import async_fs, utils
+from application_bot.question_engine import CompiledQuestion, compile_questions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 8
+MAX_TRACKED_SOURCES = 64  # Question lists (one per bot in the process) whose current set is remembered
+
+
+def _canonical_json(questions: Sequence[Dict[str, Any]]) -> str:
+    return json.dumps(list(questions), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def _archive_path(version: str) -> str:
+    folder = utils.get_external_file_path(utils.get_setting("QUESTION_SET_ARCHIVE_FOLDER", "question_sets"))
+    return os.path.join(folder, f"{version}.json")
+
+
+def _write_archive(path: str, canonical: str):
+    if os.path.exists(path):
+        return  # Content-addressed: an existing file already holds this version
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(canonical)
+    os.replace(temp_path, path)
+
+
+class QuestionSet:
+    __slots__ = ("version", "ids", "texts", "positions", "questions", "errors", "_texts_by_lang")
+
+    def __init__(self, version: str, ids: Tuple[str, ...], texts: Tuple[str, ...],
+                 texts_by_lang: Mapping[str, Tuple[str, ...]], questions: Tuple[CompiledQuestion, ...] = (),
+                 errors: Tuple[str, ...] = ()):
+        self.version = version
+        self.ids = ids
+        self.questions = questions  # Validators and branch tables, same order as ids
+        self.errors = errors  # Compile problems; the offending rules were dropped
+        self.texts = texts  # Default ("text") wording, used for languages without their own texts
+        self.positions: Mapping[str, int] = MappingProxyType({question_id: i for i, question_id in enumerate(ids)})
+        self._texts_by_lang = MappingProxyType(dict(texts_by_lang))
+
+    @classmethod
+    def from_list(cls, questions: Sequence[Dict[str, Any]]) -> "QuestionSet":
+        canonical = _canonical_json(questions)
+        version = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+        ids = tuple(str(q["id"]) for q in questions)
+        texts = tuple(str(q.get("text", "")) for q in questions)
+        languages = {lang for q in questions for lang in (q.get("texts") or {})}
+        texts_by_lang = {
+            lang: tuple(str((q.get("texts") or {}).get(lang) or q.get("text", "")) for q in questions)
+            for lang in languages
+        }
+        errors: List[str] = []
+        questions_compiled = compile_questions(questions, errors)
+        return cls(version, ids, texts, texts_by_lang, questions_compiled, tuple(errors))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    def texts_for(self, lang: Optional[str]) -> Tuple[str, ...]:
+        return self._texts_by_lang.get(lang, self.texts)
+
+    def text(self, index: int, lang: Optional[str] = None) -> str:
+        return self.texts_for(lang)[index]
+
+    def error_text(self, index: int, lang: Optional[str] = None) -> Optional[str]:
+        """The question's own validation message, if it defines one."""
+        error_texts = self.questions[index].error_texts
+        return error_texts.get(lang) or error_texts.get(None)
+
+    def __repr__(self) -> str:
+        return f"QuestionSet(version={self.version!r}, questions={len(self.ids)})"
+
+
+class QuestionSetRegistry:
+    def __init__(self, capacity: int = DEFAULT_CACHE_SIZE):
+        self.capacity = capacity
+        self._versions: "OrderedDict[str, QuestionSet]" = OrderedDict()
+        # id(question list) -> (that list, its QuestionSet); the list is kept so its id can't be reused.
+        self._current_by_source: "OrderedDict[int, Tuple[List[Dict[str, Any]], QuestionSet]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[QuestionSet]:
+        """The QuestionSet for the current bot's QUESTIONS (None if questions were never loaded)."""
+        source = utils.current_config().QUESTIONS
+        if source is None:
+            return None
+        entry = self._current_by_source.get(id(source))
+        if entry is not None and entry[0] is source:
+            return entry[1]
+        with self._lock:
+            entry = self._current_by_source.get(id(source))
+            if entry is None or entry[0] is not source:
+                entry = self._current_by_source[id(source)] = (source, self._register(source))
+                while len(self._current_by_source) > MAX_TRACKED_SOURCES:
+                    self._current_by_source.popitem(last=False)
+            return entry[1]
+
+    def _register(self, questions: Sequence[Dict[str, Any]]) -> QuestionSet:
+        question_set = QuestionSet.from_list(questions)
+        existing = self._versions.get(question_set.version)
+        if existing is not None:
+            self._versions.move_to_end(question_set.version)
+            return existing
+        self._insert(question_set)
+        self._archive(question_set.version, questions)
+        for error in question_set.errors:
+            logger.error("Question sets: Version %s: %s", question_set.version, error)
+        logger.info("Question sets: Version %s is now current (%d questions).", question_set.version, len(question_set))
+        return question_set
+
+    def _insert(self, question_set: QuestionSet):
+        self._versions[question_set.version] = question_set
+        capacity = int(utils.get_setting("QUESTION_SET_CACHE_SIZE", self.capacity))
+        while len(self._versions) > max(1, capacity):
+            evicted, _ = self._versions.popitem(last=False)
+            logger.info("Question sets: Evicted version %s from the cache.", evicted)
+
+    @staticmethod
+    def _archive(version: str, questions: Sequence[Dict[str, Any]]):
+        path, canonical = _archive_path(version), _canonical_json(questions)
+        try:
+            async_fs.submit(_write_archive, path, canonical)
+        except RuntimeError:  # Interpreter shutting down; write inline
+            _write_archive(path, canonical)
+
+    def load(self, version: str) -> Optional[QuestionSet]:
+        """Builds `version` from its archived JSON (blocking; run it on the filesystem pool). None if unavailable."""
+        try:
+            with open(_archive_path(version), encoding="utf-8") as f:
+                questions = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error("Question sets: Could not read archived version %s: %s", version, e)
+            return None
+        question_set = QuestionSet.from_list(questions)
+        if question_set.version != version:
+            logger.error("Question sets: Archived version %s hashes to %s; ignoring it.", version, question_set.version)
+            return None
+        with self._lock:
+            existing = self._versions.get(version)
+            if existing is not None:
+                return existing
+            self._insert(question_set)
+        logger.info("Question sets: Loaded version %s from the archive.", version)
+        return question_set
+
+    def get(self, version: Optional[str]) -> Optional[QuestionSet]:
+        if version is None:
+            return None
+        with self._lock:
+            question_set = self._versions.get(version)
+            if question_set is not None:
+                self._versions.move_to_end(version)
+            return question_set
+
+
+REGISTRY = QuestionSetRegistry()
+
+
+def current_question_set() -> Optional[QuestionSet]:
+    return REGISTRY.current()
+
+
+async def pinned_question_set(version: Optional[str]) -> Optional[QuestionSet]:
+    """
+    The version a conversation pinned (the current set if none was pinned).
+    Evicted versions are loaded from the archive; None if the version is gone.
+    """
+    if version is None:
+        return REGISTRY.current()
+    question_set = REGISTRY.get(version)
+    if question_set is not None:
+        return question_set
+    # A process that restored the session from persistence may simply not have built the current set yet.
+    question_set = REGISTRY.current()
+    if question_set is not None and question_set.version == version:
+        return question_set
+    question_set = await async_fs.run(REGISTRY.load, version)
+    if question_set is None:
+        logger.warning("Question sets: Version %s is neither cached nor archived.", version)
+    return question_set
@@ -0,0 +1,122 @@
+# application_bot/session.py
+"""
+Per-user conversation state.
+
+Everything the handlers need about a user's application lives in one slotted
+ApplicationSession stored under a single `context.user_data` key, instead of
+loose string keys: attribute access is a fixed-offset slot lookup, an instance
+has no per-object dict, and starting or ending an application is one method call.
+
+to_state()/from_state() give a compact, versioned tuple form for persistence;
+pickling goes through it too, so stored sessions survive field changes as long
+as from_state() knows the old version.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+SESSION_KEY = "session"
+SESSION_FORMAT_VERSION = 2
+
+_in_flight_lock = threading.Lock()
+_in_flight = 0  # Live sessions in this process with an application in progress (appbot_conversations_in_flight)
+
+
+def _count_in_flight(delta: int):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += delta
+
+
+def applications_in_flight() -> int:
+    return _in_flight
+
+
+class ApplicationSession:
+    __slots__ = ("lang", "question_set_version", "question_index", "answers", "awaiting_photo",
+                 "state", "cancel_return_state", "photo_paths", "_counted")
+
+    def __init__(self):
+        self.lang: Optional[str] = None  # Cached effective language; kept across applications
+        self.question_set_version: Optional[str] = None  # QuestionSet pinned when the application began
+        self.question_index: Optional[int] = None  # None while no application is in progress
+        self.answers: Dict[str, str] = {}
+        self.awaiting_photo = False
+        self.state: Optional[int] = None  # Conversation state the user is in (constants.STATE_*)
+        self.cancel_return_state: Optional[int] = None  # State to go back to if a cancel prompt is declined
+        self.photo_paths: List[str] = []
+        # Whether this object is in the in-flight count. Copies made by from_state() (persistence writes
+        # deep-copy user_data) are not; sessions restored at startup are added by track_restored_sessions().
+        self._counted = False
+
+    @property
+    def in_application(self) -> bool:
+        return self.question_index is not None or self.awaiting_photo
+
+    def begin(self, question_set_version: Optional[str]):
+        if not self._counted:
+            self._counted = True
+            _count_in_flight(1)
+        self.question_set_version = question_set_version
+        self.question_index = 0
+        self.answers = {}
+        self.awaiting_photo = False
+        self.photo_paths = []
+
+    def reset(self) -> List[str]:
+        """Ends the application (the language stays cached) and returns its temp photo paths."""
+        if self._counted:
+            self._counted = False
+            _count_in_flight(-1)
+        photo_paths = self.photo_paths
+        self.question_set_version = None
+        self.question_index = None
+        self.answers = {}
+        self.awaiting_photo = False
+        self.state = None
+        self.cancel_return_state = None
+        self.photo_paths = []
+        return photo_paths
+
+    def to_state(self) -> tuple:
+        return (SESSION_FORMAT_VERSION, self.lang, self.question_set_version, self.question_index, self.answers,
+                self.awaiting_photo, self.state, self.cancel_return_state, self.photo_paths)
+
+    @classmethod
+    def from_state(cls, state: Sequence[Any]) -> "ApplicationSession":
+        format_version = state[0] if state else None
+        if format_version != SESSION_FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format: {format_version!r}")
+        session = cls()
+        (_, session.lang, session.question_set_version, session.question_index, answers,
+         session.awaiting_photo, session.state, session.cancel_return_state, photo_paths) = state
+        session.answers = dict(answers)
+        session.photo_paths = list(photo_paths)
+        return session
+
+    def __reduce__(self):
+        return ApplicationSession.from_state, (self.to_state(),)
+
+    def __repr__(self) -> str:
+        return (f"ApplicationSession(lang={self.lang!r}, state={self.state!r}, question_index={self.question_index!r}, "
+                f"awaiting_photo={self.awaiting_photo!r}, answers={len(self.answers)}, photos={len(self.photo_paths)})")
+
+
+def get_session(user_data: Dict[Any, Any]) -> ApplicationSession:
+    """The user's session, created on first use."""
+    session = user_data.get(SESSION_KEY)
+    if session is None:
+        session = user_data[SESSION_KEY] = ApplicationSession()
+    return session
+
+
+
+def track_restored_sessions(all_user_data: Iterable[Mapping[Any, Any]]) -> int:
+    """Adds sessions restored from persistence with an application in progress to the in-flight count."""
+    restored = 0
+    for user_data in all_user_data:
+        session = user_data.get(SESSION_KEY)
+        if session is not None and session.in_application and not session._counted:
+            session._counted = True
+            restored += 1
+    _count_in_flight(restored)
+    return restored
@@ -0,0 +1,275 @@
+# application_bot/sharding.py
+"""
+Scale-out mode: one ingress process polls Telegram and hands every update to
+one of N worker processes, chosen by the sender's user id.
+
+    python -m application_bot.sharding --workers 4
+
+Each worker is a separate Python process (own GIL, own PDF render pool) running
+the normal Application from create_bot_application(), fed through a queue
+instead of polling, and sending its replies to Telegram directly. Users are
+assigned with rendezvous hashing on a stable hash, so a user always lands on
+the same worker and every update of one conversation is handled in order by
+one process. Changing the worker count moves only about 1/N of the users.
+
+The workers share SHARED_STATE_FILE (shared_state.py): sessions and
+conversation states are persisted there every PERSISTENCE_FLUSH_SECONDS and on
+shutdown, so a restarted or reassigned worker continues a user's application,
+and the submission index behind the /apply rate limit is written through, so
+the limit holds across workers. A worker that dies is restarted; updates still
+queued for it are kept.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import signal
+import sys
+from typing import Any, Dict, List, Optional
+
+from telegram import Update
+from telegram.error import TelegramError
+
+from application_bot import utils
+from application_bot.drain import drain_finalizations
+from application_bot.handlers.conversation_logic import resume_checkpointed_finalizations
+from application_bot.log_pipeline import install_queue_logging
+from application_bot.loop_watchdog import LoopWatchdog
+from application_bot.main import bot_api_endpoint, create_bot_application, shutdown_pools
+from application_bot.metrics import REGISTRY, start_metrics_server
+from application_bot.polling import polling_kwargs
+from application_bot.prewarm import prewarm
+from application_bot.session import track_restored_sessions
+from application_bot.shared_state import SharedStateStore, SqlitePersistence
+
+logger = logging.getLogger(__name__)
+
+SHARD_UPDATES_TOTAL = REGISTRY.counter("appbot_shard_updates_total", "Updates routed to each worker by the ingress.",
+                                       ["shard"])
+WORKER_RESTARTS_TOTAL = REGISTRY.counter("appbot_shard_worker_restarts_total", "Worker processes restarted after exiting.")
+
+WORKER_STOP_GRACE_SECONDS = 30.0  # On top of DRAIN_TIMEOUT_SECONDS
+POLL_RETRY_SECONDS = 5.0
+
+
+def shard_for(user_id: int, shards: int) -> int:
+    """Worker index for `user_id`; the same in every process and across restarts (unlike hash())."""
+    best_shard, best_weight = 0, b""
+    for shard in range(shards):
+        weight = hashlib.blake2b(f"{user_id}:{shard}".encode(), digest_size=8).digest()
+        if weight > best_weight:
+            best_shard, best_weight = shard, weight
+    return best_shard
+
+
+class _ShardOwnership:
+    """Picklable `owns_user` filter for SqlitePersistence."""
+
+    def __init__(self, index: int, shards: int):
+        self.index = index
+        self.shards = shards
+
+    def __call__(self, user_id: int) -> bool:
+        return shard_for(user_id, self.shards) == self.index
+
+
+def _worker_main(index: int, shards: int, inbox, settings: Dict[str, Any], questions: Optional[List[Dict[str, Any]]],
+                 state_file: str, endpoint: tuple, log_level: int):
+    # The ingress owns shutdown; Ctrl+C reaches the whole process group, so workers wait for its stop message.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(format=f"%(asctime)s - worker {index} - %(name)s - %(levelname)s - %(message)s",
+                        level=log_level)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Settings come from the ingress, so in-memory overrides (devtools, the GUI) reach every worker.
+    utils.current_config().SETTINGS = settings
+    utils.current_config().QUESTIONS = questions
+    if not utils.load_languages():
+        logger.warning("Sharding: Worker %d: Languages not loaded. Bot text might be affected.", index)
+    if utils.current_config().QUESTIONS is None and not utils.load_questions():
+        logger.warning("Sharding: Worker %d: Questions not loaded. /apply may be affected.", index)
+    install_queue_logging()
+    asyncio.run(_run_worker(index, shards, inbox, state_file, endpoint))
+
+
+async def _run_worker(index: int, shards: int, inbox, state_file: str, endpoint: tuple):
+    store = SharedStateStore(state_file)
+    persistence = SqlitePersistence(store, owns_user=_ShardOwnership(index, shards),
+                                    update_interval=float(utils.get_setting("PERSISTENCE_FLUSH_SECONDS", 5.0)))
+    base_url, base_file_url, local_mode = endpoint
+    application = create_bot_application(base_url, base_file_url, local_mode, persistence=persistence)
+    if application is None:
+        logger.error("Sharding: Worker %d could not create the bot.", index)
+        return
+    application.bot_data["shared_state"] = store
+    metrics_port = utils.get_setting("METRICS_PORT", 0)
+    if metrics_port:
+        start_metrics_server(utils.get_setting("METRICS_HOST", "127.0.0.1"), int(metrics_port) + 1 + index)
+    watchdog = LoopWatchdog() if utils.get_setting("LOOP_WATCHDOG_ENABLED", True) else None
+    if watchdog:
+        watchdog.start()
+
+    loop = asyncio.get_running_loop()
+    await application.initialize()  # Loads this shard's users and conversations from the shared state
+    track_restored_sessions(application.user_data.values())
+    if utils.get_setting("PREWARM_ENABLED", True):
+        await prewarm(application)
+    await application.start()
+    await resume_checkpointed_finalizations(application, owns_user=_ShardOwnership(index, shards))
+    logger.info("Sharding: Worker %d of %d is ready.", index, shards)
+    try:
+        while True:
+            data = await loop.run_in_executor(None, inbox.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        logger.info("Sharding: Worker %d is stopping...", index)
+        if watchdog:
+            await watchdog.aclose()
+        await drain_finalizations(application.bot_data)
+        await application.stop()  # Lets the updates already queued finish
+        await application.shutdown()  # Final persistence write
+        store.close()
+        shutdown_pools()
+
+
+class ShardedBot:
+    def __init__(self, workers: int, state_file: str, base_url: Optional[str] = None,
+                 base_file_url: Optional[str] = None, local_mode: Optional[bool] = None):
+        self.workers = max(1, workers)
+        self.state_file = state_file
+        self.endpoint = bot_api_endpoint(base_url, base_file_url, local_mode)
+        self.ready = False
+        self._context = multiprocessing.get_context("spawn")  # Forking a process with PTB/httpx threads is unsafe
+        self._inboxes = [self._context.Queue() for _ in range(self.workers)]
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * self.workers
+        self._offset = 0
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _start_worker(self, index: int):
+        config = utils.current_config()
+        process = self._context.Process(
+            target=_worker_main, name=f"AppBotWorker-{index}",
+            args=(index, self.workers, self._inboxes[index], dict(config.SETTINGS), config.QUESTIONS, self.state_file,
+                  self.endpoint, logging.getLogger().getEffectiveLevel()),
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _restart_dead_workers(self):
+        for index, process in enumerate(self._processes):
+            if process is not None and not process.is_alive() and not self._stopping:
+                logger.error("Sharding: Worker %d exited with code %s; restarting it.", index, process.exitcode)
+                WORKER_RESTARTS_TOTAL.inc()
+                self._start_worker(index)
+
+    def dispatch(self, update: Update) -> int:
+        user = update.effective_user
+        shard = shard_for(user.id, self.workers) if user is not None else 0
+        self._inboxes[shard].put(update.to_dict())
+        SHARD_UPDATES_TOTAL.inc(str(shard))
+        return shard
+
+    async def run(self):
+        """Starts the workers and polls until stop()."""
+        self._task = asyncio.current_task()
+        SharedStateStore(self.state_file).close()  # Creates the schema once, before the workers race for it
+        for index in range(self.workers):
+            self._start_worker(index)
+        application = create_bot_application(*self.endpoint)  # Only for its Bot and the handlers' update types
+        if application is None:
+            await self._stop_workers()
+            return
+        bot = application.bot
+        polling = polling_kwargs(application)
+        limit = max(1, min(100, int(utils.get_setting("POLLING_BATCH_LIMIT", 100))))
+        metrics_port = utils.get_setting("METRICS_PORT", 0)
+        if metrics_port:
+            start_metrics_server(utils.get_setting("METRICS_HOST", "127.0.0.1"), int(metrics_port))
+        try:
+            await bot.initialize()
+            await bot.delete_webhook()
+            logger.info("Sharding: Polling for %s and routing to %d workers.", ", ".join(polling["allowed_updates"]),
+                        self.workers)
+            self.ready = True
+            while not self._stopping:
+                try:
+                    updates = await bot.get_updates(offset=self._offset, limit=limit, **polling)
+                except TelegramError as e:
+                    logger.warning("Sharding: getUpdates failed; retrying in %.0fs: %s", POLL_RETRY_SECONDS, e)
+                    await asyncio.sleep(POLL_RETRY_SECONDS)
+                    continue
+                for update in updates:
+                    self.dispatch(update)
+                    self._offset = update.update_id + 1
+                self._restart_dead_workers()
+        except asyncio.CancelledError:
+            logger.info("Sharding: Ingress stopped.")
+        finally:
+            self.ready = False
+            if self._offset:
+                try:
+                    # Confirms the last batch, so a restart doesn't hand it to the workers again.
+                    await bot.get_updates(offset=self._offset, limit=1, timeout=0, allowed_updates=polling["allowed_updates"])
+                except TelegramError as e:
+                    logger.warning("Sharding: Could not confirm the last updates; they will be delivered again: %s", e)
+            await bot.shutdown()
+            await self._stop_workers()
+
+    async def _stop_workers(self):
+        self._stopping = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+        loop = asyncio.get_running_loop()
+        stop_timeout = float(utils.get_setting("DRAIN_TIMEOUT_SECONDS", 20.0)) + WORKER_STOP_GRACE_SECONDS
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, stop_timeout)
+            if process.is_alive():
+                logger.error("Sharding: Worker %d did not stop in %.0fs; terminating it.", index, stop_timeout)
+                process.terminate()
+        logger.info("Sharding: All workers have stopped.")
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as one polling ingress and N worker processes.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: SHARD_WORKERS)")
+    parser.add_argument("--state-file", help="Shared SQLite state file (default: SHARED_STATE_FILE)")
+    args = parser.parse_args()
+
+    if not utils.load_settings():
+        sys.exit("CRITICAL: Settings not loaded. Exiting.")
+    if not utils.load_languages():
+        logger.warning("Sharding: Languages not loaded. Bot text might be affected.")
+    if not utils.load_questions():
+        logger.warning("Sharding: Questions not loaded. /apply may be affected.")
+    if not logging.getLogger().handlers:
+        logging.basicConfig(format="%(asctime)s - ingress - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    install_queue_logging()
+
+    workers = args.workers or int(utils.current_config().SETTINGS.get("SHARD_WORKERS", 4))
+    state_file = utils.get_external_file_path(args.state_file or utils.current_config().SETTINGS.get("SHARED_STATE_FILE", "shared_state.sqlite3"))
+    host = ShardedBot(workers, state_file)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(host.run())
+    except KeyboardInterrupt:
+        logger.info("Sharding: Interrupted; stopping the ingress and the workers...")
+        loop.run_until_complete(host.stop())
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# application_bot/shared_state.py
+"""
+Durable state shared by several bot processes through one SQLite file.
+
+SharedStateStore holds three tables in SHARED_STATE_FILE (WAL mode, so readers
+in one process never block a writer in another):
+  * user_data: each user's pickled user_data (the ApplicationSession);
+  * conversations: ConversationHandler states per (chat, user) key;
+  * submissions: one row per finalized application. This is the submission
+    index: its row ids number applications across all processes, and the
+    newest row per user is what the /apply rate limit checks.
+
+SqlitePersistence plugs the first two into PTB (Application.persistence), so a
+worker restarted or resharded by sharding.py picks users up where they were.
+With `owns_user` it only loads the users its own shard serves.
+"""
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from application_bot import async_fs
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL, conversation_key TEXT NOT NULL, user_id INTEGER, state TEXT NOT NULL,
+    PRIMARY KEY (name, conversation_key)
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, submitted_at REAL NOT NULL, pdf_path TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_by_user ON submissions (user_id, submitted_at);
+"""
+
+
+class SharedStateStore:
+    """One connection per process; every call is short and serialized by a lock."""
+
+    def __init__(self, path: str, busy_timeout: float = 10.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # --- submission index ---
+
+    def last_submission_time(self, user_id: int) -> float:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT MAX(submitted_at) FROM submissions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] or 0.0
+
+    def record_submission(self, user_id: int, pdf_path: Optional[str] = None, submitted_at: Optional[float] = None) -> int:
+        """Adds a finalized application and returns its number in the submission index."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO submissions (user_id, submitted_at, pdf_path) VALUES (?, ?, ?)",
+                (user_id, submitted_at if submitted_at is not None else time.time(), pdf_path))
+        return cursor.lastrowid
+
+    def submission_count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+    # --- user data and conversations ---
+
+    def load_user_data(self, owns_user: Optional[Callable[[int], bool]] = None) -> Dict[int, Any]:
+        with self._lock:
+            rows = self._connection.execute("SELECT user_id, data FROM user_data").fetchall()
+        user_data = {}
+        for user_id, data in rows:
+            if owns_user is not None and not owns_user(user_id):
+                continue
+            try:
+                user_data[user_id] = pickle.loads(data)
+            except Exception as e:
+                logger.error("Shared state: Could not load user_data of user %s; starting them fresh: %s", user_id, e)
+        return user_data
+
+    def save_user_data(self, user_id: int, blob: bytes):
+        """Stores user_data already pickled by the caller (on the thread that owns it)."""
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)", (user_id, blob))
+
+    def drop_user_data(self, user_id: int):
+        with self._lock:
+            self._connection.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+
+    def load_conversations(self, name: str, owns_user: Optional[Callable[[int], bool]] = None) -> Dict[Tuple, Any]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT conversation_key, user_id, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {
+            tuple(json.loads(key)): json.loads(state) for key, user_id, state in rows
+            if owns_user is None or user_id is None or owns_user(user_id)
+        }
+
+    def save_conversation(self, name: str, key: Tuple, state: Any, user_id: Optional[int] = None):
+        conversation_key = json.dumps(list(key))
+        with self._lock:
+            if state is None:
+                self._connection.execute("DELETE FROM conversations WHERE name = ? AND conversation_key = ?",
+                                         (name, conversation_key))
+            else:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO conversations (name, conversation_key, user_id, state) VALUES (?, ?, ?, ?)",
+                    (name, conversation_key, user_id, json.dumps(state)))
+
+
+class SqlitePersistence(BasePersistence):
+    """
+    PTB persistence for user_data and conversations on a SharedStateStore.
+    chat_data, bot_data and callback data are not stored: the bot keeps nothing
+    per chat, and the only cross-user state (the rate limit) lives in the
+    submissions table, where every process sees it immediately.
+    """
+
+    def __init__(self, store: SharedStateStore, owns_user: Optional[Callable[[int], bool]] = None,
+                 update_interval: float = 5.0):
+        super().__init__(PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+                         update_interval=update_interval)
+        self.store = store
+        self.owns_user = owns_user
+
+    async def get_user_data(self) -> Dict[int, Any]:
+        return await async_fs.run(self.store.load_user_data, self.owns_user)
+
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, Any]:
+        return await async_fs.run(self.store.load_conversations, name, self.owns_user)
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        # Conversations are per_user=True, so the user id is the key's last element.
+        await async_fs.run(self.store.save_conversation, name, key, new_state, key[-1] if key else None)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        # Pickled here on the loop, where handlers mutate the session, and written on the filesystem pool.
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        await async_fs.run(self.store.save_user_data, user_id, blob)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await async_fs.run(self.store.drop_user_data, user_id)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass  # Each user is served by one process at a time, so its in-memory copy is always the newest
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        pass  # Nothing is buffered here; each update_* call is already written
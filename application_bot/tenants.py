@@ -0,0 +1,181 @@
+# application_bot/tenants.py
+"""
+Multi-tenant mode: several bots, each with its own token and configuration,
+in one process on one event loop.
+
+    python -m application_bot.tenants tenants/sales tenants/hr
+    python -m application_bot.tenants --root tenants   # every subfolder with a settings.json
+
+Each tenant folder has its own settings.json and questions.json, and its
+APPLICATION_FOLDER and TEMP_PHOTO_FOLDER resolve inside that folder. A tenant's
+Application is built and run inside its utils.ConfigScope, so for its handlers (and
+every task PTB starts for them) utils.current_config() returns that tenant's
+SETTINGS, QUESTIONS and LANGUAGES_CACHE.
+
+Shared by all tenants: the language file and fonts bundled with the app,
+ReportLab's registered fonts and the PDF style cache, the PDF render and
+filesystem thread pools, the question-set version cache, the metrics endpoint
+(the first tenant with a METRICS_PORT starts it) and a single event-loop
+watchdog.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Iterable, List, Optional
+
+from telegram.ext import Application
+
+from application_bot import utils
+from application_bot.log_pipeline import install_queue_logging
+from application_bot.loop_watchdog import LoopWatchdog
+from application_bot.main import create_bot_application, run_bot_async, shutdown_pools, stop_bot_async
+from application_bot.utils import ConfigScope, config_scope, current_config
+
+logger = logging.getLogger(__name__)
+
+
+class Tenant:
+    def __init__(self, root_dir: str, name: Optional[str] = None):
+        root_dir = os.path.abspath(root_dir)
+        self.scope = ConfigScope(name or os.path.basename(root_dir.rstrip(os.sep)), root_dir)
+        self.application: Optional[Application] = None
+        self.loop_watchdog_enabled = False
+
+    @property
+    def name(self) -> str:
+        return self.scope.name
+
+    def load(self) -> bool:
+        """Loads the tenant's settings, languages and questions into its scope; False if it cannot run."""
+        with config_scope(self.scope):
+            utils.load_settings()
+            if not utils.load_languages():
+                logger.warning("Tenants: '%s': Languages not loaded. Bot text might be affected.", self.name)
+            if not utils.load_questions():
+                logger.warning("Tenants: '%s': Questions not loaded. /apply may be affected.", self.name)
+            self.loop_watchdog_enabled = bool(utils.current_config().SETTINGS.get("LOOP_WATCHDOG_ENABLED", True))
+            if not utils.current_config().SETTINGS.get("BOT_TOKEN"):
+                logger.error("Tenants: '%s' has no BOT_TOKEN in %s; skipping it.", self.name,
+                             utils.get_data_file_path("settings.json"))
+                return False
+        return True
+
+    @property
+    def token(self) -> str:
+        return (self.scope.SETTINGS or {}).get("BOT_TOKEN", "")
+
+
+def discover_tenants(root: str) -> List[Tenant]:
+    """One Tenant per subfolder of `root` that contains a settings.json, in name order."""
+    tenants = []
+    for entry in sorted(os.listdir(root)):
+        folder = os.path.join(root, entry)
+        if os.path.isfile(os.path.join(folder, "settings.json")):
+            tenants.append(Tenant(folder))
+    return tenants
+
+
+class TenantHost:
+    def __init__(self, tenants: Iterable[Tenant]):
+        self.tenants: List[Tenant] = []
+        seen_tokens = {}
+        for tenant in tenants:
+            if not tenant.load():
+                continue
+            if tenant.token in seen_tokens:
+                # Two pollers on one token make Telegram answer 409 Conflict to both.
+                logger.error("Tenants: '%s' uses the same BOT_TOKEN as '%s'; skipping it.", tenant.name, seen_tokens[tenant.token])
+                continue
+            seen_tokens[tenant.token] = tenant.name
+            self.tenants.append(tenant)
+        self._tasks: List[asyncio.Task] = []
+        self._watchdog: Optional[LoopWatchdog] = None
+
+    async def run(self):
+        """Runs every tenant until all of them have stopped."""
+        if not self.tenants:
+            logger.error("Tenants: No tenant can be started.")
+            return
+        if any(tenant.loop_watchdog_enabled for tenant in self.tenants):
+            self._watchdog = LoopWatchdog()
+            self._watchdog.start()
+        self._tasks = [asyncio.create_task(self._run_tenant(tenant), name=f"Tenant-{tenant.name}")
+                       for tenant in self.tenants]
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            if self._watchdog:
+                watchdog, self._watchdog = self._watchdog, None
+                await watchdog.aclose()
+
+    async def _run_tenant(self, tenant: Tenant):
+        # Set inside the task, so the scope is this task's alone and every task PTB creates from here inherits it.
+        with config_scope(tenant.scope):
+            logger.info("Tenants: Starting '%s' from %s.", tenant.name, tenant.scope.root_dir)
+            tenant.application = create_bot_application()
+            if tenant.application is None:
+                logger.error("Tenants: Could not create the bot for '%s'.", tenant.name)
+                return
+            # The loop is shared, so the host runs one watchdog for everybody instead of one per tenant.
+            await run_bot_async(tenant.application, loop_watchdog=False)
+            logger.info("Tenants: '%s' has stopped.", tenant.name)
+
+    async def stop(self):
+        for tenant in self.tenants:
+            if tenant.application is not None:
+                with config_scope(tenant.scope):
+                    await stop_bot_async(tenant.application)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def _install_tenant_log_field():
+    """Adds `tenant` (the current ConfigScope's name) to every log record."""
+    previous_factory = logging.getLogRecordFactory()
+
+    def factory(*args, **kwargs):
+        record = previous_factory(*args, **kwargs)
+        record.tenant = current_config().name
+        return record
+
+    logging.setLogRecordFactory(factory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several bots, one per tenant folder, in one process.")
+    parser.add_argument("folders", nargs="*", help="Tenant folders (each with its own settings.json)")
+    parser.add_argument("--root", help="Run every subfolder of this folder that contains a settings.json")
+    args = parser.parse_args()
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            format="%(asctime)s - %(tenant)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+        )
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    _install_tenant_log_field()
+    install_queue_logging()
+
+    tenants = [Tenant(folder) for folder in args.folders]
+    if args.root:
+        tenants.extend(discover_tenants(args.root))
+    if not tenants:
+        sys.exit("No tenant folders given. Pass folders or --root.")
+
+    host = TenantHost(tenants)
+    logger.info("Tenants: Running %d bot(s): %s", len(host.tenants), ", ".join(t.name for t in host.tenants))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(host.run())
+    except KeyboardInterrupt:
+        logger.info("Tenants: Interrupted; shutting down all bots...")
+        loop.run_until_complete(host.stop())
+    finally:
+        shutdown_pools()  # Shared by all tenants, so only once every tenant has stopped
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# application_bot/tracing.py
+"""
+Span-based tracing per update, plus a sampling cProfile hook.
+
+Every instrumented handler call opens a root span with its own trace ID; code
+inside it opens child spans with `span(...)` (they are no-ops outside a trace).
+The current span lives in a ContextVar, so concurrent updates never mix.
+
+All switches are read from the current bot's settings on every update, so changing them
+(settings.json reload or the GUI) takes effect without a restart:
+    TRACING_ENABLED          - turn tracing on/off.
+    TRACE_FILE               - JSON-lines file receiving every finished trace ("" = none).
+    TRACE_SLOW_THRESHOLD_MS  - traces slower than this are logged as a warning with their spans.
+    PROFILE_SAMPLE_EVERY_N   - cProfile 1 in N finalizations (0 = off).
+    PROFILE_FOLDER           - where .prof files are written (open with pstats or snakeviz).
+"""
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from application_bot import async_fs, utils
+from application_bot.utils import get_external_file_path
+
+logger = logging.getLogger(__name__)
+
+
+class _Trace:
+    __slots__ = ("trace_id", "started_at", "spans")
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.spans: List["Span"] = []
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "error", "_started", "duration")
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[int], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = len(trace.spans) + 1
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        trace.spans.append(self)
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self, trace_started: float) -> Dict[str, Any]:
+        return {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "offset_ms": round((self._started - trace_started) * 1000, 3),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("application_bot_current_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    return bool(utils.get_setting("TRACING_ENABLED", False))
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current else None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Child span of the current trace; yields None (and records nothing) when no trace is active."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    current = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace_update(name: str, update: Any) -> Iterator[Optional[Span]]:
+    """
+    Root span for one update. Nested calls (e.g. finalize_application invoked from
+    handle_photo) become child spans of the trace that is already running.
+    """
+    if _current_span.get() is not None:
+        with span(name) as child:
+            yield child
+        return
+    if not tracing_enabled():
+        yield None
+        return
+
+    attributes: Dict[str, Any] = {"update_id": getattr(update, "update_id", None)}
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        attributes["user_id"] = user.id
+    trace = _Trace()
+    root = Span(trace, name, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.end()
+        _current_span.reset(token)
+        _export_trace(trace)
+
+
+def traced(name: str, callback: Callable) -> Callable:
+    """Wraps an async PTB handler callback in a root span named after the handler."""
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        with trace_update(name, update):
+            return await callback(update, context, *args, **kwargs)
+    return wrapper
+
+
+# --- Export ---
+
+def _format_trace(trace: _Trace) -> str:
+    root_started = trace.spans[0]._started
+    depth: Dict[int, int] = {}
+    lines = []
+    for s in trace.spans:
+        depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+        suffix = f" ERROR {s.error}" if s.error else ""
+        lines.append(f"{'  ' * depth[s.span_id]}{s.name} +{(s._started - root_started) * 1000:.1f}ms "
+                     f"{(s.duration or 0.0) * 1000:.1f}ms{suffix}")
+    return "\n".join(lines)
+
+
+def _export_trace(trace: _Trace):
+    root = trace.spans[0]
+    duration_ms = (root.duration or 0.0) * 1000
+    threshold_ms = utils.get_setting("TRACE_SLOW_THRESHOLD_MS", 3000)
+    if threshold_ms and duration_ms >= threshold_ms:
+        logger.warning("Slow update (trace %s, %.0fms, user %s):\n%s", trace.trace_id, duration_ms,
+                       root.attributes.get('user_id'), _format_trace(trace))
+
+    trace_file = utils.get_setting("TRACE_FILE")
+    if trace_file:
+        record = {
+            "trace_id": trace.trace_id,
+            "timestamp": round(trace.started_at, 3),
+            "name": root.name,
+            "duration_ms": round(duration_ms, 3),
+            "update_id": root.attributes.get("update_id"),
+            "user_id": root.attributes.get("user_id"),
+            "spans": [s.to_dict(root._started) for s in trace.spans],
+        }
+        _TRACE_WRITER.submit(get_external_file_path(trace_file), record)
+
+
+class _TraceFileWriter:
+    """Appends trace records on a background thread so handlers never wait on disk."""
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue[tuple]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: str, record: Dict[str, Any]):
+        self._queue.put((file_path, record))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer_loop, name="TraceWriter", daemon=True)
+                    self._thread.start()
+
+    def _writer_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            by_file: Dict[str, List[str]] = {}
+            for file_path, record in batch:
+                try:
+                    line = json.dumps(record, ensure_ascii=False, default=str, separators=(",", ":"))
+                except (TypeError, ValueError) as e:
+                    logger.warning("Tracing: Could not serialize trace %s: %s", record.get('trace_id'), e)
+                    continue
+                by_file.setdefault(file_path, []).append(line)
+            for file_path, lines in by_file.items():
+                try:
+                    with open(file_path, "a", encoding="utf-8") as trace_file:
+                        trace_file.write("\n".join(lines) + "\n")
+                except OSError as e:
+                    logger.error("Tracing: Cannot write to %s: %s", file_path, e)
+
+
+_TRACE_WRITER = _TraceFileWriter()
+
+
+# --- Sampling profiler ---
+
+_profile_counters: Dict[str, Iterator[int]] = {}
+# Only one cProfile can be active per thread; concurrent finalizations past the first are not sampled.
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def maybe_profile(name: str) -> Iterator[bool]:
+    """
+    Runs the block under cProfile for 1 in PROFILE_SAMPLE_EVERY_N calls per `name`
+    and dumps the stats to PROFILE_FOLDER. Yields whether this call is profiled.
+    Inside the event loop the profile covers everything the loop thread ran
+    meanwhile, including other updates interleaved at await points.
+    """
+    every_n = int(utils.get_setting("PROFILE_SAMPLE_EVERY_N", 0) or 0)
+    if every_n <= 0:
+        yield False
+        return
+    counter = _profile_counters.setdefault(name, itertools.count(1))
+    if next(counter) % every_n != 0 or not _profile_lock.acquire(blocking=False):
+        yield False
+        return
+
+    profiler = cProfile.Profile()
+    started = time.time()
+    try:
+        profiler.enable()
+        try:
+            yield True
+        finally:
+            profiler.disable()
+    finally:
+        _profile_lock.release()
+        _dump_profile(profiler, name, started)
+
+
+def _dump_profile(profiler: cProfile.Profile, name: str, started: float):
+    # Runs where the profiled block ended (usually the event loop), so the file is written on the filesystem pool.
+    folder = get_external_file_path(utils.get_setting("PROFILE_FOLDER", "profiles") or "profiles")
+    filename = f"{name}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(started))}_{current_trace_id() or 'notrace'}.prof"
+    try:
+        async_fs.submit(_write_profile, profiler, name, folder, os.path.join(folder, filename))
+    except RuntimeError:  # Pool shut down (process exiting); the sample is dropped
+        logger.debug("Profiler: Dropped %s profile; the filesystem pool is shut down.", name)
+
+
+def _write_profile(profiler: cProfile.Profile, name: str, folder: str, path: str):
+    try:
+        os.makedirs(folder, exist_ok=True)
+        profiler.dump_stats(path)
+        logger.info("Profiler: Wrote %s profile to %s", name, path)
+    except OSError as e:
+        logger.error("Profiler: Could not write profile to %s: %s", folder, e)
@@ -0,0 +1,109 @@
+# application_bot/update_recorder.py
+"""
+Opt-in recorder for incoming updates, so real traffic can be replayed offline
+(see devtools/replay.py).
+
+Enabled by setting RECORD_UPDATES_FILE in settings.json (relative to the app root,
+like APPLICATION_FOLDER). The log is gzip-compressed JSON lines:
+    {"t": <unix timestamp>, "u": <Update.to_dict()>}
+Serialization and disk I/O happen on a writer thread; the handler only enqueues.
+"""
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class UpdateRecorder:
+    def __init__(self, file_path: str, flush_interval: float = 1.0):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded_count = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._writer_loop, name="UpdateRecorder", daemon=True)
+        self._thread.start()
+        logger.info("Update recorder: Appending incoming updates to %s", self.file_path)
+
+    def stop(self, timeout: float = 5.0):
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger.warning("Update recorder: Writer thread did not finish in time.")
+        else:
+            logger.info("Update recorder: Stopped after %s updates.", self.recorded_count)
+        self._thread = None
+
+    def record(self, update: Update):
+        self._queue.put((time.time(), update))
+
+    async def handle_update(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """TypeHandler callback; registered in a group that runs before all real handlers."""
+        if isinstance(update, Update):
+            self.record(update)
+
+    def _writer_loop(self):
+        # gzip in append mode adds a new member per session; gzip.open reads them back as one stream.
+        try:
+            with gzip.open(self.file_path, "at", encoding="utf-8", compresslevel=6) as log_file:
+                last_flush = time.monotonic()
+                while True:
+                    try:
+                        item = self._queue.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        item = None
+                    if item is _STOP:
+                        break
+                    if item is not None:
+                        timestamp, update = item
+                        try:
+                            line = json.dumps({"t": round(timestamp, 3), "u": update.to_dict()},
+                                              ensure_ascii=False, separators=(",", ":"))
+                        except Exception as e:
+                            logger.warning("Update recorder: Could not serialize update: %s", e)
+                            continue
+                        log_file.write(line + "\n")
+                        self.recorded_count += 1
+                    if time.monotonic() - last_flush >= self.flush_interval:
+                        log_file.flush()
+                        last_flush = time.monotonic()
+        except OSError as e:
+            logger.error("Update recorder: Cannot write to %s: %s", self.file_path, e)
+
+
+def read_update_log(file_path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yields (timestamp, update_dict) from a recorder log, skipping corrupt or truncated lines."""
+    try:
+        with gzip.open(file_path, "rt", encoding="utf-8") as log_file:
+            for line_number, line in enumerate(log_file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    yield float(entry["t"]), entry["u"]
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning("Update log %s: Skipping bad line %s: %s", file_path, line_number, e)
+    except EOFError:
+        # A recorder killed mid-write leaves a truncated final gzip member.
+        logger.warning("Update log %s: Truncated at the end; replaying what was readable.", file_path)
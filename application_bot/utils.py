@@ -3,21 +3,73 @@ import os
 import sys
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional, List
 
 logger = logging.getLogger(__name__)
 
-# Global cache for settings, questions, and languages
-SETTINGS: Optional[Dict[str, Any]] = None
-QUESTIONS: Optional[List[Dict[str, str]]] = None
-LANGUAGES_CACHE: Optional[Dict[str, Dict[str, str]]] = None
+
+class ConfigScope:
+    """
+    One bot's settings, questions and language packs, and the folder its
+    settings.json, questions.json and output folders live in (None: the app root).
+    """
+    __slots__ = ("name", "root_dir", "SETTINGS", "QUESTIONS", "LANGUAGES_CACHE")
+
+    def __init__(self, name: str, root_dir: Optional[str] = None):
+        self.name = name
+        self.root_dir = root_dir
+        self.SETTINGS: Optional[Dict[str, Any]] = None
+        self.QUESTIONS: Optional[List[Dict[str, str]]] = None
+        self.LANGUAGES_CACHE: Optional[Dict[str, Dict[str, str]]] = None
+
+    def __repr__(self) -> str:
+        return f"ConfigScope({self.name!r}, root_dir={self.root_dir!r})"
+
+
+DEFAULT_SCOPE = ConfigScope("default")
+_current_scope: ContextVar[ConfigScope] = ContextVar("config_scope", default=DEFAULT_SCOPE)
+
+
+def current_config() -> ConfigScope:
+    """
+    The configuration of the bot running in this context: DEFAULT_SCOPE unless a
+    config_scope() is active (one per tenant, see tenants.py). Code that reads
+    several settings takes it once: `settings = current_config().SETTINGS`.
+    """
+    return _current_scope.get()
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """`key` from the current bot's settings, or `default` if it is unset or settings are not loaded."""
+    settings = _current_scope.get().SETTINGS
+    return settings.get(key, default) if settings else default
+
+
+@contextmanager
+def config_scope(scope: ConfigScope) -> Iterator[ConfigScope]:
+    """
+    Makes `scope` the configuration returned by current_config() in this context.
+    asyncio tasks created inside inherit it, so an Application started here keeps
+    its tenant's configuration (see tenants.py).
+    """
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
 
 def get_app_root_dir() -> str:
     """
     Get the root directory for EXTERNAL data files (settings.json, questions.json)
     that are meant to be alongside the executable in a PyInstaller bundle.
     For development, this is the 'application_bot' subfolder.
+    A ConfigScope with its own root_dir (a tenant) overrides both.
     """
+    root_dir = _current_scope.get().root_dir
+    if root_dir:
+        return root_dir
     if getattr(sys, 'frozen', False):  # PyInstaller bundle
         return os.path.dirname(sys.executable) # Directory containing the executable
     else:
@@ -58,26 +110,26 @@ def get_external_file_path(relative_path_from_app_root: str) -> str:
 
 def load_json_file(file_path: str, file_description: str) -> Optional[Any]:
     """Loads a JSON file and handles errors."""
-    logger.debug(f"Attempting to load {file_description} from: {file_path}")
+    logger.debug("Attempting to load %s from: %s", file_description, file_path)
     if not os.path.exists(file_path):
-        logger.warning(f"{file_description} file not found at {file_path}.")
+        logger.warning("%s file not found at %s.", file_description, file_path)
         return None
         
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
             if not content.strip():
-                logger.warning(f"{file_description} file at {file_path} is empty.")
+                logger.warning("%s file at %s is empty.", file_description, file_path)
                 if file_description.lower().startswith("questions"): return []
                 elif file_description.lower().startswith("languages"): return {}
                 return None 
             return json.loads(content)
     except FileNotFoundError:
-        logger.error(f"{file_description} file not found at {file_path} (FileNotFoundError).")
+        logger.error("%s file not found at %s (FileNotFoundError).", file_description, file_path)
     except json.JSONDecodeError as e:
-        logger.error(f"Error decoding {file_description} file at {file_path}: {e}")
+        logger.error("Error decoding %s file at %s: %s", file_description, file_path, e)
     except Exception as e:
-        logger.error(f"An unexpected error occurred while loading {file_description} at {file_path}: {e}")
+        logger.error("An unexpected error occurred while loading %s at %s: %s", file_description, file_path, e)
     return None
 
 def save_json_file(data: Any, file_path: str, file_description: str, indent: int = 4) -> bool:
@@ -85,10 +137,10 @@ def save_json_file(data: Any, file_path: str, file_description: str, indent: int
     try:
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=indent)
-        logger.info(f"{file_description} successfully saved to {file_path}")
+        logger.info("%s successfully saved to %s", file_description, file_path)
         return True
     except Exception as e:
-        logger.error(f"Error saving {file_description} to {file_path}: {e}")
+        logger.error("Error saving %s to %s: %s", file_description, file_path, e)
     return False
 
 
@@ -99,58 +151,58 @@ def save_settings(settings_data: Dict[str, Any], filename: str = "settings.json"
     return save_json_file(settings_data_to_save, settings_path, "Settings")
 
 def load_settings(filename: str = "settings.json") -> bool:
-    global SETTINGS 
-    
+    scope = current_config()
+
     external_settings_path = get_data_file_path(filename)
     loaded_content = load_json_file(external_settings_path, f"External Settings ({filename})")
     file_existed_and_valid_externally = loaded_content is not None
 
     if not file_existed_and_valid_externally and getattr(sys, 'frozen', False):
-        logger.info(f"External settings not found or invalid at '{external_settings_path}'. "
-                    f"Attempting to load bundled default settings.")
+        logger.info("External settings not found or invalid at '%s'. "
+                    "Attempting to load bundled default settings.", external_settings_path)
         internal_settings_path = get_internal_data_path(filename)
         bundled_content = load_json_file(internal_settings_path, f"Bundled Default Settings ({filename})")
         if bundled_content is not None:
-            logger.info(f"Successfully loaded bundled default settings from '{internal_settings_path}'. "
-                        f"These will be used and saved to '{external_settings_path}'.")
-            SETTINGS = bundled_content
+            logger.info("Successfully loaded bundled default settings from '%s'. "
+                        "These will be used and saved to '%s'.", internal_settings_path, external_settings_path)
+            scope.SETTINGS = bundled_content
             _ensure_default_settings_keys()
-            if not save_settings(SETTINGS, filename): 
-                logger.error(f"Failed to bootstrap external settings file at '{external_settings_path}' from bundled defaults.")
+            if not save_settings(scope.SETTINGS, filename): 
+                logger.error("Failed to bootstrap external settings file at '%s' from bundled defaults.", external_settings_path)
             file_existed_and_valid_externally = True 
         else:
-            logger.warning(f"Bundled default settings also not found or invalid at '{internal_settings_path}'. "
-                           f"Using minimal hardcoded defaults.")
-            SETTINGS = {} 
+            logger.warning("Bundled default settings also not found or invalid at '%s'. "
+                           "Using minimal hardcoded defaults.", internal_settings_path)
+            scope.SETTINGS = {} 
             file_existed_and_valid_externally = False 
     elif file_existed_and_valid_externally:
-        SETTINGS = loaded_content
+        scope.SETTINGS = loaded_content
     else: 
-        SETTINGS = {} 
+        scope.SETTINGS = {} 
         file_existed_and_valid_externally = False
 
     _ensure_default_settings_keys() 
 
     for folder_key in ["APPLICATION_FOLDER", "TEMP_PHOTO_FOLDER"]:
-        folder_name = SETTINGS.get(folder_key)
+        folder_name = scope.SETTINGS.get(folder_key)
         if folder_name:
             try:
                 full_folder_path = get_external_file_path(folder_name)
                 os.makedirs(full_folder_path, exist_ok=True)
-                logger.info(f"Ensured output directory exists: {full_folder_path}")
+                logger.info("Ensured output directory exists: %s", full_folder_path)
             except OSError as e:
-                logger.error(f"Could not create output directory {full_folder_path}: {e}")
+                logger.error("Could not create output directory %s: %s", full_folder_path, e)
         else:
-            logger.warning(f"Configuration for output folder '{folder_key}' is missing in settings.json.")
+            logger.warning("Configuration for output folder '%s' is missing in settings.json.", folder_key)
     
     return file_existed_and_valid_externally
 
 
 def _ensure_default_settings_keys():
     """Helper to apply default values to the global SETTINGS dictionary."""
-    global SETTINGS
-    if SETTINGS is None: 
-        SETTINGS = {}    
+    scope = current_config()
+    if scope.SETTINGS is None: 
+        scope.SETTINGS = {}    
         logger.error("_ensure_default_settings_keys called with SETTINGS as None. Initializing to {}.")
 
     default_values = {
@@ -164,13 +216,30 @@ def _ensure_default_settings_keys():
         "RATE_LIMIT_SECONDS": 600, "CONVERSATION_TIMEOUT_SECONDS": 1200,
         "MAX_ALLOWED_FILE_SIZE_MB": 10, "HTTP_CONNECT_TIMEOUT": 10.0,
         "HTTP_READ_TIMEOUT": 30.0, "HTTP_WRITE_TIMEOUT": 30.0, "HTTP_POOL_TIMEOUT": 15.0,
-        "PYWEBVIEW_DEBUG": False
+        "PYWEBVIEW_DEBUG": False,
+        "RECORD_UPDATES_FILE": "", "METRICS_PORT": 0, "METRICS_HOST": "127.0.0.1",
+        "TRACING_ENABLED": False, "TRACE_FILE": "traces.jsonl", "TRACE_SLOW_THRESHOLD_MS": 3000,
+        "PROFILE_SAMPLE_EVERY_N": 0, "PROFILE_FOLDER": "profiles",
+        "LOG_JSON_FILE": "", "LOG_JSON_MAX_BYTES": 10485760, "LOG_JSON_BACKUP_COUNT": 5,
+        "CONTROL_HOST": "127.0.0.1", "CONTROL_PORT": 8765, "CONTROL_SOCKET": "control.sock", "CONTROL_TOKEN": "",
+        "CONTROL_TOKEN_FILE": "control_token",
+        "CONNECTION_FAILURES_BEFORE_PAUSE": 3, "CONNECTION_BACKOFF_INITIAL_SECONDS": 1.0,
+        "CONNECTION_BACKOFF_MAX_SECONDS": 60.0,
+        "LOOP_WATCHDOG_ENABLED": True, "LOOP_WATCHDOG_INTERVAL_SECONDS": 0.1, "LOOP_BLOCKED_THRESHOLD_SECONDS": 0.25,
+        "FILESYSTEM_WORKER_THREADS": 4, "QUESTION_SET_CACHE_SIZE": 8, "QUESTION_SET_ARCHIVE_FOLDER": "question_sets",
+        "INBOUND_FILTER_ENABLED": True, "INBOUND_RATE_PER_SECOND": 1.0, "INBOUND_BURST": 8,
+        "INBOUND_WARNING_INTERVAL_SECONDS": 30.0,
+        "POLLING_TIMEOUT_SECONDS": 30, "POLLING_BATCH_LIMIT": 100,
+        "CATCH_UP_ENABLED": True, "CATCH_UP_DROP_STALE": False, "CATCH_UP_MAX_UPDATES": 10000,
+        "BOT_API_BASE_URL": "", "BOT_API_BASE_FILE_URL": "", "BOT_API_LOCAL_MODE": False, "PDF_WORKER_THREADS": 2,
+        "SHARD_WORKERS": 4, "SHARED_STATE_FILE": "shared_state.sqlite3", "PERSISTENCE_FLUSH_SECONDS": 5.0,
+        "DRAIN_TIMEOUT_SECONDS": 20.0, "DRAIN_CHECKPOINT_FOLDER": "pending_finalizations", "PREWARM_ENABLED": True
     }
     for key, value in default_values.items():
-        SETTINGS.setdefault(key, value)
+        scope.SETTINGS.setdefault(key, value)
     
-    if "PDF_SETTINGS" not in SETTINGS or not isinstance(SETTINGS["PDF_SETTINGS"], dict):
-        SETTINGS["PDF_SETTINGS"] = {} 
+    if "PDF_SETTINGS" not in scope.SETTINGS or not isinstance(scope.SETTINGS["PDF_SETTINGS"], dict):
+        scope.SETTINGS["PDF_SETTINGS"] = {} 
         
     default_pdf_settings = {
         "page_width_mm": 210.0, "page_height_mm": 297.0, "margin_mm": 15.0,
@@ -180,19 +249,19 @@ def _ensure_default_settings_keys():
         "question_bold": True, "answer_font_size": 10
     }
     for key, value in default_pdf_settings.items():
-        SETTINGS["PDF_SETTINGS"].setdefault(key, value)
+        scope.SETTINGS["PDF_SETTINGS"].setdefault(key, value)
 
 
 def load_languages() -> bool:
-    global LANGUAGES_CACHE, SETTINGS
-    if not SETTINGS:
+    scope = current_config()
+    if not scope.SETTINGS:
         logger.warning("load_languages called before settings loaded. Attempting to load settings.")
         if not load_settings(): 
              logger.error("Settings unavailable after attempt, cannot determine languages file. Using minimal languages.")
-             LANGUAGES_CACHE = {"en": {"gui_title": "[EN] App Bot (L_FAIL_S_FAIL)"}, "ru": {"gui_title": "[RU] Бот Заявок (L_FAIL_S_FAIL)"}}
+             scope.LANGUAGES_CACHE = {"en": {"gui_title": "[EN] App Bot (L_FAIL_S_FAIL)"}, "ru": {"gui_title": "[RU] Бот Заявок (L_FAIL_S_FAIL)"}}
              return False
     
-    lang_file_name_from_settings = SETTINGS.get("LANGUAGES_FILE", "languages.json")
+    lang_file_name_from_settings = scope.SETTINGS.get("LANGUAGES_FILE", "languages.json")
     languages_path = get_internal_data_path(lang_file_name_from_settings) 
     
     loaded_data = load_json_file(languages_path, "Languages")
@@ -203,8 +272,8 @@ def load_languages() -> bool:
     }
 
     if loaded_data is None or not isinstance(loaded_data, dict) or not loaded_data:
-        logger.warning(f"Languages file '{languages_path}' not found, error, or invalid. Using minimal default languages.")
-        LANGUAGES_CACHE = default_min_langs
+        logger.warning("Languages file '%s' not found, error, or invalid. Using minimal default languages.", languages_path)
+        scope.LANGUAGES_CACHE = default_min_langs
         return False
     
     valid_langs_loaded = {}
@@ -212,158 +281,158 @@ def load_languages() -> bool:
         if isinstance(translations, dict):
             valid_langs_loaded[lang_code] = translations
         else:
-            logger.warning(f"Language pack for '{lang_code}' in '{languages_path}' is not a dictionary. Skipping.")
+            logger.warning("Language pack for '%s' in '%s' is not a dictionary. Skipping.", lang_code, languages_path)
     
     if not valid_langs_loaded:
-        logger.error(f"No valid language packs found in '{languages_path}'. Using minimal default languages.")
-        LANGUAGES_CACHE = default_min_langs
+        logger.error("No valid language packs found in '%s'. Using minimal default languages.", languages_path)
+        scope.LANGUAGES_CACHE = default_min_langs
         return False
 
-    LANGUAGES_CACHE = valid_langs_loaded
-    logger.info(f"Successfully loaded {len(LANGUAGES_CACHE)} language packs from {languages_path}.")
+    scope.LANGUAGES_CACHE = valid_langs_loaded
+    logger.info("Successfully loaded %s language packs from %s.", len(scope.LANGUAGES_CACHE), languages_path)
     return True
 
 
 def load_questions() -> bool:
-    global QUESTIONS, SETTINGS
-    if not SETTINGS:
+    scope = current_config()
+    if not scope.SETTINGS:
         logger.error("Settings not loaded. Cannot determine questions file. Questions will be empty.")
-        QUESTIONS = []
+        scope.QUESTIONS = []
         return False
     
-    questions_file_name = SETTINGS.get("QUESTIONS_FILE", "questions.json")
+    questions_file_name = scope.SETTINGS.get("QUESTIONS_FILE", "questions.json")
     
     external_questions_path = get_data_file_path(questions_file_name)
     loaded_data = load_json_file(external_questions_path, f"External Questions ({questions_file_name})")
     file_existed_and_valid_externally = isinstance(loaded_data, list) 
 
     if not file_existed_and_valid_externally and getattr(sys, 'frozen', False):
-        logger.info(f"External questions not found or invalid at '{external_questions_path}'. "
-                    f"Attempting to load bundled default questions.")
+        logger.info("External questions not found or invalid at '%s'. "
+                    "Attempting to load bundled default questions.", external_questions_path)
         internal_questions_path = get_internal_data_path(questions_file_name)
         bundled_data = load_json_file(internal_questions_path, f"Bundled Default Questions ({questions_file_name})")
 
         if isinstance(bundled_data, list):
-            logger.info(f"Successfully loaded bundled default questions from '{internal_questions_path}'. "
-                        f"These will be used and saved to '{external_questions_path}'.")
-            QUESTIONS = bundled_data
-            if not save_questions(QUESTIONS, questions_file_name): 
-                 logger.error(f"Failed to bootstrap external questions file at '{external_questions_path}' from bundled defaults.")
+            logger.info("Successfully loaded bundled default questions from '%s'. "
+                        "These will be used and saved to '%s'.", internal_questions_path, external_questions_path)
+            scope.QUESTIONS = bundled_data
+            if not save_questions(scope.QUESTIONS, questions_file_name): 
+                 logger.error("Failed to bootstrap external questions file at '%s' from bundled defaults.", external_questions_path)
             file_existed_and_valid_externally = True 
         else:
-            logger.warning(f"Bundled default questions also not found or invalid at '{internal_questions_path}'. "
-                           f"Using empty questions list.")
-            QUESTIONS = []
+            logger.warning("Bundled default questions also not found or invalid at '%s'. "
+                           "Using empty questions list.", internal_questions_path)
+            scope.QUESTIONS = []
             file_existed_and_valid_externally = False
     elif file_existed_and_valid_externally:
-        QUESTIONS = loaded_data
+        scope.QUESTIONS = loaded_data
     else: 
-        logger.warning(f"Questions file '{external_questions_path}' not found, invalid, or not a list. Using empty questions list.")
-        QUESTIONS = []
+        logger.warning("Questions file '%s' not found, invalid, or not a list. Using empty questions list.", external_questions_path)
+        scope.QUESTIONS = []
         file_existed_and_valid_externally = False
     
     if file_existed_and_valid_externally:
-        logger.info(f"Successfully loaded {len(QUESTIONS)} questions.")
+        logger.info("Successfully loaded %s questions.", len(scope.QUESTIONS))
     return file_existed_and_valid_externally
 
 
 def save_questions(questions_data: List[Dict[str, str]], filename: Optional[str] = None) -> bool:
-    global QUESTIONS, SETTINGS 
+    scope = current_config()
 
     if filename is None:
-        if SETTINGS and SETTINGS.get("QUESTIONS_FILE"):
-            actual_filename = SETTINGS["QUESTIONS_FILE"]
+        if scope.SETTINGS and scope.SETTINGS.get("QUESTIONS_FILE"):
+            actual_filename = scope.SETTINGS["QUESTIONS_FILE"]
         else:
             logger.warning("QUESTIONS_FILE not found in settings, using default 'questions.json' for saving.")
             actual_filename = "questions.json" 
-            if SETTINGS: SETTINGS["QUESTIONS_FILE"] = actual_filename 
+            if scope.SETTINGS: scope.SETTINGS["QUESTIONS_FILE"] = actual_filename 
     else: actual_filename = filename
 
     questions_file_path = get_data_file_path(actual_filename)
     
     if save_json_file(questions_data, questions_file_path, "Questions", indent=2):
-        QUESTIONS = list(questions_data) 
+        scope.QUESTIONS = list(questions_data) 
         return True
     return False
 
 
 def get_text(key: str, lang: Optional[str] = None, default: Optional[str] = None, **kwargs) -> str:
-    global SETTINGS, LANGUAGES_CACHE
+    scope = current_config()
 
-    if SETTINGS is None:
+    if scope.SETTINGS is None:
         logger.debug("get_text: SETTINGS not loaded. Triggering load.")
         load_settings()
-        if SETTINGS is None:
+        if scope.SETTINGS is None:
             logger.error("get_text: SETTINGS still not available after load attempt. Key: %s", key)
             return default if default is not None else f"<S_NF_{key}>"
 
-    if LANGUAGES_CACHE is None:
+    if scope.LANGUAGES_CACHE is None:
         logger.debug("get_text: LANGUAGES_CACHE not loaded. Triggering load.")
         load_languages()
-        if LANGUAGES_CACHE is None:
+        if scope.LANGUAGES_CACHE is None:
             logger.error("get_text: LANGUAGES_CACHE still not available after load attempt. Key: %s", key)
             return default if default is not None else f"<L_NF_{key}>"
 
     selected_lang = lang
     if selected_lang is None:
-        selected_lang = SETTINGS.get("DEFAULT_LANG", "en")
+        selected_lang = scope.SETTINGS.get("DEFAULT_LANG", "en")
 
-    if selected_lang not in LANGUAGES_CACHE:
-        logger.debug(f"get_text: Lang '{selected_lang}' not in LANGUAGES_CACHE. Trying DEFAULT_LANG.")
-        selected_lang = SETTINGS.get("DEFAULT_LANG", "en")
-        if selected_lang not in LANGUAGES_CACHE:
-            logger.debug(f"get_text: DEFAULT_LANG '{selected_lang}' also not in LANGUAGES_CACHE. Trying 'en'.")
+    if selected_lang not in scope.LANGUAGES_CACHE:
+        logger.debug("get_text: Lang '%s' not in LANGUAGES_CACHE. Trying DEFAULT_LANG.", selected_lang)
+        selected_lang = scope.SETTINGS.get("DEFAULT_LANG", "en")
+        if selected_lang not in scope.LANGUAGES_CACHE:
+            logger.debug("get_text: DEFAULT_LANG '%s' also not in LANGUAGES_CACHE. Trying 'en'.", selected_lang)
             selected_lang = "en"
 
-    lang_pack = LANGUAGES_CACHE.get(selected_lang)
+    lang_pack = scope.LANGUAGES_CACHE.get(selected_lang)
 
     if not lang_pack:
         # Fallback to app default language if current selection isn't 'en' or app default
-        default_app_lang_for_pack = SETTINGS.get("DEFAULT_LANG", "en")
+        default_app_lang_for_pack = scope.SETTINGS.get("DEFAULT_LANG", "en")
         if selected_lang != default_app_lang_for_pack:
-            logger.debug(f"I18N: Language pack for '{selected_lang}' not found. Trying app default '{default_app_lang_for_pack}'.")
-            lang_pack = LANGUAGES_CACHE.get(default_app_lang_for_pack)
+            logger.debug("I18N: Language pack for '%s' not found. Trying app default '%s'.", selected_lang, default_app_lang_for_pack)
+            lang_pack = scope.LANGUAGES_CACHE.get(default_app_lang_for_pack)
             selected_lang = default_app_lang_for_pack # Update selected_lang for further checks
         
         if not lang_pack and selected_lang != "en": # Try 'en' if app default also fails
-            logger.debug(f"I18N: Language pack for app default '{selected_lang}' not found. Trying 'en'.")
-            lang_pack = LANGUAGES_CACHE.get("en")
+            logger.debug("I18N: Language pack for app default '%s' not found. Trying 'en'.", selected_lang)
+            lang_pack = scope.LANGUAGES_CACHE.get("en")
             selected_lang = "en" # Update selected_lang
 
         if not lang_pack:
-            logger.error(f"I18N: Language pack for '{key}' (lang '{lang}', ultimate fallback '{selected_lang}') not found.")
+            logger.error("I18N: Language pack for '%s' (lang '%s', ultimate fallback '%s') not found.", key, lang, selected_lang)
             return default if default is not None else f"<LP_NF_{key}_{lang or selected_lang}>"
 
 
     text_template = lang_pack.get(key)
 
     if text_template is None:
-        default_app_lang = SETTINGS.get("DEFAULT_LANG", "en")
+        default_app_lang = scope.SETTINGS.get("DEFAULT_LANG", "en")
         if selected_lang != default_app_lang: # If not already app default, try app default
-            logger.debug(f"I18N: Key '{key}' not found in '{selected_lang}'. Trying app default '{default_app_lang}'.")
-            lang_pack_default_app = LANGUAGES_CACHE.get(default_app_lang)
+            logger.debug("I18N: Key '%s' not found in '%s'. Trying app default '%s'.", key, selected_lang, default_app_lang)
+            lang_pack_default_app = scope.LANGUAGES_CACHE.get(default_app_lang)
             if lang_pack_default_app:
                 text_template = lang_pack_default_app.get(key)
 
         if text_template is None and selected_lang != "en" and default_app_lang != "en": # If not already 'en' and app default wasn't 'en'
-            logger.debug(f"I18N: Key '{key}' not found in app default. Trying 'en'.")
-            lang_pack_en = LANGUAGES_CACHE.get("en")
+            logger.debug("I18N: Key '%s' not found in app default. Trying 'en'.", key)
+            lang_pack_en = scope.LANGUAGES_CACHE.get("en")
             if lang_pack_en:
                 text_template = lang_pack_en.get(key)
 
     if text_template is None:
         if default is not None: return default
-        logger.warning(f"I18N: Key '{key}' not found for lang '{lang}' or fallbacks. Returning key.")
+        logger.warning("I18N: Key '%s' not found for lang '%s' or fallbacks. Returning key.", key, lang)
         return f"<{key}_!{lang or selected_lang}>"
 
     if kwargs:  # Only attempt to format if specific placeholders are provided
         try:
             return text_template.format(**kwargs)
         except KeyError as e:
-            logger.warning(f"I18N: Placeholder {e} missing for key '{key}' in lang '{selected_lang}'. Template: '{text_template}' Args: {kwargs}")
+            logger.warning("I18N: Placeholder %s missing for key '%s' in lang '%s'. Template: '%s' Args: %s", e, key, selected_lang, text_template, kwargs)
             return text_template # Return raw template if formatting fails with provided args
         except Exception as e:
-            logger.error(f"I18N: Generic formatting error for key '{key}', lang '{selected_lang}': {e}. Template: '{text_template}' Args: {kwargs}")
+            logger.error("I18N: Generic formatting error for key '%s', lang '%s': %s. Template: '%s' Args: %s", key, selected_lang, e, text_template, kwargs)
             return f"<F_ERR_{key}_{selected_lang}>"
     else:
         # If no kwargs are provided, return the template string as is.
@@ -9,6 +9,11 @@ document.addEventListener('DOMContentLoaded', function () {
         statusDisplayLabelPrefix: document.getElementById('gui_status_label_prefix'),
         statusMessageContent: document.getElementById('status-message-content'),
         logOutput: document.getElementById('log-output'),
+        logSpacer: document.getElementById('log-spacer'),
+        logRows: document.getElementById('log-rows'),
+        logSearchInput: document.getElementById('log-search-input'),
+        logLevelFilter: document.getElementById('log-level-filter'),
+        logMatchCount: document.getElementById('log-match-count'),
         guiTitleText: document.getElementById('gui_title_text'),
         logoImage: document.getElementById('logo'),
 
@@ -51,6 +56,8 @@ document.addEventListener('DOMContentLoaded', function () {
         // Admin Settings Tab Inputs (inside modal)
         adminBotTokenInput: document.getElementById('admin-bot-token'),
         adminUserIdsInput: document.getElementById('admin-user-ids'),
+        adminTracingEnabledToggle: document.getElementById('admin-tracing-enabled'),
+        adminProfileEveryNInput: document.getElementById('admin-profile-every-n'),
 
         // Theme Stylesheets
         mainStyleSheet: document.getElementById('main-stylesheet'),
@@ -70,7 +77,9 @@ document.addEventListener('DOMContentLoaded', function () {
         infoModalCloseButton: document.getElementById('info-modal-close-button')
     };
 
-    let currentMaxLogLines = 100;
+    let currentMaxLogLines = 100000;
+    let minLogLines = 100;
+    let maxLogLinesLimit = 1000000;
     let currentGuiTranslations = {};
     let statusPrefix = "Status: ";
     let currentQuestionsData = [];
@@ -164,7 +173,7 @@ document.addEventListener('DOMContentLoaded', function () {
                     } else if (el.id === 'info-modal-close-button') {
                         el.textContent = translations.gui_modal_info_ok_button || "OK";
                     }
-                } else if (el.tagName === 'LABEL' || el.tagName === 'H2' || el.tagName === 'TH' || el.id === 'gui_title_text') {
+                } else if (el.tagName === 'LABEL' || el.tagName === 'H2' || el.tagName === 'TH' || el.id === 'gui_title_text' || el.classList.contains('dashboard-label') || el.classList.contains('dashboard-footnote')) {
                      el.textContent = translations[key];
                 }
             }
@@ -178,6 +187,7 @@ document.addEventListener('DOMContentLoaded', function () {
         if (uiElements.aboutButton) uiElements.aboutButton.title = currentGuiTranslations.gui_about_button_title || "About";
         if (uiElements.settingsIconButton) uiElements.settingsIconButton.title = currentGuiTranslations.gui_settings_button_title || "Settings";
         if (uiElements.infoModalCloseButton) uiElements.infoModalCloseButton.textContent = currentGuiTranslations.gui_modal_info_ok_button || "OK";
+        if (uiElements.logSearchInput) uiElements.logSearchInput.placeholder = currentGuiTranslations.gui_log_search_placeholder || "Search logs...";
     };
 
     window.setSystemLanguageToggleState = function(langCode) {
@@ -263,19 +273,212 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     };
 
-    window.addBatchLogMessages = function(messagesArray) {
-        if (!uiElements.logOutput) return;
-        const fragment = document.createDocumentFragment();
-        messagesArray.forEach(msg => {
-            const logEntry = document.createElement('div');
-            logEntry.textContent = msg;
-            fragment.appendChild(logEntry);
+    // --- Virtualized log view ---
+    // Python keeps the full log in a ring buffer. Only the rows in (or near) the viewport
+    // are in the DOM; rows are cached by view row index and fetched with query_logs().
+    // Unfiltered, row i is sequence number firstSeq + i, so pushed deltas fill the cache
+    // directly. Filtered views (level/search) are computed by Python and re-queried.
+    const LOG_ROW_HEIGHT = 18;
+    const LOG_OVERSCAN_ROWS = 40;
+    const LOG_CACHE_SPARE_ROWS = 2000;
+    const LOG_FILTER_REFRESH_MS = 250;
+    const logView = {
+        capacity: 100000, firstSeq: 1, lastSeq: 0, total: 0,
+        level: '', search: '',
+        rows: new Map(), // view row index -> escaped line
+        follow: true, renderScheduled: false,
+        fetchInFlight: false, fetchQueued: false, filterRefreshTimer: null
+    };
+
+    function isLogViewFiltered() { return logView.level !== '' || logView.search !== ''; }
+
+    function scheduleLogRender() {
+        if (logView.renderScheduled) return;
+        logView.renderScheduled = true;
+        window.requestAnimationFrame(renderLogView);
+    }
+
+    function shiftLogRows(shift) {
+        if (shift <= 0) return;
+        const shifted = new Map();
+        logView.rows.forEach((text, row) => { if (row >= shift) shifted.set(row - shift, text); });
+        logView.rows = shifted;
+        if (!logView.follow && uiElements.logOutput) {
+            uiElements.logOutput.scrollTop = Math.max(0, uiElements.logOutput.scrollTop - shift * LOG_ROW_HEIGHT);
+        }
+    }
+
+    function visibleLogRange() {
+        const el = uiElements.logOutput;
+        const first = Math.max(0, Math.floor(el.scrollTop / LOG_ROW_HEIGHT) - LOG_OVERSCAN_ROWS);
+        const last = Math.min(logView.total, Math.ceil((el.scrollTop + el.clientHeight) / LOG_ROW_HEIGHT) + LOG_OVERSCAN_ROWS);
+        return [first, last];
+    }
+
+    function renderLogView() {
+        logView.renderScheduled = false;
+        const el = uiElements.logOutput;
+        if (!el || !uiElements.logSpacer || !uiElements.logRows) return;
+        uiElements.logSpacer.style.height = (logView.total * LOG_ROW_HEIGHT) + 'px';
+        if (logView.follow) el.scrollTop = el.scrollHeight;
+
+        const [first, last] = visibleLogRange();
+        let missing = false;
+        const html = [];
+        for (let row = first; row < last; row++) {
+            const text = logView.rows.get(row);
+            if (text === undefined) { missing = true; html.push('<div class="log-row log-row-pending"></div>'); }
+            else html.push('<div class="log-row">' + text + '</div>'); // Escaped once on the Python side
+        }
+        uiElements.logRows.style.transform = 'translateY(' + (first * LOG_ROW_HEIGHT) + 'px)';
+        uiElements.logRows.innerHTML = html.join('');
+        if (uiElements.logMatchCount) {
+            uiElements.logMatchCount.textContent = isLogViewFiltered() ? String(logView.total) : '';
+        }
+
+        if (logView.rows.size > (last - first) + 2 * LOG_CACHE_SPARE_ROWS) {
+            logView.rows.forEach((_, row) => {
+                if (row < first - LOG_CACHE_SPARE_ROWS || row > last + LOG_CACHE_SPARE_ROWS) logView.rows.delete(row);
+            });
+        }
+        if (missing) fetchLogRows(first, last - first);
+    }
+
+    function fetchLogRows(start, count) {
+        if (!(window.pywebview && window.pywebview.api.query_logs)) return;
+        if (logView.fetchInFlight) { logView.fetchQueued = true; return; }
+        logView.fetchInFlight = true;
+        const filterKey = logView.level + '\u0000' + logView.search;
+        window.pywebview.api.query_logs(start, count, logView.level, logView.search).then(result => {
+            logView.fetchInFlight = false;
+            if (!result || filterKey !== logView.level + '\u0000' + logView.search) { scheduleLogRender(); return; }
+            if (!isLogViewFiltered() && result.firstSeq && result.firstSeq > logView.firstSeq) {
+                shiftLogRows(result.firstSeq - logView.firstSeq);
+                logView.firstSeq = result.firstSeq;
+            }
+            logView.lastSeq = Math.max(logView.lastSeq, result.lastSeq);
+            logView.total = result.total;
+            result.rows.forEach((row, i) => logView.rows.set(result.start + i, row.text));
+            logView.fetchQueued = false; // The render below re-requests whatever is still missing
+            scheduleLogRender();
+        }).catch(err => {
+            logView.fetchInFlight = false;
+            console.error("Error querying logs:", err);
         });
-        uiElements.logOutput.appendChild(fragment);
-        while (uiElements.logOutput.children.length > currentMaxLogLines) {
-            uiElements.logOutput.removeChild(uiElements.logOutput.firstChild);
+    }
+
+    function refreshFilteredLogView() {
+        logView.filterRefreshTimer = null;
+        if (logView.follow) {
+            fetchLogRows(-1, Math.ceil(uiElements.logOutput.clientHeight / LOG_ROW_HEIGHT) + LOG_OVERSCAN_ROWS);
+        } else {
+            const [first, last] = visibleLogRange();
+            fetchLogRows(first, Math.max(1, last - first));
+        }
+    }
+
+    // Incremental push from Python: the newest lines, starting at firstSeq.
+    window.appendLogDelta = function(firstSeq, messagesArray) {
+        const newLastSeq = firstSeq + messagesArray.length - 1;
+        if (newLastSeq <= logView.lastSeq) return;
+        logView.lastSeq = newLastSeq;
+        if (isLogViewFiltered()) {
+            if (!logView.filterRefreshTimer) logView.filterRefreshTimer = setTimeout(refreshFilteredLogView, LOG_FILTER_REFRESH_MS);
+            return;
+        }
+        const newFirstSeq = Math.max(1, newLastSeq - logView.capacity + 1);
+        if (newFirstSeq > logView.firstSeq) {
+            shiftLogRows(newFirstSeq - logView.firstSeq);
+            logView.firstSeq = newFirstSeq;
         }
-        uiElements.logOutput.scrollTop = uiElements.logOutput.scrollHeight;
+        // Lines we skipped (deltas are capped) are simply not cached; rendering fetches them if they scroll into view.
+        messagesArray.forEach((text, i) => {
+            const row = firstSeq + i - logView.firstSeq;
+            if (row >= 0) logView.rows.set(row, text);
+        });
+        logView.total = logView.lastSeq - logView.firstSeq + 1;
+        scheduleLogRender();
+    };
+
+    // Full view state from Python: buffer bounds plus the newest lines.
+    window.replaceLogs = function(state) {
+        if (!state) return;
+        logView.capacity = state.capacity || logView.capacity;
+        logView.firstSeq = state.firstSeq || 1;
+        logView.lastSeq = state.lastSeq || 0;
+        logView.rows = new Map();
+        logView.follow = true;
+        if (isLogViewFiltered()) {
+            logView.total = 0;
+            refreshFilteredLogView();
+            return;
+        }
+        logView.total = logView.lastSeq >= logView.firstSeq ? logView.lastSeq - logView.firstSeq + 1 : 0;
+        (state.tail || []).forEach((text, i) => logView.rows.set(state.tailFirstSeq + i - logView.firstSeq, text));
+        scheduleLogRender();
+    };
+
+    function applyLogFilter() {
+        logView.level = uiElements.logLevelFilter ? uiElements.logLevelFilter.value : '';
+        logView.search = uiElements.logSearchInput ? uiElements.logSearchInput.value.trim() : '';
+        logView.rows = new Map();
+        logView.follow = true;
+        if (isLogViewFiltered()) {
+            logView.total = 0;
+            refreshFilteredLogView();
+        } else {
+            logView.firstSeq = Math.max(1, logView.lastSeq - logView.capacity + 1);
+            logView.total = logView.lastSeq >= logView.firstSeq ? logView.lastSeq - logView.firstSeq + 1 : 0;
+            scheduleLogRender();
+        }
+    }
+
+    if (uiElements.logOutput) {
+        uiElements.logOutput.addEventListener('scroll', () => {
+            const el = uiElements.logOutput;
+            logView.follow = el.scrollTop + el.clientHeight >= el.scrollHeight - 2 * LOG_ROW_HEIGHT;
+            scheduleLogRender();
+        });
+        window.addEventListener('resize', scheduleLogRender);
+    }
+    let logSearchDebounce = null;
+    if (uiElements.logSearchInput) {
+        uiElements.logSearchInput.addEventListener('input', () => {
+            clearTimeout(logSearchDebounce);
+            logSearchDebounce = setTimeout(applyLogFilter, 200);
+        });
+    }
+    if (uiElements.logLevelFilter) uiElements.logLevelFilter.addEventListener('change', applyLogFilter);
+
+    window.openMainTab = function(evt, panelId) {
+        document.querySelectorAll('.main-tab-panel').forEach(panel => panel.classList.toggle('active-tab', panel.id === panelId));
+        document.querySelectorAll('.main-tab-container .tab-button').forEach(button => button.classList.remove('active'));
+        if (evt && evt.currentTarget) evt.currentTarget.classList.add('active');
+        if (panelId === 'LogsPanel') scheduleLogRender(); // Row heights could not be measured while hidden
+        if (window.pywebview && window.pywebview.api.set_dashboard_visible) {
+            window.pywebview.api.set_dashboard_visible(panelId === 'DashboardPanel');
+        }
+    };
+
+    // Python pushes only the keys whose values changed since the previous push.
+    window.updateDashboard = function(delta) {
+        Object.keys(delta).forEach(key => {
+            if (key === 'conversations') {
+                const target = document.getElementById('dashboard-conversations');
+                if (!target) return;
+                const entries = Object.entries(delta.conversations || {}).sort((a, b) => b[1] - a[1]);
+                target.textContent = entries.length
+                    ? entries.map(([state, count]) => `${state}: ${count}`).join('\n')
+                    : (currentGuiTranslations.gui_dash_no_conversations || "No active conversations");
+                return;
+            }
+            const target = document.querySelector(`.dashboard-value[data-metric="${key}"]`);
+            if (!target) return;
+            const value = delta[key];
+            target.textContent = (value === null || value === undefined)
+                ? '–'
+                : (target.dataset.unit ? `${value} ${target.dataset.unit}` : String(value));
+        });
     };
 
     window.setButtonState = function (buttonId, enabled) {
@@ -283,14 +486,18 @@ document.addEventListener('DOMContentLoaded', function () {
         if (button) button.disabled = !enabled;
     };
 
-    window.setLogLinesConfig = function(maxLines, currentLogs = []) {
+    window.setLogLinesConfig = function(maxLines, logState = null) {
         currentMaxLogLines = parseInt(maxLines, 10);
         if(uiElements.settingsModalLogLinesInput) uiElements.settingsModalLogLinesInput.value = currentMaxLogLines;
-        clearLogs();
-        if (currentLogs && currentLogs.length > 0) addBatchLogMessages(currentLogs);
+        if (logState) replaceLogs(logState);
     };
 
-    window.clearLogs = function() { if(uiElements.logOutput) uiElements.logOutput.innerHTML = ''; };
+    window.clearLogs = function() {
+        logView.rows = new Map();
+        logView.total = 0;
+        logView.firstSeq = logView.lastSeq + 1;
+        scheduleLogRender();
+    };
 
     function openQuestionsModal() {
         if (window.pywebview && window.pywebview.api.get_questions) {
@@ -368,7 +575,8 @@ document.addEventListener('DOMContentLoaded', function () {
                 textInput.style.borderColor = 'red';
                 hasError = true; break;
             }
-            updatedQuestions.push({ id: id, text: text });
+            // Keep fields the table does not edit (type, choices, next, texts, ...).
+            updatedQuestions.push(Object.assign({}, currentQuestionsData[originalIndex] || {}, { id: id, text: text }));
         }
 
         if (hasError) return;
@@ -461,13 +669,15 @@ document.addEventListener('DOMContentLoaded', function () {
 
         uiElements.adminBotTokenInput.value = settings.BOT_TOKEN || "";
         uiElements.adminUserIdsInput.value = settings.ADMIN_USER_IDS || "";
+        uiElements.adminTracingEnabledToggle.checked = settings.TRACING_ENABLED === true;
+        uiElements.adminProfileEveryNInput.value = settings.PROFILE_SAMPLE_EVERY_N === undefined ? 0 : settings.PROFILE_SAMPLE_EVERY_N;
     }
 
     uiElements.cancelAllSettingsButton.addEventListener('click', closeSettingsModal);
 
     uiElements.saveAllSettingsButton.addEventListener('click', () => {
         const newMaxLogs = parseInt(uiElements.settingsModalLogLinesInput.value, 10);
-        if (!isNaN(newMaxLogs) && newMaxLogs >= 10 && newMaxLogs <= 1000) {
+        if (!isNaN(newMaxLogs) && newMaxLogs >= minLogLines && newMaxLogs <= maxLogLinesLimit) {
             if (newMaxLogs !== currentMaxLogLines) {
                  if (window.pywebview && window.pywebview.api.set_max_log_lines_from_ui) {
                     window.pywebview.api.set_max_log_lines_from_ui(newMaxLogs.toString());
@@ -513,7 +723,9 @@ document.addEventListener('DOMContentLoaded', function () {
                     question_bold: uiElements.pdfQuestionBoldCheckbox.checked
                 },
                 BOT_TOKEN: uiElements.adminBotTokenInput.value.trim(),
-                ADMIN_USER_IDS: uiElements.adminUserIdsInput.value.trim()
+                ADMIN_USER_IDS: uiElements.adminUserIdsInput.value.trim(),
+                TRACING_ENABLED: uiElements.adminTracingEnabledToggle.checked,
+                PROFILE_SAMPLE_EVERY_N: parseInt(uiElements.adminProfileEveryNInput.value || "0", 10)
             };
 
             if (!settingsToSave.BOT_TOKEN) {
@@ -524,6 +736,10 @@ document.addEventListener('DOMContentLoaded', function () {
                 alert(currentGuiTranslations.gui_alert_invalid_photo_numb || "Number of photos must be a non-negative number.");
                 uiElements.pdfAppPhotoNumbInput.focus(); return;
             }
+            if (isNaN(settingsToSave.PROFILE_SAMPLE_EVERY_N) || settingsToSave.PROFILE_SAMPLE_EVERY_N < 0) {
+                alert(currentGuiTranslations.gui_alert_invalid_profile_every_n || "Profiling interval must be 0 or a positive number.");
+                uiElements.adminProfileEveryNInput.focus(); return;
+            }
             if (!settingsToSave.FONT_FILE_PATH) {
                 alert(currentGuiTranslations.gui_alert_pdf_font_paths_empty || "Font File Path cannot be empty.");
                 uiElements.pdfFontFilePathInput.focus(); return;
@@ -577,10 +793,16 @@ document.addEventListener('DOMContentLoaded', function () {
         if (uiElements.settingsModalLogoSelect) uiElements.settingsModalLogoSelect.value = logoFromPython; // Added
 
 
-        currentMaxLogLines = config.maxLogLines || 100;
-        if(uiElements.settingsModalLogLinesInput) uiElements.settingsModalLogLinesInput.value = currentMaxLogLines;
+        currentMaxLogLines = config.maxLogLines || 100000;
+        minLogLines = config.minLogLines || minLogLines;
+        maxLogLinesLimit = config.maxLogLinesLimit || maxLogLinesLimit;
+        if(uiElements.settingsModalLogLinesInput) {
+            uiElements.settingsModalLogLinesInput.value = currentMaxLogLines;
+            uiElements.settingsModalLogLinesInput.min = minLogLines;
+            uiElements.settingsModalLogLinesInput.max = maxLogLinesLimit;
+        }
 
-        if (config.initialLogs && config.initialLogs.length > 0) addBatchLogMessages(config.initialLogs);
+        replaceLogs(config.logState);
     };
 
     window.addEventListener('pywebviewready', function () {
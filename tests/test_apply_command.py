@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ConversationHandler
+
+from application_bot import utils
+from application_bot.handlers.conversation_logic import apply_command_entry
+from application_bot.session import get_session
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append(text)
+
+
+class FakeStore:
+    def __init__(self, submitted_at):
+        self.submitted_at = submitted_at
+        self.lookups = []
+
+    def last_submission_time(self, user_id):
+        self.lookups.append(threading.current_thread())
+        return self.submitted_at
+
+
+@pytest.fixture
+def bot_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {
+        "DEFAULT_LANG": "en", "RATE_LIMIT_SECONDS": 600, "QUESTION_SET_ARCHIVE_FOLDER": str(tmp_path),
+    })
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", [{"id": "q1", "text": {"en": "Q1"}}])
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "LANGUAGES_CACHE", {"en": {
+        "rate_limit_exceeded": "Wait {wait_time} min",
+        "application_failed": "Failed",
+    }})
+
+
+def make_update_and_context(bot_data):
+    message = FakeMessage("/apply")
+    update = SimpleNamespace(message=message, effective_user=SimpleNamespace(id=7, language_code="en"))
+    context = SimpleNamespace(user_data={}, bot_data=bot_data, bot=SimpleNamespace(local_mode=False))
+    get_session(context.user_data).lang = "en"
+    return update, context
+
+
+def test_shared_rate_limit_is_read_once_off_the_loop(bot_config):
+    store = FakeStore(time.time() - 30)
+    update, context = make_update_and_context({"shared_state": store})
+
+    async def apply():
+        return await apply_command_entry(update, context), threading.current_thread()
+
+    result, loop_thread = asyncio.run(apply())
+    assert result == ConversationHandler.END
+    assert update.message.replies == ["Wait 10 min"]
+    assert len(store.lookups) == 1 and store.lookups[0] is not loop_thread
+
+
+def test_rejected_apply_leaves_no_conversation_state(bot_config):
+    update, context = make_update_and_context({"rate_limits": {7: time.time()}})
+
+    assert asyncio.run(apply_command_entry(update, context)) == ConversationHandler.END
+    assert get_session(context.user_data).state is None
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import NetworkError
+
+from application_bot import utils
+from application_bot.polling import catch_up, collapse_backlog
+
+
+def make_update(update_id, user_id, text, timestamp=1_000_000.0):
+    message = SimpleNamespace(text=text, date=datetime.fromtimestamp(timestamp, timezone.utc))
+    return SimpleNamespace(update_id=update_id, message=message, effective_message=message,
+                           effective_user=SimpleNamespace(id=user_id))
+
+
+class FakeBot:
+    def __init__(self, updates, fail_on_call=None):
+        self.updates = updates
+        self.fail_on_call = fail_on_call
+        self.offsets = []
+
+    async def get_updates(self, offset, limit, timeout, allowed_updates):
+        self.offsets.append(offset)
+        if len(self.offsets) == self.fail_on_call:
+            raise NetworkError("connection reset")
+        return [update for update in self.updates if update.update_id >= offset][:limit]
+
+
+@pytest.fixture
+def bot_config(monkeypatch):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {"POLLING_BATCH_LIMIT": 2, "CATCH_UP_MAX_UPDATES": 100})
+
+
+def run_catch_up(bot):
+    queue = asyncio.Queue()
+    asyncio.run(catch_up(SimpleNamespace(bot=bot, update_queue=queue)))
+    return [queue.get_nowait().update_id for _ in range(queue.qsize())]
+
+
+def test_collapse_keeps_the_newest_repeated_command_per_user():
+    updates = [make_update(1, 7, "/apply"), make_update(2, 7, "hello"), make_update(3, 8, "/apply"),
+               make_update(4, 7, "/APPLY@my_bot")]
+    kept, collapsed, stale = collapse_backlog(updates)
+    assert [update.update_id for update in kept] == [2, 3, 4]
+    assert (collapsed, stale) == (1, 0)
+
+
+def test_collapse_drops_stale_messages():
+    updates = [make_update(1, 7, "old", timestamp=100.0), make_update(2, 7, "new", timestamp=300.0)]
+    kept, collapsed, stale = collapse_backlog(updates, stale_before=200.0)
+    assert [update.update_id for update in kept] == [2]
+    assert (collapsed, stale) == (0, 1)
+
+
+def test_catch_up_confirms_everything_it_queues(bot_config):
+    bot = FakeBot([make_update(i, i, "hi") for i in (10, 11, 12)])
+    assert run_catch_up(bot) == [10, 11, 12]
+    assert bot.offsets == [0, 12, 13]  # The empty page at 13 confirms all three
+
+
+def test_catch_up_queues_only_confirmed_updates_after_an_error(bot_config):
+    bot = FakeBot([make_update(i, i, "hi") for i in (10, 11, 12, 13, 14)], fail_on_call=3)
+    assert run_catch_up(bot) == [10, 11]  # 12 and 13 were fetched but never confirmed; polling gets them again
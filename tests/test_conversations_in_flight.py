@@ -0,0 +1,52 @@
+import copy
+
+import pytest
+from telegram.ext import ConversationHandler
+
+from application_bot import metrics, utils
+from application_bot.main import create_bot_application
+from application_bot.session import SESSION_KEY, ApplicationSession, get_session, track_restored_sessions
+
+
+@pytest.fixture
+def bot_config(monkeypatch):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {"BOT_TOKEN": "123:TEST", "INBOUND_FILTER_ENABLED": False})
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", [])
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "LANGUAGES_CACHE", {"en": {}})
+
+
+def test_timeout_state_is_registered(bot_config):
+    application = create_bot_application()
+    conv_handler = application.bot_data["conversation_handler"]
+    assert ConversationHandler.TIMEOUT in conv_handler.states
+
+
+def test_gauge_follows_begin_and_reset():
+    before = metrics.CONVERSATIONS_IN_FLIGHT.value()
+    session = get_session({})
+    session.begin("v1")
+    session.begin("v1")  # Restarting an application doesn't count twice
+    get_session({})  # Idle session: not counted
+    assert metrics.CONVERSATIONS_IN_FLIGHT.value() == before + 1
+
+    # A reset that never went through cleanup (a timeout, a shard move) still brings the gauge back.
+    session.reset()
+    session.reset()
+    assert metrics.CONVERSATIONS_IN_FLIGHT.value() == before
+    assert f"appbot_conversations_in_flight {before}" in metrics.REGISTRY.render_prometheus()
+
+
+def test_copies_and_restored_sessions_keep_the_count_consistent():
+    before = metrics.CONVERSATIONS_IN_FLIGHT.value()
+    live = get_session({})
+    live.begin("v1")
+    copy.deepcopy(live)  # As PTB does before every persistence write
+    assert metrics.CONVERSATIONS_IN_FLIGHT.value() == before + 1
+
+    restored = {SESSION_KEY: ApplicationSession.from_state(live.to_state())}  # As loaded by another worker
+    assert track_restored_sessions([restored, {}]) == 1
+    assert track_restored_sessions([restored]) == 0
+    assert metrics.CONVERSATIONS_IN_FLIGHT.value() == before + 2
+    live.reset()
+    restored[SESSION_KEY].reset()
+    assert metrics.CONVERSATIONS_IN_FLIGHT.value() == before
@@ -0,0 +1,53 @@
+import http.client
+import os
+import stat
+import threading
+
+import pytest
+
+from application_bot import utils
+from application_bot.daemon import ControlDaemon, control_token, create_control_server
+from application_bot.log_buffer import LogRingBuffer
+
+
+@pytest.fixture
+def bot_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {"CONTROL_TOKEN": "", "QUESTION_SET_ARCHIVE_FOLDER": str(tmp_path)})
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", [])
+
+
+@pytest.fixture
+def tcp_server(bot_config):
+    daemon = ControlDaemon(LogRingBuffer(100), token="secret")
+    server = create_control_server(daemon, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def request(port, headers):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    connection.request("POST", "/stop", headers=headers)  # Host is set from `headers` when given
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+def test_tcp_needs_a_token(bot_config):
+    with pytest.raises(ValueError):
+        create_control_server(ControlDaemon(LogRingBuffer(100)), "127.0.0.1", 0)
+
+
+def test_tcp_rejects_missing_token_and_foreign_host(tcp_server):
+    assert request(tcp_server, {}) == 401
+    assert request(tcp_server, {"Host": "evil.example:8765", "Authorization": "Bearer secret"}) == 403
+    assert request(tcp_server, {"Host": "localhost:8765", "Authorization": "Bearer secret"}) not in (401, 403)
+
+
+def test_generated_token_is_private_and_reused(bot_config, tmp_path):
+    token_file = str(tmp_path / "control_token")
+    token = control_token(token_file)
+    assert token and stat.S_IMODE(os.stat(token_file).st_mode) == 0o600
+    assert control_token(token_file) == token
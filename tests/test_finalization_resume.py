@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from application_bot import utils
+from application_bot.drain import FinalizationJob
+from application_bot.handlers.conversation_logic import run_finalization
+
+
+class FakeBot:
+    local_mode = False
+
+    def __init__(self, failing_admins=()):
+        self.failing_admins = set(failing_admins)
+        self.documents = []
+        self.messages = []
+
+    async def send_document(self, chat_id, document, filename=None, caption=None):
+        if chat_id in self.failing_admins:
+            raise RuntimeError("network down")
+        self.documents.append((chat_id, document))
+        return SimpleNamespace(document=SimpleNamespace(file_id=f"file-{chat_id}"))
+
+    async def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+
+@pytest.fixture
+def bot_config(monkeypatch):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {"SEND_PDF_TO_ADMINS": True, "ADMIN_USER_IDS": "1, 2", "DEFAULT_LANG": "en"})
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "LANGUAGES_CACHE", {"en": {
+        "admin_notification": "New application from {username}",
+        "application_submitted": "Submitted",
+        "application_failed": "Failed",
+    }})
+
+
+def test_resumed_checkpoint_retries_failed_admin_send(bot_config, tmp_path):
+    pdf_path = tmp_path / "application.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    job = FinalizationJob(42, "applicant", 42, "en", None, {"q1": "a1"}, [])
+    job.pdf_path = str(pdf_path)
+
+    first_bot = FakeBot(failing_admins={2})
+    asyncio.run(run_finalization(first_bot, {}, job))
+    assert job.admins_done == [1]
+
+    resumed = FinalizationJob.from_dict(job.to_dict())  # As written to and read back from the checkpoint
+    resumed_bot = FakeBot()
+    asyncio.run(run_finalization(resumed_bot, {}, resumed))
+
+    assert resumed.admins_done == [1, 2]
+    assert resumed_bot.documents == [(2, "file-1")]  # The upload from the first run is reused by file id
+    assert resumed_bot.messages == []  # The applicant was already told
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ConversationHandler
+
+from application_bot import utils
+from application_bot.constants import STATE_AWAITING_PHOTO
+from application_bot.handlers.conversation_logic import handle_answer
+from application_bot.question_sets import current_question_set
+from application_bot.session import get_session
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append(text)
+
+
+@pytest.fixture
+def bot_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {
+        "DEFAULT_LANG": "en", "APPLICATION_PHOTO_NUMB": 1, "QUESTION_SET_ARCHIVE_FOLDER": str(tmp_path),
+    })
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "LANGUAGES_CACHE", {"en": {
+        "application_cancelled": "Cancelled", "application_failed": "Failed", "ask_photo_single": "Send a photo",
+    }})
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", [{"id": "q1", "text": "Q1?"}])
+
+
+def make_update_and_context(text):
+    sent = []
+
+    async def send_message(chat_id, text, reply_markup=None):
+        sent.append(text)
+
+    update = SimpleNamespace(message=FakeMessage(text), callback_query=None, effective_chat=SimpleNamespace(id=7),
+                             effective_user=SimpleNamespace(id=7, language_code="en"))
+    context = SimpleNamespace(user_data={}, bot_data={}, bot=SimpleNamespace(local_mode=False, send_message=send_message))
+    get_session(context.user_data).lang = "en"
+    return update, context, sent
+
+
+def test_answer_with_reset_session_ends_conversation(bot_config):
+    message = FakeMessage("an answer")
+    update = SimpleNamespace(message=message, effective_user=SimpleNamespace(id=7, language_code="en"))
+    context = SimpleNamespace(user_data={}, bot_data={}, bot=SimpleNamespace(local_mode=False))
+    session = get_session(context.user_data)
+    session.lang = "en"
+    assert session.question_index is None  # As after reset(), while the persisted state is still ASKING_QUESTIONS
+
+    assert asyncio.run(handle_answer(update, context)) == ConversationHandler.END
+    assert message.replies == ["Cancelled"]
+    assert not session.in_application
+
+
+def test_answer_past_the_last_question_goes_to_the_photos(bot_config):
+    update, context, _ = make_update_and_context("a repeated answer")
+    session = get_session(context.user_data)
+    session.begin(current_question_set().version)
+    session.question_index = 1
+
+    assert asyncio.run(handle_answer(update, context)) == STATE_AWAITING_PHOTO
+    assert update.message.replies == ["Send a photo"]
+    assert session.awaiting_photo and session.question_index == 1
+
+
+def test_answer_without_questions_ends_with_failure(bot_config, monkeypatch):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", None)
+    update, context, sent = make_update_and_context("an answer")
+    session = get_session(context.user_data)
+    session.begin(None)
+
+    assert asyncio.run(handle_answer(update, context)) == ConversationHandler.END
+    assert sent == ["Failed (No questions available)"]
+    assert not session.in_application
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ApplicationHandlerStop
+
+from application_bot import inbound_filter, utils
+from application_bot.constants import STATE_AWAITING_PHOTO
+from application_bot.inbound_filter import InboundFilter
+from application_bot.session import get_session
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(inbound_filter, "time", clock)
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {
+        "DEFAULT_LANG": "en", "INBOUND_RATE_PER_SECOND": 1.0, "INBOUND_BURST": 2,
+        "INBOUND_WARNING_INTERVAL_SECONDS": 30.0, "MAX_ALLOWED_FILE_SIZE_MB": 10,
+    })
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "LANGUAGES_CACHE", {"en": {"inbound_flood_warning": "Slow down"}})
+    return clock
+
+
+def make_update(sticker=None):
+    message = SimpleNamespace(sticker=sticker, document=None, video=None, animation=None, audio=None, voice=None, photo=[])
+    return SimpleNamespace(message=message, effective_user=SimpleNamespace(id=7, language_code="en"),
+                           effective_chat=SimpleNamespace(id=7))
+
+
+def make_context():
+    warnings = []
+
+    async def send_message(chat_id, text):
+        warnings.append(text)
+
+    context = SimpleNamespace(user_data={}, bot=SimpleNamespace(send_message=send_message))
+    get_session(context.user_data).lang = "en"
+    return context, warnings
+
+
+def passes(filter_, update, context):
+    try:
+        asyncio.run(filter_.handle_update(update, context))
+    except ApplicationHandlerStop:
+        return False
+    return True
+
+
+def test_token_bucket_drops_floods_and_warns_once(clock):
+    filter_, (context, warnings) = InboundFilter(), make_context()
+    assert [passes(filter_, make_update(), context) for _ in range(4)] == [True, True, False, False]
+    assert warnings == ["Slow down"]
+
+    clock.now += 1.0  # One token refilled
+    assert passes(filter_, make_update(), context)
+    assert not passes(filter_, make_update(), context)
+    assert warnings == ["Slow down"]
+
+
+def test_stickers_while_awaiting_photo_are_coalesced(clock):
+    filter_, (context, warnings) = InboundFilter(), make_context()
+    get_session(context.user_data).state = STATE_AWAITING_PHOTO
+    assert passes(filter_, make_update(sticker=object()), context)
+    clock.now += 5.0
+    assert not passes(filter_, make_update(sticker=object()), context)  # Answered already; dropped silently
+    clock.now += 30.0
+    assert passes(filter_, make_update(sticker=object()), context)
+    assert warnings == []
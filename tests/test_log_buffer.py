@@ -0,0 +1,43 @@
+import logging
+
+from application_bot.log_buffer import LogRingBuffer
+
+
+def _fill(buffer: LogRingBuffer, count: int):
+    buffer.append_many([(logging.INFO, f"line {i}") for i in range(1, count + 1)])
+
+
+def test_grow_after_wrap_keeps_only_stored_lines():
+    buffer = LogRingBuffer(capacity=100)
+    _fill(buffer, 150)
+    buffer.resize(200)
+
+    assert buffer.first_seq == 51
+    assert len(buffer) == 100
+    result = buffer.query(0, 50)
+    assert result["total"] == 100
+    assert result["firstSeq"] == 51
+    assert [row["seq"] for row in result["rows"]] == list(range(51, 101))
+    assert buffer.query(0, 500, search="line")["total"] == 100
+    assert [row["seq"] for row in buffer.rows_since(0, 10, min_level=logging.INFO)] == list(range(51, 61))
+    assert buffer.tail(5) == (146, [f"line {i}" for i in range(146, 151)])
+
+
+def test_grown_buffer_fills_before_dropping_lines():
+    buffer = LogRingBuffer(capacity=100)
+    _fill(buffer, 150)
+    buffer.resize(200)
+    buffer.append_many([(logging.INFO, "more")] * 150)
+
+    assert buffer.last_seq == 300
+    assert buffer.first_seq == 101
+    assert buffer.query(-1, 1)["rows"][0]["seq"] == 300
+
+
+def test_shrink_drops_oldest_lines():
+    buffer = LogRingBuffer(capacity=100)
+    _fill(buffer, 80)
+    buffer.resize(50)
+
+    assert buffer.first_seq == 31
+    assert buffer.query(0, 1)["rows"][0]["text"] == "line 31"
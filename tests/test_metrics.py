@@ -0,0 +1,34 @@
+import pytest
+
+from application_bot.metrics import Histogram, histogram_quantile
+
+
+def test_histogram_buckets_are_upper_inclusive_and_cumulative_on_export():
+    histogram = Histogram("test_seconds", "Test.", ["step"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "render")
+
+    bounds, counts, total = histogram.snapshot("render")
+    assert bounds == (0.1, 1.0)
+    assert counts == [2, 1, 1]  # 0.1 counts as le="0.1"
+    assert total == pytest.approx(2.65)
+    assert histogram.snapshot("other") is None
+    assert histogram.collect() == [
+        'test_seconds_bucket{step="render",le="0.1"} 2',
+        'test_seconds_bucket{step="render",le="1.0"} 3',
+        'test_seconds_bucket{step="render",le="+Inf"} 4',
+        'test_seconds_count{step="render"} 4',
+        'test_seconds_sum{step="render"} 2.65',
+    ]
+
+
+def test_quantile_interpolates_inside_the_bucket():
+    bounds = (1.0, 2.0, 4.0)
+    assert histogram_quantile(bounds, [0, 10, 0, 0], 0.5) == pytest.approx(1.5)
+    assert histogram_quantile(bounds, [5, 0, 5, 0], 0.95) == pytest.approx(2.0 + 2.0 * 0.9)
+    assert histogram_quantile(bounds, [10, 0, 0, 0], 0.0) == pytest.approx(0.0)
+
+
+def test_quantile_edge_cases():
+    assert histogram_quantile((1.0,), [0, 0], 0.5) is None
+    assert histogram_quantile((1.0, 2.0), [0, 0, 3], 0.5) == 2.0  # Only +Inf observations
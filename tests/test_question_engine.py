@@ -0,0 +1,68 @@
+from application_bot.question_engine import compile_questions
+from application_bot.question_sets import QuestionSet
+
+
+def compile_one(question):
+    errors = []
+    (compiled,) = compile_questions([dict(question, id="q")], errors)
+    return compiled, errors
+
+
+def test_choice_answers_are_matched_case_insensitively():
+    question, errors = compile_one({"type": "choice", "choices": ["Yes", "No"]})
+    assert not errors
+    assert question.validate("  yes ") == (True, "Yes")
+    assert question.validate("maybe") == (False, ("invalid_answer_choice", {}))
+    assert question.keyboard is not None
+
+
+def test_typed_validators():
+    phone, _ = compile_one({"type": "phone"})
+    assert phone.validate("+1 (555) 123-4567")[0]
+    assert not phone.validate("12-34")[0]
+
+    email, _ = compile_one({"type": "email"})
+    assert email.validate("a@b.co")[0]
+    assert not email.validate("a@b")[0]
+
+    number, _ = compile_one({"type": "number", "min": 18, "max": 99})
+    assert number.validate("42,5") == (True, "42,5")
+    assert number.validate("17") == (False, ("invalid_answer_number_too_small", {"minimum": "18"}))
+    assert number.validate("abc") == (False, ("invalid_answer_number", {}))
+
+
+def test_length_limits_and_precompiled_pattern():
+    question, errors = compile_one({"min_length": 2, "max_length": 4, "pattern": "[A-Z]+"})
+    assert not errors and question.pattern is not None
+    assert question.validate("A") == (False, ("invalid_answer_too_short", {"min_length": 2}))
+    assert question.validate("ABCDE") == (False, ("invalid_answer_too_long", {"max_length": 4}))
+    assert question.validate("abc") == (False, ("invalid_answer_format", {}))
+    assert question.validate("ABC") == (True, "ABC")
+
+
+def test_bad_rules_are_reported_and_dropped():
+    question, errors = compile_one({"type": "colour", "pattern": "(", "min_length": -1})
+    assert len(errors) == 3
+    assert question.answer_type == "text" and question.pattern is None and question.min_length is None
+
+
+def test_branches_jump_forward_to_positions():
+    errors = []
+    questions = compile_questions([
+        {"id": "employed", "next": {"no": "end", "*": "company"}},
+        {"id": "skipped"},
+        {"id": "company", "next": {"x": "employed"}},
+    ], errors)
+    assert questions[0].next_position("No") == 3
+    assert questions[0].next_position("yes") == 2
+    assert questions[1].next_position("anything") == 2
+    assert errors == ["Question 'company': 'next' may only jump forward (to 'employed')."]
+
+
+def test_question_set_version_depends_on_content_only():
+    questions = [{"id": "a", "text": "A?", "texts": {"ru": "А?"}}, {"id": "b", "text": "B?"}]
+    first, second = QuestionSet.from_list(questions), QuestionSet.from_list([dict(q) for q in questions])
+    assert first.version == second.version
+    assert QuestionSet.from_list(questions[:1]).version != first.version
+    assert first.positions == {"a": 0, "b": 1}
+    assert first.text(0, "ru") == "А?" and first.text(1, "ru") == "B?" and first.text(0, "de") == "A?"
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ConversationHandler
+
+from application_bot import question_sets, utils
+from application_bot.handlers.conversation_logic import ask_next_question
+from application_bot.question_sets import QuestionSetRegistry, pinned_question_set
+from application_bot.session import get_session
+
+QUESTIONS_V1 = [{"id": "name", "text": "Name?"}, {"id": "age", "text": "Age?"}]
+QUESTIONS_V2 = [{"id": "age", "text": "Age?"}]
+
+
+@pytest.fixture
+def bot_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "SETTINGS", {
+        "DEFAULT_LANG": "en", "QUESTION_SET_CACHE_SIZE": 1, "QUESTION_SET_ARCHIVE_FOLDER": str(tmp_path),
+    })
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "LANGUAGES_CACHE", {"en": {"questions_changed": "Start again"}})
+    monkeypatch.setattr(question_sets, "REGISTRY", QuestionSetRegistry())
+    return tmp_path
+
+
+def wait_for_file(path):
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_evicted_version_is_loaded_from_the_archive(bot_config, monkeypatch):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", list(QUESTIONS_V1))
+    v1 = question_sets.current_question_set()
+    wait_for_file(os.path.join(bot_config, f"{v1.version}.json"))
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", list(QUESTIONS_V2))
+    question_sets.current_question_set()  # Evicts v1 (capacity 1)
+
+    monkeypatch.setattr(question_sets, "REGISTRY", QuestionSetRegistry())  # As after a restart
+    resumed = asyncio.run(pinned_question_set(v1.version))
+    assert resumed is not None and resumed.ids == ("name", "age")
+
+
+def test_unavailable_version_ends_the_conversation(bot_config, monkeypatch):
+    monkeypatch.setattr(utils.DEFAULT_SCOPE, "QUESTIONS", list(QUESTIONS_V2))
+    sent = []
+
+    async def send_message(chat_id, text, reply_markup=None):
+        sent.append(text)
+
+    update = SimpleNamespace(message=None, callback_query=None, effective_chat=SimpleNamespace(id=7),
+                             effective_user=SimpleNamespace(id=7, language_code="en"))
+    context = SimpleNamespace(user_data={}, bot_data={}, bot=SimpleNamespace(local_mode=False, send_message=send_message))
+    session = get_session(context.user_data)
+    session.lang = "en"
+    session.begin("0000000000000000")
+    session.question_index = 1
+
+    assert asyncio.run(ask_next_question(update, context)) == ConversationHandler.END
+    assert sent == ["Start again"]
+    assert not session.in_application
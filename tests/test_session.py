@@ -0,0 +1,47 @@
+import pickle
+
+import pytest
+
+from application_bot.constants import STATE_AWAITING_PHOTO, STATE_CONFIRM_GLOBAL_CANCEL
+from application_bot.session import ApplicationSession, get_session
+
+
+def make_session():
+    session = ApplicationSession()
+    session.lang = "ru"
+    session.begin("abc123")
+    session.question_index = 3
+    session.answers = {"name": "Ann", "age": "30"}
+    session.awaiting_photo = True
+    session.state = STATE_CONFIRM_GLOBAL_CANCEL
+    session.cancel_return_state = STATE_AWAITING_PHOTO
+    session.photo_paths = ["temp_photos/1.jpg"]
+    return session
+
+
+def test_state_round_trip_keeps_every_field():
+    session = make_session()
+    for restored in (ApplicationSession.from_state(session.to_state()), pickle.loads(pickle.dumps(session))):
+        assert restored.to_state() == session.to_state()
+        # Containers are copied, not shared with the stored tuple.
+        assert restored.answers is not session.answers and restored.photo_paths is not session.photo_paths
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        ApplicationSession.from_state((99,) + make_session().to_state()[1:])
+    with pytest.raises(ValueError):
+        ApplicationSession.from_state(())
+
+
+def test_reset_ends_the_application_but_keeps_the_language():
+    user_data = {}
+    session = get_session(user_data)
+    session.lang = "en"
+    session.begin("v1")
+    session.photo_paths = ["a.jpg"]
+    assert session.in_application and get_session(user_data) is session
+
+    assert session.reset() == ["a.jpg"]
+    assert not session.in_application
+    assert session.lang == "en" and session.question_set_version is None and session.state is None
@@ -0,0 +1,24 @@
+from collections import Counter
+
+from application_bot.sharding import shard_for
+
+
+def test_shard_is_fixed_across_processes_and_restarts():
+    # Pinned values: a change here would move live conversations to another worker.
+    assert [shard_for(user_id, 4) for user_id in (1, 42, 123456789, 987654321012)] == [2, 3, 3, 3]
+
+
+def test_users_spread_evenly_over_shards():
+    counts = Counter(shard_for(user_id, 4) for user_id in range(20_000))
+    assert set(counts) == {0, 1, 2, 3}
+    assert all(4_000 < count < 6_000 for count in counts.values())
+
+
+def test_adding_a_shard_only_moves_users_to_the_new_one():
+    for user_id in range(5_000):
+        before, after = shard_for(user_id, 4), shard_for(user_id, 5)
+        assert after in (before, 4)
+
+
+def test_single_shard_owns_everyone():
+    assert {shard_for(user_id, 1) for user_id in range(100)} == {0}